@@ -48,6 +48,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'food_app.profiling.ProfilingMiddleware',
+    'food_app.routers.ReplicaPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -57,6 +59,18 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# ProfilingMiddleware: per view query count, SQL and template time in Server-Timing and at stats/profiling/,
+# optionally appended as JSON lines to FOOD_APP_PROFILING_LOG. FOOD_APP_QUERY_BUDGET is a number or a
+# {url name: number} dict, FOOD_APP_QUERY_BUDGET_STRICT turns an exceeded budget into an exception
+
+FOOD_APP_PROFILING = DEBUG
+
+FOOD_APP_PROFILING_LOG = os.environ.get('FOOD_APP_PROFILING_LOG')
+
+FOOD_APP_QUERY_BUDGET = None
+
+FOOD_APP_QUERY_BUDGET_STRICT = False
+
 ROOT_URLCONF = 'Food_Project.urls'
 
 TEMPLATES = [
@@ -71,6 +85,7 @@ TEMPLATES = [
                 'django.template.context_processors.media',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'food_app.context_processors.cache_versions',
             ],
         },
     },
@@ -82,7 +97,70 @@ WSGI_APPLICATION = 'Food_Project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.0/ref/settings/#databases
 # in local_settings.py
-
+#
+# Pooled connections: ENGINE 'food_app.db.backends.postgresql' (or 'food_app.db.backends.sqlite3') with
+# CONN_MAX_AGE = 0 hands the connection back to a per process pool at the end of every request, e.g.
+#     'ENGINE': 'food_app.db.backends.postgresql',
+#     'CONN_MAX_AGE': 0,
+#     'POOL': {'SIZE': 5, 'TIMEOUT': 10, 'IDLE_TIMEOUT': 300, 'HEALTH_CHECK_INTERVAL': 30},
+# pool usage and checkout wait times are shown at stats/pools/
+#
+# Read replicas: every alias besides 'default' serves the food_app reads of GET requests, writes and every
+# read of a user who wrote in the last FOOD_APP_REPLICA_PIN_SECONDS go to 'default'. Locally a second SQLite file
+# stands in for a replica, with 'TEST': {'MIRROR': 'default'} so tests read the primary test database through it:
+#     DATABASES['replica'] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / 'db_replica.sqlite3',
+#                             'TEST': {'MIRROR': 'default'}}
+# the replica tests (ReplicaDatabaseTest) are skipped without this alias.
+# Cached querysets, choices and shopping lists are filled from 'default'; template fragments rendered from a replica
+# are kept for FOOD_APP_REPLICA_PIN_SECONDS only, as they may miss the change that bumped their version.
+
+DATABASE_ROUTERS = ['food_app.routers.ReplicaRouter']
+
+FOOD_APP_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+
+FOOD_APP_REPLICA_PIN_SECONDS = 10
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+# Redis when FOOD_APP_REDIS_URL is set, file or local memory stand-in otherwise
+
+if os.environ.get('FOOD_APP_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['FOOD_APP_REDIS_URL'],
+        }
+    }
+
+elif os.environ.get('FOOD_APP_CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['FOOD_APP_CACHE_DIR'],
+        }
+    }
+
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'food_app',
+        }
+    }
+
+FOOD_APP_CACHE_TIMEOUT = 60 * 60
+
+FOOD_APP_LEADERBOARD_SIZE = 10
+
+FOOD_APP_LEADERBOARD_WINDOW_DAYS = 7
+
+# processes rendering image variants in the background, so uploads return without decoding the image;
+# queued jobs live in memory only, run `manage.py process_images` periodically (e.g. from cron and after every
+# deploy) to render the variants of uploads lost on a restart. 0 renders them inline after the upload is committed,
+# for tests and development only
+
+FOOD_APP_IMAGE_WORKERS = 2
 
 
 # Password validation
@@ -121,6 +199,13 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+STATIC_ROOT = os.path.join(BASE_DIR, 'static/')
+
+# collectstatic writes content hashed copies plus a manifest, so the served names can be cached forever
+
+if not DEBUG:
+    STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.0/ref/settings/#default-auto-field
 
@@ -130,8 +215,34 @@ AUTH_USER_MODEL = 'food_app.User'
 
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
+# emails wait in the OutboxEmail table for the send_emails worker, failed sends are retried after
+# FOOD_APP_EMAIL_RETRY_DELAY seconds, doubled on every attempt
+
+FOOD_APP_EMAIL_BATCH_SIZE = 50
+
+FOOD_APP_EMAIL_MAX_ATTEMPTS = 5
+
+FOOD_APP_EMAIL_RETRY_DELAY = 60
+
+# seconds an account activation or password set link stays valid, purge_tokens deletes older ones
+
+FOOD_APP_TOKEN_LIFETIME = {
+    'activation': 7 * 24 * 60 * 60,
+    'password': 24 * 60 * 60,
+}
+
 MEDIA_ROOT = os.path.join(BASE_DIR, 'food_app/media/')
 
 MEDIA_URL = 'media/'
 
+# Media and collected static files are served by food_app.serving.serve_file. The byte transfer can be
+# handed to the web server: None streams from Python, 'x-sendfile' (Apache, lighttpd) or 'x-accel-redirect'
+# (nginx, with internal locations aliasing MEDIA_ROOT and STATIC_ROOT at the URLs below)
+
+FOOD_APP_SENDFILE = os.environ.get('FOOD_APP_SENDFILE') or None
+
+FOOD_APP_MEDIA_INTERNAL_URL = '/internal/media/'
+
+FOOD_APP_STATIC_INTERNAL_URL = '/internal/static/'
+
 LOGIN_URL = reverse_lazy('user-login')
\ No newline at end of file
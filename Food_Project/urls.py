@@ -14,14 +14,36 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
+import re
+
 from django.contrib import admin
-from django.urls import path, include
-from django.conf.urls.static import static
+from django.urls import path, re_path, include
 from django.conf import settings
 
+from food_app.serving import serve_file
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('food_app/', include('food_app.urls')),
 ]
 
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+
+def serve_pattern(url, document_root, internal_url, name):
+
+    return re_path(
+        r'^%s(?P<path>.+)$' % re.escape(url.lstrip('/')),
+        serve_file,
+        kwargs={'document_root': document_root, 'internal_url': internal_url},
+        name=name,
+    )
+
+
+urlpatterns += [
+    serve_pattern(settings.MEDIA_URL, settings.MEDIA_ROOT, settings.FOOD_APP_MEDIA_INTERNAL_URL, name='media'),
+]
+
+# with DEBUG the staticfiles app serves the sources, otherwise the collected, hashed copies are served here
+if not settings.DEBUG:
+    urlpatterns += [
+        serve_pattern(settings.STATIC_URL, settings.STATIC_ROOT, settings.FOOD_APP_STATIC_INTERNAL_URL, name='static'),
+    ]
@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from .models import User, Ingredient, UserUniqueToken, Recipe, IngredientRecipe, CommentRecipe, Schedule, RecipeSchedule
+from .models import User, Ingredient, UserUniqueToken, Recipe, IngredientRecipe, CommentRecipe, Schedule, RecipeSchedule, \
+    RecipeLike, ScheduleLike, LeaderboardEntry, OutboxEmail, ScheduleNutrition
 
 # Register your models here.
 
@@ -11,24 +12,51 @@ class UserAdmin(admin.ModelAdmin):
     list_display = ('username', 'email', 'first_name', 'last_name')
 
 
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+
+    list_display = ('subject', 'status', 'attempts', 'next_attempt', 'date_sent')
+    list_filter = ('status',)
+
+
 @admin.register(Schedule)
 class ScheduleAdmin(admin.ModelAdmin):
     
-    list_display = ('name', 'create_date', 'create_by')
+    list_display = ('name', 'create_date', 'create_by', 'likes_count')
+
+
+@admin.register(ScheduleNutrition)
+class ScheduleNutritionAdmin(admin.ModelAdmin):
+
+    list_display = ('schedule', 'calories', 'weight', 'meals', 'date_computed')
 
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
     
-    list_display = ('name', 'create_date', 'create_by')
+    list_display = ('name', 'create_date', 'create_by', 'likes_count')
 
 
 admin.site.register(Ingredient)
 
-admin.site.register(UserUniqueToken)
+@admin.register(UserUniqueToken)
+class UserUniqueTokenAdmin(admin.ModelAdmin):
 
-admin.site.register(IngredientRecipe)
+    list_display = ('user', 'purpose', 'date_issued')
+
+@admin.register(IngredientRecipe)
+class IngredientRecipeAdmin(admin.ModelAdmin):
+
+    list_display = ('recipe', 'ingredient', 'quantity', 'amount', 'unit')
+    list_filter = ('unit',)
+    list_select_related = ('recipe', 'ingredient')
 
 admin.site.register(CommentRecipe)
 
-admin.site.register(RecipeSchedule)
\ No newline at end of file
+admin.site.register(RecipeSchedule)
+
+admin.site.register(RecipeLike)
+
+admin.site.register(ScheduleLike)
+
+admin.site.register(LeaderboardEntry)
\ No newline at end of file
@@ -0,0 +1,309 @@
+import hashlib
+
+from django.db.models import Prefetch
+
+from .cache import get_versions_key
+from .models import User, Ingredient, Recipe, IngredientRecipe, CommentRecipe, Schedule, RecipeSchedule, \
+    ScheduleNutrition
+
+
+class ApiError(Exception):
+
+    def __init__(self, message, status=400):
+
+        super().__init__(message)
+        self.status = status
+
+
+class Field:
+
+    """
+    Serialized attribute of a resource with the columns it needs loaded
+    """
+    def __init__(self, *columns, get=None):
+
+        self.columns = columns
+        self.get = get or (lambda obj: getattr(obj, columns[0]))
+
+
+class Expansion:
+
+    """
+    Relation embedded on ?expand=, loaded with select_related or a prefetch for the whole page
+    """
+    def __init__(self, get, models, columns=(), select_related=None, prefetch=None):
+
+        self.get = get
+        self.models = models
+        self.columns = columns
+        self.select_related = select_related
+        self.prefetch = prefetch
+
+
+def user_data(user):
+
+    return None if user is None else {'id': user.pk, 'username': user.username}
+
+
+class Resource:
+
+    """
+    Read-only JSON view of a model, with sparse fieldsets, expansions and cursor ordering
+    """
+    name = None
+    model = None
+    fields = {}
+    expansions = {}
+    filters = {}
+    counters = []
+    ordering = ['pk']
+    page_size = 20
+    max_page_size = 100
+
+    def get_queryset(self):
+
+        return self.model.objects.all()
+
+    def parse_list(self, value, allowed, kind):
+
+        names = [name for name in (value or '').split(',') if name]
+        unknown = [name for name in names if name not in allowed]
+
+        if unknown:
+            raise ApiError(f'Unknown {kind}: {", ".join(unknown)}')
+
+        return names
+
+    def parse_fields(self, params):
+
+        return self.parse_list(params.get('fields'), self.fields, 'fields') or list(self.fields)
+
+    def parse_expand(self, params):
+
+        return self.parse_list(params.get('expand'), self.expansions, 'expand')
+
+    def parse_page_size(self, params):
+
+        try:
+            return min(max(int(params.get('limit', self.page_size)), 1), self.max_page_size)
+        except ValueError:
+            raise ApiError('Invalid limit')
+
+    def get_models(self, expand):
+
+        models = {self.model}
+
+        for name in expand:
+            models.update(self.expansions[name].models)
+
+        return sorted(models, key=lambda model: model._meta.label)
+
+    def get_etag(self, request, expand):
+
+        """
+        Return a strong ETag of the response, derived from the request and the version counters of every model
+        it reads, so it is known before any row is loaded
+        """
+        versions = get_versions_key(self.get_models(expand), counters=self.counters)
+        data = f'{self.name}:{request.get_full_path()}:{versions}'
+
+        return f'"{hashlib.sha256(data.encode()).hexdigest()[:32]}"'
+
+    def build_queryset(self, params, fields, expand):
+
+        queryset = self.get_queryset()
+
+        for param, lookup in self.filters.items():
+            if param in params:
+                try:
+                    queryset = queryset.filter(**{lookup: int(params[param])})
+                except ValueError:
+                    raise ApiError(f'Invalid {param}')
+
+        columns = {'pk', *(field.lstrip('-') for field in self.ordering)}
+
+        for name in fields:
+            columns.update(self.fields[name].columns)
+
+        for name in expand:
+            expansion = self.expansions[name]
+            columns.update(expansion.columns)
+
+            if expansion.select_related:
+                queryset = queryset.select_related(expansion.select_related)
+
+            if expansion.prefetch:
+                queryset = queryset.prefetch_related(expansion.prefetch)
+
+        return queryset.only(*columns)
+
+    def prepare(self, objects, expand):
+
+        """
+        Load what the serialization of the loaded objects still needs, once for the whole page
+        """
+
+    def serialize(self, obj, fields, expand):
+
+        data = {name: self.fields[name].get(obj) for name in fields}
+
+        for name in expand:
+            data[name] = self.expansions[name].get(obj)
+
+        return data
+
+
+class RecipeResource(Resource):
+
+    name = 'recipes'
+    model = Recipe
+    counters = [Recipe]
+    ordering = ['-likes_count', 'name', 'pk']
+    fields = {
+        'id': Field('id'),
+        'name': Field('name'),
+        'description': Field('description'),
+        'preparing': Field('preparing'),
+        'preparation_time': Field('preparation_time', get=lambda obj: obj.preparation_time.total_seconds()),
+        'calories': Field('calories'),
+        'likes_count': Field('likes_count'),
+        'comments_count': Field('comments_count'),
+        'create_date': Field('create_date'),
+        'create_by': Field('create_by', get=lambda obj: obj.create_by_id),
+        'image': Field('image', 'image_variants', get=lambda obj: obj.image.variant_urls),
+    }
+    expansions = {
+        'create_by': Expansion(
+            get=lambda obj: user_data(obj.create_by),
+            models=[User],
+            columns=['create_by', 'create_by__id', 'create_by__username'],
+            select_related='create_by',
+        ),
+        'ingredients': Expansion(
+            get=lambda obj: [
+                {
+                    'ingredient': {'id': item.ingredient.pk, 'name': item.ingredient.name},
+                    'quantity': item.quantity,
+                    'amount': item.amount,
+                    'unit': item.unit,
+                }
+                for item in obj.recipe_ingredients.all()
+            ],
+            models=[IngredientRecipe, Ingredient],
+            prefetch=Prefetch(
+                'recipe_ingredients',
+                queryset=IngredientRecipe.objects.select_related('ingredient').order_by('ingredient__name'),
+            ),
+        ),
+    }
+
+
+class ScheduleResource(Resource):
+
+    name = 'schedules'
+    model = Schedule
+    counters = [Schedule]
+    ordering = ['-likes_count', 'name', 'pk']
+    fields = {
+        'id': Field('id'),
+        'name': Field('name'),
+        'description': Field('description'),
+        'likes_count': Field('likes_count'),
+        'create_date': Field('create_date'),
+        'create_by': Field('create_by', get=lambda obj: obj.create_by_id),
+    }
+    expansions = {
+        'create_by': Expansion(
+            get=lambda obj: user_data(obj.create_by),
+            models=[User],
+            columns=['create_by', 'create_by__id', 'create_by__username'],
+            select_related='create_by',
+        ),
+        'slots': Expansion(
+            get=lambda obj: [
+                {
+                    'day_number': slot.day_number,
+                    'meal_number': slot.meal_number,
+                    'recipe': None if slot.recipe is None else {'id': slot.recipe.pk, 'name': slot.recipe.name},
+                }
+                for slot in obj.schedule_recipes.all()
+            ],
+            models=[RecipeSchedule, Recipe],
+            prefetch=Prefetch(
+                'schedule_recipes',
+                queryset=RecipeSchedule.objects.select_related('recipe').only(
+                    'schedule', 'day_number', 'meal_number', 'recipe', 'recipe__id', 'recipe__name'
+                ),
+            ),
+        ),
+        'nutrition': Expansion(
+            get=lambda obj: {
+                'calories': obj.nutrition.calories,
+                'weight': obj.nutrition.weight,
+                'meals': obj.nutrition.meals,
+                'days': obj.nutrition.days,
+            },
+            models=[RecipeSchedule, Recipe, IngredientRecipe],
+            prefetch='nutrition',
+        ),
+    }
+
+    def prepare(self, objects, expand):
+
+        # summaries not stored yet are computed without storing, like on the schedule page, for the whole page at once
+        if 'nutrition' not in expand:
+            return
+
+        missing = {obj.pk: obj for obj in objects if not hasattr(obj, 'nutrition')}
+
+        for pk, nutrition in ScheduleNutrition.summarize(list(missing)).items():
+            missing[pk].nutrition = nutrition
+
+
+class IngredientResource(Resource):
+
+    name = 'ingredients'
+    model = Ingredient
+    ordering = ['name', 'pk']
+    fields = {
+        'id': Field('id'),
+        'name': Field('name'),
+        'create_by': Field('create_by', get=lambda obj: obj.create_by_id),
+    }
+    expansions = {
+        'create_by': Expansion(
+            get=lambda obj: user_data(obj.create_by),
+            models=[User],
+            columns=['create_by', 'create_by__id', 'create_by__username'],
+            select_related='create_by',
+        ),
+    }
+
+
+class CommentResource(Resource):
+
+    name = 'comments'
+    model = CommentRecipe
+    ordering = CommentRecipe.SEEK_ORDERING
+    filters = {'recipe': 'recipe_id', 'user': 'user_id'}
+    fields = {
+        'id': Field('id'),
+        'comment': Field('comment'),
+        'date_added': Field('date_added'),
+        'recipe': Field('recipe', get=lambda obj: obj.recipe_id),
+        'user': Field('user', get=lambda obj: obj.user_id),
+    }
+    expansions = {
+        'user': Expansion(
+            get=lambda obj: user_data(obj.user),
+            models=[User],
+            columns=['user', 'user__id', 'user__username'],
+            select_related='user',
+        ),
+        'recipe': Expansion(
+            get=lambda obj: {'id': obj.recipe.pk, 'name': obj.recipe.name},
+            models=[Recipe],
+            columns=['recipe', 'recipe__id', 'recipe__name'],
+            select_related='recipe',
+        ),
+    }
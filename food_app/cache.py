@@ -0,0 +1,180 @@
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+
+CACHE_PREFIX = 'food_app'
+
+
+def get_cache_timeout():
+
+    return getattr(settings, 'FOOD_APP_CACHE_TIMEOUT', 60 * 60)
+
+
+def version_key(model):
+
+    return f'{CACHE_PREFIX}:version:{model._meta.label_lower}'
+
+
+def counters_version_key(model):
+
+    return f'{CACHE_PREFIX}:version:{model._meta.label_lower}:counters'
+
+
+def get_version(key):
+
+    version = cache.get(key)
+
+    if version is None:
+        # start from a clock value, so an evicted counter never reuses an old version
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+
+    return version
+
+
+def get_model_version(model):
+
+    """
+    Return the version counter of the model, bumped on every change of its rows
+    """
+    return get_version(version_key(model))
+
+
+def get_counters_version(model):
+
+    """
+    Return the version counter of the denormalized counters of the model (likes_count, comments_count)
+
+    Likes and comments only bump this one, so caches that do not show the counters survive every click.
+    """
+    return get_version(counters_version_key(model))
+
+
+def increment_version(key):
+
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def bump_version(key):
+
+    """
+    Increment the version counter once the current transaction commits, right away outside of one
+
+    Bumped inside the transaction, a concurrent request could cache the rows it still sees as the old ones under
+    the new version, where they would stay until the next change.
+    """
+    transaction.on_commit(lambda: increment_version(key))
+
+
+def bump_model_version(model):
+
+    bump_version(version_key(model))
+
+
+def bump_counters_version(model, pks=()):
+
+    """
+    Bump after the counters of the rows pks changed, through an UPDATE that bypasses the model signals
+    """
+    bump_version(counters_version_key(model))
+
+    for pk in pks:
+        bump_object_version(model, pk)
+
+
+def object_version_key(model, pk):
+
+    return f'{CACHE_PREFIX}:version:{model._meta.label_lower}:{pk}'
+
+
+def get_object_versions(model, pks):
+
+    """
+    Return {pk: version} of single rows, for caches that must not expire on changes of other rows
+    """
+    keys = {object_version_key(model, pk): pk for pk in pks}
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+
+    for key, version in missing.items():
+        cache.add(key, version, timeout=None)
+
+    if missing:
+        versions.update(cache.get_many(missing))
+
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def bump_object_version(model, pk):
+
+    bump_version(object_version_key(model, pk))
+
+
+def get_versions_key(models, counters=()):
+
+    versions = [get_model_version(model) for model in models]
+    versions += [get_counters_version(model) for model in counters]
+
+    return ':'.join(str(version) for version in versions)
+
+
+def cached_queryset(name, models, queryset, counters=()):
+
+    """
+    Return the evaluated queryset as a list, cached until one of models changes
+
+    A miss is filled from the primary: a lagging replica could still return the rows of before the change that
+    bumped the version, and they would be served under the new one until the next change.
+    """
+    key = f'{CACHE_PREFIX}:queryset:{name}:{get_versions_key(models, counters)}'
+    object_list = cache.get(key)
+
+    if object_list is None:
+        object_list = list(queryset.using(DEFAULT_DB_ALIAS))
+        cache.set(key, object_list, timeout=get_cache_timeout())
+
+    return object_list
+
+
+class CacheVersions:
+
+    """
+    Lazy access to model version counters from templates, e.g. cache_versions.recipe
+
+    With counters set it gives the versions of the denormalized counters instead, e.g. counter_versions.recipe
+    """
+    def __init__(self, app_label, counters=False):
+
+        self.app_label = app_label
+        self.counters = counters
+
+    def __getitem__(self, model_name):
+
+        try:
+            model = apps.get_model(self.app_label, model_name)
+        except LookupError:
+            raise KeyError(model_name)
+
+        return get_counters_version(model) if self.counters else get_model_version(model)
+
+
+def get_cached_choices(model):
+
+    """
+    Return the (pk, label) choices of all model rows, shared until the model changes
+    """
+    key = f'{CACHE_PREFIX}:choices:{model._meta.label_lower}:{get_model_version(model)}'
+    choices = cache.get(key)
+
+    if choices is None:
+        choices = [(obj.pk, str(obj)) for obj in model.objects.using(DEFAULT_DB_ALIAS)]
+        cache.set(key, choices, timeout=get_cache_timeout())
+
+    return choices
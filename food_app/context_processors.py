@@ -0,0 +1,18 @@
+from .cache import CacheVersions, get_cache_timeout
+from .routers import get_pin_seconds, reads_replica
+
+
+def cache_versions(request):
+
+    # fragments rendered from a replica may miss the change that bumped the version, so they are kept no longer
+    # than the replication lag allowed for by the pin cookie
+    timeout = get_cache_timeout()
+
+    if reads_replica():
+        timeout = min(timeout, get_pin_seconds())
+
+    return {
+        'cache_versions': CacheVersions('food_app'),
+        'counter_versions': CacheVersions('food_app', counters=True),
+        'cache_timeout': timeout,
+    }
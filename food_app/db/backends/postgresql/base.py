@@ -0,0 +1,8 @@
+from django.db.backends.postgresql import base
+
+from food_app.db.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+
+    pass
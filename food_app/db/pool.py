@@ -0,0 +1,258 @@
+import logging
+import threading
+import time
+
+from collections import deque
+
+from django.db.utils import OperationalError
+
+
+logger = logging.getLogger(__name__)
+
+# DATABASES[alias]['POOL'] entries override these
+POOL_DEFAULTS = {
+    # connections a worker process keeps open at most
+    'SIZE': 5,
+    # seconds a request waits for a free connection before PoolTimeout
+    'TIMEOUT': 10,
+    # seconds an unused connection stays open
+    'IDLE_TIMEOUT': 300,
+    # connections unused for longer are checked with SELECT 1 before they are handed out
+    'HEALTH_CHECK_INTERVAL': 30,
+}
+
+
+class PoolTimeout(OperationalError):
+
+    pass
+
+
+class ConnectionPool:
+
+    """
+    Open database connections of one alias shared by the threads of a worker process
+    """
+    def __init__(self, alias, size, timeout, idle_timeout, health_check_interval):
+
+        self.alias = alias
+        self.size = size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        # (connection, returned at, checked) of the free connections, the last returned is reused first
+        self.idle = deque()
+        self.in_use = 0
+        self.condition = threading.Condition()
+        self.reset_stats()
+
+    def reset_stats(self):
+
+        with self.condition:
+            self.checkouts = 0
+            self.created = 0
+            self.waits = 0
+            self.wait_time = 0.0
+            self.wait_time_max = 0.0
+            self.timeouts = 0
+            self.health_check_failures = 0
+            self.idle_closed = 0
+
+    def checkout(self, connect):
+
+        """
+        Return a free connection, a new one from connect() while the pool is not full, otherwise wait for one
+
+        Raises PoolTimeout when no connection is returned within the timeout.
+        """
+        start = time.monotonic()
+        deadline = start + self.timeout
+
+        with self.condition:
+            while True:
+                self.close_idle()
+
+                if self.idle or self.in_use < self.size:
+                    break
+
+                remaining = deadline - time.monotonic()
+
+                if remaining <= 0:
+                    self.timeouts += 1
+
+                    raise PoolTimeout(f'No free connection of {self.alias} within {self.timeout} s')
+
+                self.condition.wait(remaining)
+
+            waited = time.monotonic() - start
+            self.checkouts += 1
+            self.wait_time += waited
+            self.wait_time_max = max(self.wait_time_max, waited)
+
+            if waited > 0.001:
+                self.waits += 1
+
+            self.in_use += 1
+            idle = self.idle.pop() if self.idle else None
+
+        try:
+            if idle is not None:
+                connection, returned_at, checked = idle
+
+                if checked and time.monotonic() - returned_at < self.health_check_interval:
+                    return connection
+
+                if self.is_usable(connection):
+                    return connection
+
+                with self.condition:
+                    self.health_check_failures += 1
+
+                self.close(connection)
+
+            connection = connect()
+
+            with self.condition:
+                self.created += 1
+
+            return connection
+        except BaseException:
+            self.release()
+            raise
+
+    def checkin(self, connection, checked=True):
+
+        """
+        Take back a connection, checked=False has it tested before its next use
+        """
+        with self.condition:
+            self.in_use -= 1
+            self.idle.append((connection, time.monotonic(), checked))
+            self.condition.notify()
+
+    def discard(self, connection):
+
+        self.close(connection)
+        self.release()
+
+    def release(self):
+
+        with self.condition:
+            self.in_use -= 1
+            self.condition.notify()
+
+    def close_idle(self):
+
+        # the least recently returned connections sit at the left
+        now = time.monotonic()
+
+        while self.idle and now - self.idle[0][1] > self.idle_timeout:
+            connection, _, _ = self.idle.popleft()
+            self.idle_closed += 1
+            self.close(connection)
+
+    def close_all(self):
+
+        with self.condition:
+            while self.idle:
+                self.close(self.idle.popleft()[0])
+
+    @staticmethod
+    def is_usable(connection):
+
+        try:
+            cursor = connection.cursor()
+            cursor.execute('SELECT 1')
+            cursor.close()
+        except Exception:
+            return False
+
+        return True
+
+    @staticmethod
+    def close(connection):
+
+        try:
+            connection.close()
+        except Exception:
+            logger.warning('Closing a pooled connection failed', exc_info=True)
+
+    def stats(self):
+
+        with self.condition:
+            return {
+                'size': self.size,
+                'in_use': self.in_use,
+                'idle': len(self.idle),
+                'checkouts': self.checkouts,
+                'created': self.created,
+                'waits': self.waits,
+                'wait_ms_avg': round(self.wait_time / self.checkouts * 1000, 3) if self.checkouts else 0,
+                'wait_ms_max': round(self.wait_time_max * 1000, 3),
+                'timeouts': self.timeouts,
+                'health_check_failures': self.health_check_failures,
+                'idle_closed': self.idle_closed,
+            }
+
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+def get_pool(alias, settings_dict):
+
+    # the test runner points an alias at another database, whose connections must not mix with the first ones
+    key = (alias, *(settings_dict.get(name) for name in ['NAME', 'USER', 'HOST', 'PORT']))
+
+    with pools_lock:
+        if key not in pools:
+            options = {**POOL_DEFAULTS, **settings_dict.get('POOL', {})}
+            pools[key] = ConnectionPool(
+                alias=alias,
+                size=options['SIZE'],
+                timeout=options['TIMEOUT'],
+                idle_timeout=options['IDLE_TIMEOUT'],
+                health_check_interval=options['HEALTH_CHECK_INTERVAL'],
+            )
+
+        return pools[key]
+
+
+def get_pool_stats():
+
+    with pools_lock:
+        return {':'.join(str(part) for part in key if part): pool.stats() for key, pool in pools.items()}
+
+
+class PooledDatabaseWrapperMixin:
+
+    """
+    Take connections of a database backend from the process pool and hand them back on close
+
+    Use it with CONN_MAX_AGE = 0, so Django closes, here returns, the connection at the end of every request.
+    """
+    @property
+    def pool(self):
+
+        return get_pool(self.alias, self.settings_dict)
+
+    def get_new_connection(self, conn_params):
+
+        return self.pool.checkout(lambda: super(PooledDatabaseWrapperMixin, self).get_new_connection(conn_params))
+
+    def _close(self):
+
+        if self.connection is None:
+            return
+
+        # Django keeps using a connection closed inside atomic until the block exits, so it is never shared
+        if self.in_atomic_block:
+            self.pool.discard(self.connection)
+            return
+
+        try:
+            if not self.get_autocommit():
+                self.connection.rollback()
+        except Exception:
+            self.pool.discard(self.connection)
+        else:
+            self.pool.checkin(self.connection, checked=not self.errors_occurred)
@@ -1,9 +1,12 @@
 from django import forms
 from django.contrib.auth import authenticate
 from django.core.exceptions import ValidationError
+from django.utils.functional import cached_property
 
 from .models import User, Ingredient, Recipe, IngredientRecipe, CommentRecipe, Schedule, RecipeSchedule
 from .validators import validate_password
+from .search import get_search_backend
+from .cache import get_cached_choices
 
 
 class DurationInput(forms.TimeInput):
@@ -165,6 +168,16 @@ class SearchForm(forms.Form):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['name'].widget.attrs['placeholder'] = 'Nazwa'
+        self.search_backend = get_search_backend()
+
+    def search(self, queryset, field=None):
+
+        query = self.cleaned_data['name']
+
+        if field:
+            return self.search_backend.search_related(queryset, field, query)
+        
+        return self.search_backend.search(queryset, query)
 
 
 class IngredientForm(forms.ModelForm):
@@ -186,6 +199,10 @@ class RecipeFormStep1(forms.ModelForm):
             'ingredients': forms.CheckboxSelectMultiple(attrs={'class': "checkbox-style"}),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['ingredients'].choices = get_cached_choices(Ingredient)
+
 
 class RecipeFormStep2(forms.ModelForm):
 
@@ -213,17 +230,108 @@ class RecipeFormStep3(forms.ModelForm):
         }
 
 
-class IngredientRecipeForm(forms.ModelForm):
+class PreloadedModelChoiceField(forms.ModelChoiceField):
+
+    """
+    ModelChoiceField looking the submitted value up in objects loaded once for the whole formset
+    """
+    objects = None
+
+    def to_python(self, value):
+
+        if self.objects is not None and value not in self.empty_values:
+            try:
+                return self.objects[int(value)]
+            except (KeyError, TypeError, ValueError):
+                pass
+
+        return super().to_python(value)
+
+
+class PreloadedChoicesFormMixin:
+
+    """
+    Leave out PreloadedModelChoiceField values from the per row existence check of the model validation, the form
+    field has already found their objects, the unique checks still see them
+    """
+    def _get_validation_exclusions(self):
+
+        exclude = super()._get_validation_exclusions()
+        exclude.extend(name for name, field in self.fields.items() if isinstance(field, PreloadedModelChoiceField))
+
+        return exclude
+
+    def validate_unique(self):
+
+        try:
+            self.instance.validate_unique(exclude=super()._get_validation_exclusions())
+        except ValidationError as error:
+            self._update_errors(error)
+
+
+def get_submitted_objects(formset, field):
+
+    """
+    Return {pk: object} of the field values posted to the formset, loaded with one query
+    """
+    if not formset.is_bound:
+        return None
+
+    pks = set()
+
+    for index in range(formset.total_form_count()):
+        try:
+            pks.add(int(formset.data.get(f'{formset.add_prefix(index)}-{field}')))
+        except (TypeError, ValueError):
+            continue
+
+    return formset.model._meta.get_field(field).related_model.objects.in_bulk(pks)
+
+
+class IngredientRecipeForm(PreloadedChoicesFormMixin, forms.ModelForm):
 
     class Meta:
         model = IngredientRecipe
         fields = ['ingredient', 'quantity']
+        field_classes = {
+            'ingredient': PreloadedModelChoiceField,
+        }
+
+    def __init__(self, *args, ingredient_choices=None, ingredient_objects=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        
+        if ingredient_choices is not None:
+            self.fields['ingredient'].choices = [('', self.fields['ingredient'].empty_label)] + ingredient_choices
+
+        self.fields['ingredient'].objects = ingredient_objects
+
+
+class BaseIngredientRecipeFormset(forms.BaseInlineFormSet):
+
+    @cached_property
+    def ingredient_choices(self):
+
+        return get_cached_choices(Ingredient)
+
+    @cached_property
+    def ingredient_objects(self):
+
+        return get_submitted_objects(self, 'ingredient')
+
+    def get_form_kwargs(self, index):
+
+        kwargs = super().get_form_kwargs(index)
+        kwargs['ingredient_choices'] = self.ingredient_choices
+        kwargs['ingredient_objects'] = self.ingredient_objects
+
+        return kwargs
 
 
 IngredientRecipeFormset = forms.inlineformset_factory(
     parent_model=Recipe,
     model=IngredientRecipe,
     form=IngredientRecipeForm,
+    formset=BaseIngredientRecipeFormset,
     extra=0,
     can_delete=True
 )
@@ -255,21 +363,51 @@ class ScheduleForm(forms.ModelForm):
         }
 
 
-class RecipeScheduleForm(forms.ModelForm):
+class RecipeScheduleForm(PreloadedChoicesFormMixin, forms.ModelForm):
 
     class Meta:
         model = RecipeSchedule
         fields = ['recipe', 'day_number', 'meal_number']
+        field_classes = {
+            'recipe': PreloadedModelChoiceField,
+        }
         
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, recipe_choices=None, recipe_objects=None, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['recipe'].empty_label = 'Wybierz przepis'
 
+        if recipe_choices is not None:
+            self.fields['recipe'].choices = [('', self.fields['recipe'].empty_label)] + recipe_choices
+
+        self.fields['recipe'].objects = recipe_objects
+
+
+class BaseRecipeScheduleFormset(forms.BaseInlineFormSet):
+
+    @cached_property
+    def recipe_choices(self):
+
+        return get_cached_choices(Recipe)
+
+    @cached_property
+    def recipe_objects(self):
+
+        return get_submitted_objects(self, 'recipe')
+
+    def get_form_kwargs(self, index):
+
+        kwargs = super().get_form_kwargs(index)
+        kwargs['recipe_choices'] = self.recipe_choices
+        kwargs['recipe_objects'] = self.recipe_objects
+
+        return kwargs
+
 
 RecipeScheduleFormset = forms.inlineformset_factory(
     parent_model=Schedule,
     model=RecipeSchedule,
     form=RecipeScheduleForm,
+    formset=BaseRecipeScheduleFormset,
     min_num=35,
     max_num=35,
     can_delete=False 
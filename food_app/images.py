@@ -0,0 +1,312 @@
+import logging
+import queue
+import threading
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import PurePosixPath
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.db.models.fields.files import ImageFieldFile
+from django.db.models.signals import post_save
+
+from django_resized import ResizedImageField
+
+from .cache import bump_model_version
+from .imaging import IMAGE_FORMATS, render_variants
+
+
+logger = logging.getLogger(__name__)
+
+CROP_CENTERING = {
+    'top': 0, 'middle': 0.5, 'bottom': 1,
+    'left': 0, 'center': 0.5, 'right': 1,
+}
+
+
+def get_image_workers():
+
+    return getattr(settings, 'FOOD_APP_IMAGE_WORKERS', 2)
+
+
+def get_variant_name(name, variant):
+
+    """
+    Return the storage name of a variant, derived from the source name so it can be found without the row
+    """
+    path = PurePosixPath(name)
+    size_name, extension = variant.rsplit('_', 1)
+
+    return str(path.with_name(f'{path.stem}_{size_name}.{extension}'))
+
+
+class DeferredImageFieldFile(ImageFieldFile):
+
+    """
+    Stores the upload untouched, its resized variants are rendered later by the image queue
+    """
+    def save(self, name, content, save=True):
+
+        # FieldFile.save replaces itself on the instance, so the flag for post_save is kept on the instance
+        self.instance._unprocessed_images = getattr(self.instance, '_unprocessed_images', set()) | {self.field.name}
+        super().save(name, content, save)
+
+    @property
+    def is_shared(self):
+
+        return hasattr(self.storage, 'is_referenced') and self.storage.is_referenced(self.name)
+
+    def delete(self, save=True):
+
+        # variants of a content addressed file are shared by every row holding the same file
+        if self.name and not self.is_shared:
+            for variant in self.field.variant_keys:
+                delete_variant(self.storage, get_variant_name(self.name, variant))
+
+        super().delete(save)
+
+    @property
+    def is_default(self):
+
+        return self.name == self.field.get_default()
+
+    @property
+    def variants(self):
+
+        data = getattr(self.instance, self.field.variants_field, None) or {}
+
+        if not self.name or data.get('source') != self.name:
+            return {}
+
+        return data.get('variants', {})
+
+    @property
+    def pending(self):
+
+        return bool(self.name) and not self.is_default and not self.variants
+
+    @property
+    def url(self):
+
+        if self.is_default:
+            return super().url
+
+        name = self.variants.get('main_png')
+
+        return self.storage.url(name or self.field.get_default())
+
+    @property
+    def variant_urls(self):
+
+        """
+        Return {'<size>_<format>': url}, falling back to url for variants not rendered yet
+        """
+        variants = self.variants
+        url = self.url
+
+        return {
+            variant: self.storage.url(variants[variant]) if variant in variants else url
+            for variant in self.field.variant_keys
+        }
+
+
+class DeferredResizedImageField(ResizedImageField):
+
+    """
+    ResizedImageField that keeps request time constant, moving decoding and re-encoding to the image queue
+
+    Variants of every size in sizes plus the main size are stored as PNG and WebP next to the upload,
+    their names are kept in the JSONField named by variants_field.
+    """
+    attr_class = DeferredImageFieldFile
+
+    def __init__(self, verbose_name=None, name=None, sizes=None, variants_field=None, **kwargs):
+
+        self.sizes = sizes or {}
+        self.variants_field = variants_field
+        super().__init__(verbose_name, name, **kwargs)
+
+    def deconstruct(self):
+
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['sizes'] = self.sizes
+        kwargs['variants_field'] = self.variants_field
+
+        return name, path, args, kwargs
+
+    def contribute_to_class(self, cls, name, **kwargs):
+
+        super().contribute_to_class(cls, name, **kwargs)
+
+        if hasattr(self.storage, 'register'):
+            self.storage.register(cls, name)
+
+        if not cls._meta.abstract:
+            post_save.connect(self.queue_processing, sender=cls, dispatch_uid=f'queue_processing_{cls.__name__}_{name}')
+
+    @property
+    def variant_sizes(self):
+
+        return {'main': self.size, **self.sizes}
+
+    @property
+    def variant_keys(self):
+
+        return [f'{size_name}_{extension}' for size_name in self.variant_sizes for extension in IMAGE_FORMATS]
+
+    @property
+    def centering(self):
+
+        vertical, horizontal = self.crop or ['middle', 'center']
+
+        return (CROP_CENTERING[horizontal], CROP_CENTERING[vertical])
+
+    def queue_processing(self, sender, instance, raw=False, **kwargs):
+
+        unprocessed = getattr(instance, '_unprocessed_images', set())
+
+        if raw or self.name not in unprocessed:
+            return
+
+        unprocessed.discard(self.name)
+        job = (sender._meta.label, self.name, getattr(instance, self.attname).name)
+        transaction.on_commit(lambda: image_queue.put(job))
+
+
+def save_variant(storage, name, content):
+
+    if hasattr(storage, 'save_derived'):
+        return storage.save_derived(name, content)
+
+    storage.delete(name)
+
+    return storage.save(name, content)
+
+
+def delete_variant(storage, name):
+
+    if hasattr(storage, 'delete_derived'):
+        return storage.delete_derived(name)
+
+    storage.delete(name)
+
+
+def process_image(label, field_name, name, render=render_variants):
+
+    """
+    Render and store the variants of the image, then publish them on the rows holding it unless it changed meanwhile
+    """
+    model = apps.get_model(label)
+    field = model._meta.get_field(field_name)
+    storage = field.storage
+    rows = model.objects.filter(**{field_name: name})
+
+    # a deduplicated upload reuses the variants already rendered for another row
+    processed = rows.filter(**{f'{field.variants_field}__source': name}) \
+        .values_list(field.variants_field, flat=True).first()
+
+    if processed:
+        updated = rows.update(**{field.variants_field: processed})
+        bump_model_version(model)
+
+        return bool(updated)
+
+    variants = {}
+
+    try:
+        with storage.open(name) as image_file:
+            data = image_file.read()
+
+        for variant, content in render(data, field.variant_sizes, field.centering).items():
+            variants[variant] = save_variant(storage, get_variant_name(name, variant), ContentFile(content))
+    except Exception:
+        logger.exception('Rendering the variants of %s failed, the original is served instead', name)
+
+        for variant_name in variants.values():
+            delete_variant(storage, variant_name)
+
+        # every variant points to the upload itself, so the row is not pending anymore
+        variants = dict.fromkeys(field.variant_keys, name)
+
+    updated = rows.update(
+        **{field.variants_field: {'source': name, 'variants': variants}}
+    )
+
+    if not updated:
+        for variant_name in set(variants.values()) - {name}:
+            delete_variant(storage, variant_name)
+
+        return False
+
+    bump_model_version(model)
+
+    return True
+
+
+class ImageQueue:
+
+    """
+    Local stand-in for a task broker, jobs are handed over by threads to a process pool
+
+    The pool and its feeding threads start with the first upload of the process, so the request only stores the
+    file. Jobs are kept in memory only, the process_images command has to run periodically to render the variants
+    of uploads lost on a restart. With no workers configured, an opt-in for tests and development, the jobs run
+    inline in the thread that commits the upload.
+    """
+    def __init__(self, workers=None):
+
+        self.workers = workers
+        self.jobs = queue.Queue()
+        self.executor = None
+        self.threads = []
+        self.lock = threading.Lock()
+
+    def start(self):
+
+        with self.lock:
+            if self.threads:
+                return
+
+            workers = get_image_workers() if self.workers is None else self.workers
+            self.executor = ProcessPoolExecutor(max_workers=workers)
+
+            for number in range(workers):
+                thread = threading.Thread(target=self.run, name=f'image-queue-{number}', daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def put(self, job):
+
+        workers = get_image_workers() if self.workers is None else self.workers
+
+        if not workers:
+            return process_image(*job)
+
+        self.start()
+        self.jobs.put(job)
+
+    def join(self):
+
+        self.jobs.join()
+
+    def render(self, data, sizes, centering):
+
+        return self.executor.submit(render_variants, data, sizes, centering).result()
+
+    def run(self):
+
+        while True:
+            job = self.jobs.get()
+
+            try:
+                process_image(*job, render=self.render)
+            except Exception:
+                logger.exception('Processing of image %s failed', job)
+            finally:
+                close_old_connections()
+                self.jobs.task_done()
+
+
+image_queue = ImageQueue()
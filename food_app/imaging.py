@@ -0,0 +1,44 @@
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+
+IMAGE_FORMATS = {
+    'png': 'PNG',
+    'webp': 'WEBP',
+}
+
+WEBP_QUALITY = 80
+
+
+def open_image(data):
+
+    image = Image.open(BytesIO(data))
+    image = ImageOps.exif_transpose(image)
+
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+
+    return image
+
+
+def render_variants(data, sizes, centering=(0.5, 0.5)):
+
+    """
+    Return {'<size>_<format>': bytes} of the image cropped to every size, in every format
+
+    Runs in the worker processes, so it only depends on Pillow and picklable arguments.
+    """
+    image = open_image(data)
+    variants = {}
+
+    for size_name, size in sizes.items():
+        thumb = ImageOps.fit(image, tuple(size), Image.Resampling.LANCZOS, centering=centering)
+
+        for extension, image_format in IMAGE_FORMATS.items():
+            content = BytesIO()
+            options = {'quality': WEBP_QUALITY, 'method': 4} if image_format == 'WEBP' else {'optimize': True}
+            thumb.save(content, format=image_format, **options)
+            variants[f'{size_name}_{extension}'] = content.getvalue()
+
+    return variants
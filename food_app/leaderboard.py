@@ -0,0 +1,147 @@
+import logging
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Recipe, Schedule, LeaderboardEntry
+from .cache import cached_queryset, bump_model_version
+
+
+logger = logging.getLogger(__name__)
+
+BOARDS = {
+    'recipes': (Recipe, False),
+    'recipes-window': (Recipe, True),
+    'schedules': (Schedule, False),
+    'schedules-window': (Schedule, True),
+}
+
+
+def get_leaderboard_size():
+
+    return getattr(settings, 'FOOD_APP_LEADERBOARD_SIZE', 10)
+
+
+def get_leaderboard_window():
+
+    return timedelta(days=getattr(settings, 'FOOD_APP_LEADERBOARD_WINDOW_DAYS', 7))
+
+
+def get_board_ranking(board):
+
+    """
+    Return the current top (pk, score) pairs of the board, straight from the source tables
+    """
+    model, window = BOARDS[board]
+    size = get_leaderboard_size()
+
+    if not window:
+        return list(model.objects.order_by('-likes_count', 'name').values_list('pk', 'likes_count')[:size])
+
+    field = model._meta.model_name
+    likes = model.likes.through.objects.filter(date_added__gte=timezone.now() - get_leaderboard_window())
+
+    return list(
+        likes.values(field).annotate(score=Count('pk')).order_by('-score', field).values_list(field, 'score')[:size]
+    )
+
+
+def refresh_board(board):
+
+    """
+    Replace the entries of the board with its current ranking
+
+    Concurrent refreshes of a filled board wait for each other on the row locks and rank after the wait, so the
+    last one sees every committed like. Refreshes of an empty board have nothing to lock, the one that loses the
+    race on the (board, position) key leaves the board to the winner.
+    """
+    model, window = BOARDS[board]
+    field = model._meta.model_name
+
+    try:
+        with transaction.atomic():
+            list(LeaderboardEntry.objects.select_for_update().filter(board=board).values_list('pk', flat=True))
+            ranking = get_board_ranking(board)
+            LeaderboardEntry.objects.filter(board=board).delete()
+            LeaderboardEntry.objects.bulk_create([
+                LeaderboardEntry(board=board, position=position, score=score, **{f'{field}_id': pk})
+                for position, (pk, score) in enumerate(ranking, start=1)
+            ])
+    except IntegrityError:
+        logger.info('Board %s was refreshed by a concurrent request', board)
+
+        return None
+
+    bump_model_version(LeaderboardEntry)
+
+    return len(ranking)
+
+
+def refresh_boards():
+
+    return {board: refresh_board(board) for board in BOARDS}
+
+
+def refresh_model_boards(model):
+
+    return {board: refresh_board(board) for board, (board_model, window) in BOARDS.items() if board_model is model}
+
+
+def get_board(board):
+
+    """
+    Return the cached entries of the board, built on first use
+    """
+    model, window = BOARDS[board]
+    field = model._meta.model_name
+
+    def read_board():
+
+        return cached_queryset(
+            name=f'leaderboard-{board}',
+            models=[LeaderboardEntry, model],
+            counters=[model],
+            queryset=LeaderboardEntry.objects.filter(board=board).select_related(field)
+        )
+
+    entries = read_board()
+
+    if not entries and refresh_board(board):
+        entries = read_board()
+
+    return entries
+
+
+def get_score(board, obj):
+
+    model, window = BOARDS[board]
+
+    if not window:
+        return model.objects.filter(pk=obj.pk).values_list('likes_count', flat=True).first() or 0
+
+    return model.likes.through.objects.filter(
+        **{model._meta.model_name: obj}, date_added__gte=timezone.now() - get_leaderboard_window()
+    ).count()
+
+
+def update_boards(obj):
+
+    """
+    Refresh the boards of obj after its likes changed, only when it is or may get on the board
+    """
+    for board, (model, window) in BOARDS.items():
+        if not isinstance(obj, model):
+            continue
+
+        entries = list(LeaderboardEntry.objects.filter(board=board).values_list(f'{model._meta.model_name}_id', 'score'))
+
+        if (
+            len(entries) < get_leaderboard_size()
+            or obj.pk in [pk for pk, score in entries]
+            or get_score(board, obj) >= entries[-1][1]
+        ):
+            refresh_board(board)
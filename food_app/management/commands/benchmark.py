@@ -0,0 +1,188 @@
+import json
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from food_app.models import User, Ingredient, Recipe, Schedule
+
+
+BENCHMARK_NAME = 'Benchmark'
+
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'food_app-benchmark',
+    }
+}
+
+
+class Command(BaseCommand):
+
+    help = 'Measure p50/p95 latency and query counts of the main views through the test client, printed as JSON'
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--output', help='File the JSON baseline is written to, stdout when not given')
+
+    def handle(self, *args, **options):
+
+        if not Recipe.objects.exists() or not Schedule.objects.exists():
+            raise CommandError('No data to measure, run generate_data first')
+
+        # the test runner has already set up the environment when the command runs from a test
+        try:
+            setup_test_environment()
+        except RuntimeError:
+            own_environment = False
+        else:
+            own_environment = True
+
+        # requests run in autocommit like in production, so their timings include the commits; cache versions,
+        # choices and leaderboards go to a private cache, which keeps the shared one untouched
+        last_recipe = Recipe.objects.aggregate(pk=Max('pk'))['pk']
+        last_schedule = Schedule.objects.aggregate(pk=Max('pk'))['pk']
+
+        try:
+            with override_settings(CACHES=BENCHMARK_CACHES):
+                try:
+                    results = self.run_scenarios(options['iterations'], options['warmup'])
+                finally:
+                    # the rows the wizards created are deleted, so the benchmark can be repeated on the same data
+                    Schedule.objects.filter(pk__gt=last_schedule, name=BENCHMARK_NAME).delete()
+                    Recipe.objects.filter(pk__gt=last_recipe, name=BENCHMARK_NAME).delete()
+                    cache.clear()
+        finally:
+            if own_environment:
+                teardown_test_environment()
+
+        baseline = json.dumps(results, indent=2)
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(baseline + '\n')
+        else:
+            self.stdout.write(baseline)
+
+    def run_scenarios(self, iterations, warmup):
+
+        user = User.objects.filter(is_active=True, recipes__isnull=False).first()
+        recipe = Recipe.objects.order_by('-likes_count', 'pk').first()
+        schedule = Schedule.objects.filter(schedule_recipes__isnull=False).order_by('-likes_count', 'pk').first()
+        term = recipe.name.split()[0]
+
+        visitor = Client()
+        member = Client()
+        member.force_login(user)
+
+        scenarios = {
+            'index': lambda: visitor.get(reverse('index')),
+            'recipe-list': lambda: visitor.get(reverse('recipe-list')),
+            'recipe-list-cursor': lambda: visitor.get(reverse('recipe-list') + '?cursor='),
+            'recipe-detail': lambda: visitor.get(reverse('recipe-detail', args=[recipe.pk])),
+            'recipe-detail-user': lambda: member.get(reverse('recipe-detail', args=[recipe.pk])),
+            'schedule-detail': lambda: visitor.get(reverse('schedule-detail', args=[schedule.pk])),
+            'schedule-shopping-list': lambda: visitor.get(reverse('schedule-shopping-list', args=[schedule.pk])),
+            'recipe-search': lambda: visitor.get(reverse('recipe-list'), {'name': term}),
+            'schedule-search': lambda: visitor.get(reverse('schedule-list'), {'name': 'plan'}),
+            'user-comments-search': lambda: member.get(reverse('user-comments', args=[user.pk]), {'name': term}),
+            'recipe-wizard': lambda: self.recipe_wizard(member, user),
+            'schedule-wizard': lambda: self.schedule_wizard(member, user),
+        }
+
+        try:
+            return {name: self.measure(request, iterations, warmup) for name, request in scenarios.items()}
+        finally:
+            member.logout()
+
+    def measure(self, request, iterations, warmup):
+
+        for _ in range(warmup):
+            request()
+
+        timings = []
+        queries = []
+
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = request()
+                timings.append((time.perf_counter() - start) * 1000)
+
+            if response.status_code >= 400:
+                raise CommandError(f'Request failed with status {response.status_code}')
+
+            queries.append(len(context))
+
+        timings.sort()
+
+        return {
+            'p50_ms': round(timings[len(timings) // 2], 2),
+            'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+            'queries': max(queries),
+        }
+
+    def post_steps(self, client, url, prefix, steps):
+
+        client.get(url)
+
+        for step, data in steps:
+            response = client.post(url, {f'{prefix}-current_step': step, **data})
+
+        if response.status_code != 302:
+            raise CommandError(f'{url} wizard stopped at {step}, the form data no longer matches the forms')
+
+        return response
+
+    def recipe_wizard(self, client, user):
+
+        ingredients = list(Ingredient.objects.values_list('pk', flat=True)[:5])
+        formset = {
+            'step4-TOTAL_FORMS': len(ingredients),
+            'step4-INITIAL_FORMS': 0,
+            'step4-MIN_NUM_FORMS': len(ingredients),
+            'step4-MAX_NUM_FORMS': 1000,
+        }
+
+        for number, ingredient in enumerate(ingredients):
+            formset[f'step4-{number}-ingredient'] = ingredient
+            formset[f'step4-{number}-quantity'] = '100 g'
+
+        return self.post_steps(client, reverse('recipe-create'), 'recipe_create_view', [
+            ('step1', {'step1-ingredients': ingredients}),
+            ('step2', {
+                'step2-name': BENCHMARK_NAME,
+                'step2-preparation_time': '00:30:00',
+                'step2-calories': 100,
+                'step2-create_by': user.pk,
+            }),
+            ('step3', {'step3-preparing': BENCHMARK_NAME}),
+            ('step4', formset),
+        ])
+
+    def schedule_wizard(self, client, user):
+
+        recipes = list(Recipe.objects.values_list('pk', flat=True)[:35])
+        formset = {
+            'step2-TOTAL_FORMS': 35,
+            'step2-INITIAL_FORMS': 0,
+            'step2-MIN_NUM_FORMS': 35,
+            'step2-MAX_NUM_FORMS': 35,
+        }
+
+        for number in range(35):
+            formset[f'step2-{number}-day_number'] = number // 5 + 1
+            formset[f'step2-{number}-meal_number'] = number % 5 + 1
+            formset[f'step2-{number}-recipe'] = recipes[number % len(recipes)]
+
+        return self.post_steps(client, reverse('schedule-create'), 'schedule_create_view', [
+            ('step1', {'step1-name': BENCHMARK_NAME, 'step1-create_by': user.pk}),
+            ('step2', formset),
+        ])
@@ -0,0 +1,202 @@
+import random
+
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from food_app.cache import bump_model_version
+from food_app.leaderboard import refresh_boards
+from food_app.models import User, Ingredient, Recipe, IngredientRecipe, CommentRecipe, Schedule, RecipeSchedule, \
+    RecipeLike, ScheduleLike
+
+
+INGREDIENT_WORDS = [
+    'mąka', 'cukier', 'masło', 'jajko', 'mleko', 'ser', 'pomidor', 'ogórek', 'cebula', 'czosnek', 'marchew',
+    'ziemniak', 'ryż', 'makaron', 'kurczak', 'wołowina', 'łosoś', 'jabłko', 'gruszka', 'śliwka', 'oliwa',
+    'pieprz', 'sól', 'bazylia', 'koperek', 'pietruszka', 'fasola', 'groch', 'kasza', 'jogurt', 'śmietana',
+]
+RECIPE_WORDS = [
+    'zupa', 'sałatka', 'placki', 'pierogi', 'gulasz', 'zapiekanka', 'kotlety', 'risotto', 'krem', 'ciasto',
+    'naleśniki', 'gołąbki', 'leczo', 'pasta', 'tarta', 'omlet', 'owsianka', 'koktajl', 'curry', 'bigos',
+]
+ADJECTIVES = ['domowy', 'szybki', 'letni', 'zimowy', 'pikantny', 'lekki', 'babciny', 'wegański', 'świąteczny']
+UNITS = ['g', 'kg', 'ml', 'l', 'szt.', 'łyżka', 'szklanka']
+
+
+class Command(BaseCommand):
+
+    help = 'Fill the database with a reproducible synthetic dataset for benchmarks, written with bulk_create'
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--prefix', default='gen', help='Prefix of generated user names, keeps reruns unique')
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--ingredients', type=int, default=300)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--comments', type=int, default=5000)
+        parser.add_argument('--likes', type=int, default=20000)
+        parser.add_argument('--schedules', type=int, default=200)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        prefix = options['prefix']
+
+        with transaction.atomic():
+            users = self.create_users(prefix, options['users'])
+            ingredients = self.create_ingredients(prefix, options['ingredients'], users)
+            recipes = self.create_recipes(prefix, options['recipes'], users)
+            self.create_recipe_ingredients(recipes, ingredients, options['ingredients_per_recipe'])
+            self.create_comments(recipes, users, options['comments'])
+            schedules = self.create_schedules(prefix, options['schedules'], users, recipes)
+            self.create_likes(RecipeLike, 'recipe', recipes, users, options['likes'])
+            self.create_likes(ScheduleLike, 'schedule', schedules, users, options['likes'] // 10)
+
+            Recipe.recount_likes()
+            Recipe.recount_comments()
+            Schedule.recount_likes()
+
+        # bulk_create sends no signals, so the cached versions and boards are refreshed by hand
+        for model in [User, Ingredient, Recipe, IngredientRecipe, CommentRecipe, Schedule, RecipeSchedule]:
+            bump_model_version(model)
+
+        refresh_boards()
+
+        for model, count in [
+            (User, len(users)),
+            (Ingredient, len(ingredients)),
+            (Recipe, len(recipes)),
+            (Schedule, len(schedules)),
+        ]:
+            self.stdout.write(self.style.SUCCESS(f'{model._meta.verbose_name_plural}: {count}'))
+
+    def bulk_create(self, model, objs, **kwargs):
+
+        created = model.objects.bulk_create(objs, batch_size=self.batch_size, **kwargs)
+
+        # databases unable to return the inserted keys get them fetched back
+        if created and created[0].pk is None and not kwargs.get('ignore_conflicts'):
+            created = list(model.objects.order_by('-pk')[:len(created)])[::-1]
+
+        return created
+
+    def create_users(self, prefix, count):
+
+        password = make_password('Haslo123!')
+
+        return self.bulk_create(User, [
+            User(
+                username=f'{prefix}_user_{number}',
+                email=f'{prefix}_user_{number}@example.com',
+                first_name=self.random.choice(['Anna', 'Jan', 'Ewa', 'Piotr', 'Maria', 'Tomasz']),
+                last_name=self.random.choice(['Nowak', 'Kowalski', 'Wiśniewska', 'Wójcik', 'Kamińska']),
+                password=password,
+                is_active=True,
+            )
+            for number in range(count)
+        ])
+
+    def create_ingredients(self, prefix, count, users):
+
+        return self.bulk_create(Ingredient, [
+            Ingredient(
+                name=f'{self.random.choice(INGREDIENT_WORDS)} {prefix} {number}',
+                create_by=self.random.choice(users),
+            )
+            for number in range(count)
+        ])
+
+    def create_recipes(self, prefix, count, users):
+
+        recipes = []
+
+        for number in range(count):
+            name = f'{self.random.choice(RECIPE_WORDS)} {self.random.choice(ADJECTIVES)} {prefix} {number}'
+            recipes.append(Recipe(
+                name=name.capitalize(),
+                description=' '.join(self.random.choices(RECIPE_WORDS + INGREDIENT_WORDS, k=20)),
+                preparing=' '.join(self.random.choices(RECIPE_WORDS + INGREDIENT_WORDS + ADJECTIVES, k=80)),
+                preparation_time=timedelta(minutes=self.random.randint(5, 180)),
+                calories=self.random.randint(50, 900),
+                create_by=self.random.choice(users),
+            ))
+
+        return self.bulk_create(Recipe, recipes)
+
+    def create_recipe_ingredients(self, recipes, ingredients, per_recipe):
+
+        rows = [
+            IngredientRecipe(
+                recipe=recipe,
+                ingredient=ingredient,
+                quantity=f'{self.random.randint(1, 500)} {self.random.choice(UNITS)}',
+            )
+            for recipe in recipes
+            for ingredient in self.random.sample(ingredients, min(per_recipe, len(ingredients)))
+        ]
+
+        # bulk_create skips save(), which fills the parsed amount
+        for row in rows:
+            row.set_amount()
+
+        self.bulk_create(IngredientRecipe, rows)
+
+    def create_comments(self, recipes, users, count):
+
+        self.bulk_create(CommentRecipe, [
+            CommentRecipe(
+                recipe=self.random.choice(recipes),
+                user=self.random.choice(users),
+                comment=' '.join(self.random.choices(ADJECTIVES + RECIPE_WORDS, k=12)),
+            )
+            for _ in range(count)
+        ])
+
+    def create_schedules(self, prefix, count, users, recipes):
+
+        schedules = self.bulk_create(Schedule, [
+            Schedule(
+                name=f'Plan {self.random.choice(ADJECTIVES)} {prefix} {number}',
+                description=' '.join(self.random.choices(RECIPE_WORDS, k=15)),
+                create_by=self.random.choice(users),
+            )
+            for number in range(count)
+        ])
+        self.bulk_create(RecipeSchedule, [
+            RecipeSchedule(
+                schedule=schedule,
+                day_number=day_number,
+                meal_number=meal_number,
+                recipe=self.random.choice(recipes),
+            )
+            for schedule in schedules
+            for day_number, _ in RecipeSchedule.DAY_CHOICES
+            for meal_number, _ in RecipeSchedule.MEAL_CHOICES
+        ])
+
+        return schedules
+
+    def create_likes(self, model, field, objs, users, count):
+
+        if not objs or not users:
+            return
+
+        now = timezone.now()
+        # a few popular objects collect most of the likes, like on the real site
+        weights = [1 / (position + 1) for position in range(len(objs))]
+        pairs = {
+            (obj.pk, self.random.choice(users).pk)
+            for obj in self.random.choices(objs, weights=weights, k=count)
+        }
+
+        self.bulk_create(model, [
+            model(**{f'{field}_id': pk, 'user_id': user_pk, 'date_added': now - timedelta(days=self.random.randint(0, 30))})
+            for pk, user_pk in sorted(pairs)
+        ], ignore_conflicts=True)
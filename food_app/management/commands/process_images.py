@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from food_app.images import DeferredResizedImageField, image_queue
+from food_app.models import User, Recipe
+
+
+class Command(BaseCommand):
+
+    help = 'Render the variants of uploaded images still waiting for the image queue, e.g. after a restart'
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('--all', action='store_true', help='Render the variants of every uploaded image again')
+
+    def handle(self, *args, **options):
+
+        for model in [User, Recipe]:
+            for field in model._meta.fields:
+                if not isinstance(field, DeferredResizedImageField):
+                    continue
+
+                queued = 0
+                rows = model.objects.exclude(**{field.name: ''}).exclude(**{field.name: field.get_default()}) \
+                    .only('pk', field.name, field.variants_field)
+
+                for obj in rows.iterator():
+                    image = getattr(obj, field.attname)
+
+                    if options['all'] or image.pending:
+                        image_queue.put((model._meta.label, field.name, image.name))
+                        queued += 1
+
+                image_queue.join()
+                self.stdout.write(self.style.SUCCESS(f'{model._meta.verbose_name_plural}, {field.verbose_name}: {queued}'))
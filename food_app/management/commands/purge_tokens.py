@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from food_app.models import UserUniqueToken
+
+
+class Command(BaseCommand):
+
+    help = 'Delete expired account activation and password set tokens in chunks'
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('--batch-size', type=int, default=1000, help='Tokens deleted by one statement')
+
+    def handle(self, *args, **options):
+
+        deleted = 0
+
+        while True:
+            # short DELETE statements keep the table available to the views while a large backlog is purged
+            tokens = list(UserUniqueToken.objects.expired().values_list('pk', flat=True)[:options['batch_size']])
+
+            if not tokens:
+                break
+
+            count, _ = UserUniqueToken.objects.filter(pk__in=tokens).delete()
+            deleted += count
+
+        self.stdout.write(self.style.SUCCESS(f'{UserUniqueToken._meta.verbose_name_plural}: {deleted}'))
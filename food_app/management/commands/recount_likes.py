@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from food_app.models import Recipe, Schedule
+
+
+class Command(BaseCommand):
+
+    help = 'Recompute the denormalized likes_count of recipes and schedules'
+
+    def handle(self, *args, **options):
+
+        for model in [Recipe, Schedule]:
+            updated = model.recount_likes()
+            self.stdout.write(self.style.SUCCESS(f'{model._meta.verbose_name_plural}: {updated}'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from food_app.leaderboard import refresh_boards
+
+
+class Command(BaseCommand):
+
+    help = 'Rebuild the top recipes and schedules leaderboards, run periodically to age out the rolling window'
+
+    def handle(self, *args, **options):
+
+        for board, size in refresh_boards().items():
+            self.stdout.write(self.style.SUCCESS(f'{board}: {size}'))
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from food_app.outbox import send_batch
+
+
+class Command(BaseCommand):
+
+    help = 'Send the emails waiting in the outbox in batches, retrying failed ones with backoff'
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('--batch-size', type=int, default=None, help='Emails sent over one connection')
+        parser.add_argument('--loop', action='store_true', help='Keep polling the outbox instead of stopping when empty')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds between polls of an empty outbox')
+
+    def handle(self, *args, **options):
+
+        total_sent = total_failed = 0
+
+        while True:
+            sent, failed = send_batch(options['batch_size'])
+            total_sent += sent
+            total_failed += failed
+
+            if sent or failed:
+                continue
+
+            if not options['loop']:
+                break
+
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'Wysłane: {total_sent}, błędy: {total_failed}'))
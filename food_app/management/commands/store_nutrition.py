@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from food_app.models import Schedule, ScheduleNutrition
+
+
+class Command(BaseCommand):
+
+    help = 'Store the nutrition summaries of schedules still without one, which the pages compute on every read'
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('--batch-size', type=int, default=500, help='Schedules summarized by one query')
+
+    def handle(self, *args, **options):
+
+        stored = 0
+        last_pk = 0
+
+        while True:
+            schedules = list(
+                Schedule.objects.filter(pk__gt=last_pk, nutrition__isnull=True).order_by('pk')
+                .values_list('pk', flat=True)[:options['batch_size']]
+            )
+
+            if not schedules:
+                break
+
+            stored += len(ScheduleNutrition.store_missing(schedules))
+            last_pk = schedules[-1]
+
+        self.stdout.write(self.style.SUCCESS(f'{ScheduleNutrition._meta.verbose_name_plural}: {stored}'))
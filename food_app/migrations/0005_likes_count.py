@@ -0,0 +1,44 @@
+# Generated by Django 4.0.3 on 2026-10-18 09:59
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_likes_count(apps, schema_editor):
+
+    for model_name in ['Recipe', 'Schedule']:
+        model = apps.get_model('food_app', model_name)
+        through = model.likes.through
+        likes = through.objects.filter(**{model_name.lower(): OuterRef('pk')}).values(model_name.lower()) \
+            .annotate(num_likes=Count('pk')).values('num_likes')
+        model.objects.update(likes_count=Coalesce(Subquery(likes), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_app', '0004_recipeschedule_schedule_recipeschedule_schedule_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Liczba polubień'),
+        ),
+        migrations.AddField(
+            model_name='schedule',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Liczba polubień'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-likes_count', 'name'], name='recipe_likes_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['-likes_count', 'name'], name='schedule_likes_count_idx'),
+        ),
+        migrations.RunPython(fill_likes_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+from django.db import migrations
+
+
+SEARCH_FIELDS = {
+    'Recipe': ['name', 'description', 'preparing'],
+    'Schedule': ['name', 'description'],
+    'Ingredient': ['name'],
+}
+
+
+def create_search_indexes(apps, schema_editor):
+
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    from django.contrib.postgres.indexes import GinIndex
+    from django.contrib.postgres.search import SearchVector
+
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    for model_name, fields in SEARCH_FIELDS.items():
+        model = apps.get_model('food_app', model_name)
+        table = model._meta.db_table
+        schema_editor.add_index(
+            model,
+            GinIndex(SearchVector(*fields, config='simple'), name=f'{model_name.lower()}_search_idx')
+        )
+        schema_editor.execute(
+            f'CREATE INDEX {model_name.lower()}_name_trgm_idx ON {table} USING gin (UPPER(name) gin_trgm_ops)'
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for model_name in SEARCH_FIELDS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {model_name.lower()}_search_idx')
+        schema_editor.execute(f'DROP INDEX IF EXISTS {model_name.lower()}_name_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_app', '0005_likes_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
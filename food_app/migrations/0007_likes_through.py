@@ -0,0 +1,107 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_like_dates(apps, schema_editor):
+
+    # the real like times were never stored, the creation of the liked object keeps old likes out of the rolling
+    # boards instead of dating them all to this migration
+    for like_name, model_name in [('RecipeLike', 'Recipe'), ('ScheduleLike', 'Schedule')]:
+        like_model = apps.get_model('food_app', like_name)
+        model = apps.get_model('food_app', model_name)
+        field = model_name.lower()
+        like_model.objects.update(date_added=Subquery(
+            model.objects.filter(pk=OuterRef(f'{field}_id')).values('create_date')[:1]
+        ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_app', '0006_search_indexes'),
+    ]
+
+    operations = [
+        # the likes tables already exist as auto-created M2M tables, only the state learns about the models
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='RecipeLike',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipe_likes', to='food_app.recipe', verbose_name='Przepis')),
+                        ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_recipe_likes', to=settings.AUTH_USER_MODEL, verbose_name='Użytkownik')),
+                    ],
+                    options={
+                        'verbose_name': 'Polubienie przepisu',
+                        'verbose_name_plural': 'Polubienia przepisów',
+                        'db_table': 'food_app_recipe_likes',
+                        'unique_together': {('recipe', 'user')},
+                    },
+                ),
+                migrations.CreateModel(
+                    name='ScheduleLike',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('schedule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedule_likes', to='food_app.schedule', verbose_name='Plan')),
+                        ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_schedule_likes', to=settings.AUTH_USER_MODEL, verbose_name='Użytkownik')),
+                    ],
+                    options={
+                        'verbose_name': 'Polubienie planu',
+                        'verbose_name_plural': 'Polubienia planów',
+                        'db_table': 'food_app_schedule_likes',
+                        'unique_together': {('schedule', 'user')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='recipe',
+                    name='likes',
+                    field=models.ManyToManyField(related_name='likes', through='food_app.RecipeLike', to=settings.AUTH_USER_MODEL, verbose_name='Polubienia'),
+                ),
+                migrations.AlterField(
+                    model_name='schedule',
+                    name='likes',
+                    field=models.ManyToManyField(related_name='likes_schedule', through='food_app.ScheduleLike', to=settings.AUTH_USER_MODEL, verbose_name='Polubienia'),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='recipelike',
+            name='date_added',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Data polubienia'),
+        ),
+        migrations.AddField(
+            model_name='schedulelike',
+            name='date_added',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Data polubienia'),
+        ),
+        migrations.RunPython(backfill_like_dates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='recipelike',
+            index=models.Index(fields=['date_added'], name='recipe_like_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schedulelike',
+            index=models.Index(fields=['date_added'], name='schedule_like_date_idx'),
+        ),
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('board', models.CharField(choices=[('recipes', 'Przepisy'), ('recipes-window', 'Przepisy - ostatnie dni'), ('schedules', 'Plany'), ('schedules-window', 'Plany - ostatnie dni')], max_length=32, verbose_name='Ranking')),
+                ('position', models.PositiveSmallIntegerField(verbose_name='Pozycja')),
+                ('score', models.PositiveIntegerField(verbose_name='Polubienia')),
+                ('recipe', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to='food_app.recipe', verbose_name='Przepis')),
+                ('schedule', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to='food_app.schedule', verbose_name='Plan')),
+            ],
+            options={
+                'verbose_name': 'Pozycja rankingu',
+                'verbose_name_plural': 'Ranking',
+                'ordering': ['board', 'position'],
+                'unique_together': {('board', 'position')},
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.0.3 on 2026-10-18 10:10
+
+from django.db import migrations, models
+import food_app.images
+import food_app.models
+
+
+def fill_variants(apps, schema_editor):
+
+    # uploads made before the image queue were already resized to the main size when saved
+    for model_name, field, variants_field, default in [
+        ('Recipe', 'image', 'image_variants', 'food_app/default_recipe.png'),
+        ('User', 'avatar', 'avatar_variants', 'food_app/default_person.png'),
+    ]:
+        model = apps.get_model('food_app', model_name)
+        rows = model.objects.exclude(**{field: ''}).exclude(**{field: default}).values_list('pk', field)
+
+        for pk, name in rows.iterator():
+            model.objects.filter(pk=pk).update(**{variants_field: {'source': name, 'variants': {'main_png': name}}})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_app', '0007_likes_through'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Warianty zdjęcia'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='avatar_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Warianty awatara'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=food_app.images.DeferredResizedImageField(crop=['middle', 'center'], default='food_app/default_recipe.png', force_format='PNG', keep_meta=True, quality=-1, scale=None, size=[342, 256], sizes={'thumb': [171, 128]}, upload_to=food_app.models.image_upload_handler, variants_field='image_variants', verbose_name='Zdjęcie'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='avatar',
+            field=food_app.images.DeferredResizedImageField(crop=['middle', 'center'], default='food_app/default_person.png', force_format='PNG', keep_meta=True, quality=-1, scale=None, size=[192, 256], sizes={'thumb': [72, 96]}, upload_to=food_app.models.image_upload_handler, variants_field='avatar_variants', verbose_name='Awatar'),
+        ),
+        migrations.RunPython(fill_variants, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.0.3 on 2026-10-18 10:13
+
+from django.db import migrations
+import food_app.images
+import food_app.models
+import food_app.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_app', '0008_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=food_app.images.DeferredResizedImageField(crop=['middle', 'center'], db_index=True, default='food_app/default_recipe.png', force_format='PNG', keep_meta=True, quality=-1, scale=None, size=[342, 256], sizes={'thumb': [171, 128]}, storage=food_app.storage.ContentAddressedStorage(), upload_to=food_app.models.image_upload_handler, variants_field='image_variants', verbose_name='Zdjęcie'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='avatar',
+            field=food_app.images.DeferredResizedImageField(crop=['middle', 'center'], db_index=True, default='food_app/default_person.png', force_format='PNG', keep_meta=True, quality=-1, scale=None, size=[192, 256], sizes={'thumb': [72, 96]}, storage=food_app.storage.ContentAddressedStorage(), upload_to=food_app.models.image_upload_handler, variants_field='avatar_variants', verbose_name='Awatar'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.0.3 on 2026-10-18 10:14
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_app', '0009_content_addressed_images'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=256, verbose_name='Temat')),
+                ('body', models.TextField(verbose_name='Treść')),
+                ('from_email', models.CharField(max_length=256, verbose_name='Nadawca')),
+                ('to', models.JSONField(verbose_name='Odbiorcy')),
+                ('status', models.CharField(choices=[('pending', 'Oczekuje'), ('sent', 'Wysłana'), ('failed', 'Błąd')], default='pending', max_length=16, verbose_name='Status')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Liczba prób')),
+                ('next_attempt', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Następna próba')),
+                ('last_error', models.TextField(blank=True, verbose_name='Ostatni błąd')),
+                ('date_added', models.DateTimeField(auto_now_add=True, verbose_name='Data dodania')),
+                ('date_sent', models.DateTimeField(blank=True, null=True, verbose_name='Data wysłania')),
+            ],
+            options={
+                'verbose_name': 'Wiadomość e-mail',
+                'verbose_name_plural': 'Skrzynka nadawcza',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='outboxemail',
+            index=models.Index(fields=['status', 'next_attempt'], name='outbox_email_due_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.0.3 on 2026-10-18 10:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def fill_purpose(apps, schema_editor):
+
+    # an active user could only have been sent a password reset link
+    UserUniqueToken = apps.get_model('food_app', 'UserUniqueToken')
+    UserUniqueToken.objects.filter(user__is_active=True).update(purpose='password')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_app', '0010_outbox_email'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='useruniquetoken',
+            options={'verbose_name': 'Token użytkownika', 'verbose_name_plural': 'Tokeny użytkowników'},
+        ),
+        migrations.AddField(
+            model_name='useruniquetoken',
+            name='purpose',
+            field=models.CharField(choices=[('activation', 'Aktywacja konta'), ('password', 'Ustawienie hasła')], default='activation', max_length=16, verbose_name='Cel'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='useruniquetoken',
+            name='date_issued',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Data wydania'),
+        ),
+        migrations.AlterField(
+            model_name='useruniquetoken',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tokens', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='useruniquetoken',
+            unique_together={('user', 'purpose')},
+        ),
+        migrations.RunPython(fill_purpose, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,119 @@
+# Generated by Django 4.0.3 on 2026-10-18 16:20
+
+import re
+
+from decimal import Decimal, InvalidOperation
+
+from django.db import migrations, models
+
+
+BATCH_SIZE = 1000
+
+# a frozen copy of food_app.quantities at the time of this migration, so later parser changes cannot change
+# what the backfill produced, nor break migrating from scratch
+_AMOUNT_PLACES = 3
+_AMOUNT_LIMIT = Decimal(10) ** (12 - _AMOUNT_PLACES)
+
+_UNITS = {
+    'mg': ('g', Decimal('0.001')),
+    'g': ('g', Decimal(1)),
+    'gr': ('g', Decimal(1)),
+    'gram': ('g', Decimal(1)),
+    'gramy': ('g', Decimal(1)),
+    'gramów': ('g', Decimal(1)),
+    'dag': ('g', Decimal(10)),
+    'dkg': ('g', Decimal(10)),
+    'kg': ('g', Decimal(1000)),
+    'ml': ('ml', Decimal(1)),
+    'l': ('ml', Decimal(1000)),
+    'litr': ('ml', Decimal(1000)),
+    'litry': ('ml', Decimal(1000)),
+    'litrów': ('ml', Decimal(1000)),
+    'łyżeczka': ('ml', Decimal(5)),
+    'łyżeczki': ('ml', Decimal(5)),
+    'łyżeczek': ('ml', Decimal(5)),
+    'łyżka': ('ml', Decimal(15)),
+    'łyżki': ('ml', Decimal(15)),
+    'łyżek': ('ml', Decimal(15)),
+    'szklanka': ('ml', Decimal(250)),
+    'szklanki': ('ml', Decimal(250)),
+    'szklanek': ('ml', Decimal(250)),
+    'szt': ('szt.', Decimal(1)),
+    'sztuka': ('szt.', Decimal(1)),
+    'sztuki': ('szt.', Decimal(1)),
+    'sztuk': ('szt.', Decimal(1)),
+    '': ('szt.', Decimal(1)),
+}
+
+_QUANTITY_RE = re.compile(r'^\s*(?P<number>\d+(?:[.,]\d+)?)(?:\s*/\s*(?P<denominator>\d+))?\s*(?P<unit>[^\d\s]*)\s*$')
+
+
+def _parse_quantity(text):
+
+    match = _QUANTITY_RE.match((text or '').lower())
+
+    if not match:
+        return None
+
+    unit = _UNITS.get(match['unit'].rstrip('.'))
+
+    if unit is None:
+        return None
+
+    try:
+        amount = Decimal(match['number'].replace(',', '.'))
+
+        if match['denominator']:
+            amount /= Decimal(match['denominator'])
+    except (InvalidOperation, ZeroDivisionError):
+        return None
+
+    base_unit, factor = unit
+    amount *= factor
+
+    if amount >= _AMOUNT_LIMIT:
+        return None
+
+    return amount.quantize(Decimal(1).scaleb(-_AMOUNT_PLACES)), base_unit
+
+
+def fill_amounts(apps, schema_editor):
+
+    # rows are read and written back in primary key batches, so large tables never sit in memory at once
+    IngredientRecipe = apps.get_model('food_app', 'IngredientRecipe')
+    last_pk = 0
+
+    while True:
+        batch = list(
+            IngredientRecipe.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', 'quantity')[:BATCH_SIZE]
+        )
+
+        if not batch:
+            break
+
+        for row in batch:
+            row.amount, row.unit = _parse_quantity(row.quantity) or (None, None)
+
+        IngredientRecipe.objects.bulk_update(batch, ['amount', 'unit'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_app', '0011_token_purpose_expiry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredientrecipe',
+            name='amount',
+            field=models.DecimalField(blank=True, decimal_places=3, editable=False, max_digits=12, null=True, verbose_name='Ilość w jednostce'),
+        ),
+        migrations.AddField(
+            model_name='ingredientrecipe',
+            name='unit',
+            field=models.CharField(blank=True, choices=[('g', 'gram'), ('ml', 'mililitr'), ('szt.', 'sztuka')], editable=False, max_length=8, null=True, verbose_name='Jednostka'),
+        ),
+        migrations.RunPython(fill_amounts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.0.3 on 2026-10-18 17:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_app', '0012_ingredientrecipe_amount_unit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleNutrition',
+            fields=[
+                ('schedule', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='nutrition', serialize=False, to='food_app.schedule', verbose_name='Plan')),
+                ('calories', models.PositiveIntegerField(default=0, verbose_name='Kalorie w tygodniu')),
+                ('weight', models.PositiveIntegerField(default=0, verbose_name='Waga w tygodniu [g]')),
+                ('meals', models.PositiveSmallIntegerField(default=0, verbose_name='Posiłki w tygodniu')),
+                ('days', models.JSONField(default=dict, verbose_name='Dni')),
+                ('date_computed', models.DateTimeField(auto_now=True, verbose_name='Data obliczenia')),
+            ],
+            options={
+                'verbose_name': 'Wartości odżywcze planu',
+                'verbose_name_plural': 'Wartości odżywcze planów',
+            },
+        ),
+    ]
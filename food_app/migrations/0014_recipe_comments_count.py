@@ -0,0 +1,34 @@
+# Generated by Django 4.0.3 on 2026-10-18 18:10
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_comments(apps, schema_editor):
+
+    Recipe = apps.get_model('food_app', 'Recipe')
+    CommentRecipe = apps.get_model('food_app', 'CommentRecipe')
+    comments = CommentRecipe.objects.filter(recipe=OuterRef('pk')).values('recipe') \
+        .annotate(num_comments=Count('pk')).values('num_comments')
+    Recipe.objects.update(comments_count=Coalesce(Subquery(comments), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_app', '0013_schedule_nutrition'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Liczba komentarzy'),
+        ),
+        migrations.AddIndex(
+            model_name='commentrecipe',
+            index=models.Index(fields=['recipe', '-date_added'], name='comment_recipe_date_idx'),
+        ),
+        migrations.RunPython(count_comments, migrations.RunPython.noop),
+    ]
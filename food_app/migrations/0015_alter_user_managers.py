@@ -0,0 +1,20 @@
+# Generated by Django 4.0.3 on 2026-10-18 19:05
+
+from django.db import migrations
+import food_app.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_app', '0014_recipe_comments_count'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', food_app.models.UserManager()),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.3 on 2026-10-18 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_app', '0015_alter_user_managers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxemail',
+            name='claim_token',
+            field=models.UUIDField(blank=True, db_index=True, editable=False, null=True, verbose_name='Token wysyłki'),
+        ),
+    ]
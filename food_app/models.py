@@ -1,23 +1,161 @@
 import uuid
 
+from datetime import timedelta
 from pathlib import Path
 
-from django.db import models
-from django.contrib.auth.models import AbstractUser
-from django.core.mail import send_mail
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Q, Case, Count, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.dispatch import Signal
+from django.conf import settings
+from django.contrib.auth.models import AbstractUser, UserManager as BaseUserManager
+from django.utils import timezone
 
-from django_resized import ResizedImageField
+from .cache import bump_model_version, bump_object_version, bump_counters_version
+from .images import DeferredResizedImageField
+from .quantities import UNIT_GRAM, UNIT_MILLILITRE, UNIT_PIECE, AMOUNT_PLACES, parse_quantity
+from .storage import image_storage
 
 # Create your models here.
 
 
+like_changed = Signal()
+
+
 def image_upload_handler(instance, filename):
     
+    # image_storage replaces the file name with the hash of the content
     model_name = instance.__class__.__name__
-    new_filename = uuid.uuid4().hex
     file_suffix = Path(filename).suffix
     
-    return f'food_app/{model_name}/{new_filename}{file_suffix}'
+    return f'food_app/{model_name}/upload{file_suffix}'
+
+
+class LikesMixin:
+
+    """
+    Keep the denormalized likes_count column in step with the likes M2M
+    """
+    def add_like(self, user):
+
+        return self.set_like(user, liked=True)
+
+    def remove_like(self, user):
+
+        return self.set_like(user, liked=False)
+
+    def set_like(self, user, liked):
+
+        """
+        Like or unlike the object for the user, return False when it was in that state already
+        """
+        changed = self.write_like(user, self.pk, liked)
+
+        if changed:
+            bump_counters_version(self.__class__, [self.pk])
+            like_changed.send(sender=self.__class__, instance=self)
+
+        return changed
+
+    @classmethod
+    def set_likes(cls, user, pks, liked):
+
+        """
+        Like or unlike every object of pks for the user at once, objects already in that state stay untouched
+
+        Returns {pk: likes_count} of the objects that exist.
+        """
+        changed = [pk for pk in pks if cls.write_like(user, pk, liked)]
+        objs = cls.objects.filter(pk__in=pks).only('pk', 'likes_count').order_by()
+
+        if changed:
+            bump_counters_version(cls, changed)
+
+        for obj in objs:
+            if obj.pk in changed:
+                like_changed.send(sender=cls, instance=obj)
+
+        return {obj.pk: obj.likes_count for obj in objs}
+
+    @classmethod
+    def write_like(cls, user, pk, liked):
+
+        """
+        Insert or delete the like row, then shift likes_count by the affected rows in one F() update
+
+        No state is read beforehand and nothing is recounted: the unique like row decides whether the counter moves,
+        so a double click or racing requests cannot count a like twice.
+        """
+        model_name = cls._meta.model_name
+        like = {f'{model_name}_id': pk, 'user': user}
+        counter = cls.objects.filter(pk=pk)
+
+        if not liked:
+            deleted, _ = cls.likes.through.objects.filter(**like).delete()
+
+            if deleted:
+                counter.update(likes_count=F('likes_count') - deleted)
+
+            return bool(deleted)
+
+        try:
+            with transaction.atomic():
+                # the counter goes first, it locks the object row and tells whether the object exists
+                if not counter.update(likes_count=F('likes_count') + 1):
+                    return False
+
+                cls.likes.through.objects.create(**like)
+        except IntegrityError:
+            # liked already, rolling back the savepoint takes the counter back
+            return False
+
+        return True
+
+    @classmethod
+    def recount_likes(cls, queryset=None):
+
+        model_name = cls._meta.model_name
+        likes = cls.likes.through.objects.filter(**{model_name: OuterRef('pk')}).values(model_name) \
+            .annotate(num_likes=Count('pk')).values('num_likes')
+
+        if queryset is None:
+            queryset = cls.objects.all()
+
+        updated = queryset.update(likes_count=Coalesce(Subquery(likes), 0))
+        bump_counters_version(cls)
+
+        return updated
+
+
+class UserQuerySet(models.QuerySet):
+
+    def with_stats(self):
+
+        """
+        Annotate the counts of the user panel and menu, each a subquery on an indexed foreign key in the same query
+        """
+        related = {
+            'recipes_count': (Recipe, 'create_by'),
+            'schedules_count': (Schedule, 'create_by'),
+            'ingredients_count': (Ingredient, 'create_by'),
+            'comments_count': (CommentRecipe, 'user'),
+            'likes_count': (RecipeLike, 'user'),
+            'likes_schedule_count': (ScheduleLike, 'user'),
+        }
+
+        counts = {}
+
+        for name, (model, field) in related.items():
+            total = model.objects.filter(**{field: OuterRef('pk')}).values(field) \
+                .annotate(total=Count('pk')).values('total')
+            counts[name] = Coalesce(Subquery(total), 0)
+
+        return self.annotate(**counts)
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
+
+    pass
 
 
 class User(AbstractUser):
@@ -42,15 +180,22 @@ class User(AbstractUser):
         unique=True,
         error_messages={'unique': 'Email już zarejestrowany w serwisie'},
         )
-    avatar = ResizedImageField(
+    avatar = DeferredResizedImageField(
         size=[192, 256],
+        sizes={'thumb': [72, 96]},
         crop=['middle', 'center'],
         force_format='PNG',
         upload_to=image_upload_handler,
+        storage=image_storage,
+        db_index=True,
         default='food_app/default_person.png',
+        variants_field='avatar_variants',
         verbose_name='Awatar'
         )
+    avatar_variants = models.JSONField(verbose_name='Warianty awatara', default=dict, blank=True, editable=False)
     
+    objects = UserManager()
+
     EMAIL_FIELD = 'email'
     REQUIRED_FIELDS = []
 
@@ -62,15 +207,123 @@ class User(AbstractUser):
         
         return f'{self.first_name} {self.last_name}'
 
-    def email_user(self, subject, message, from_email='webmaster@localhost', *args, **kwargs):
+    def email_user(self, subject, message, from_email='webmaster@localhost'):
         
-        send_mail(subject, message, from_email, [self.email,], *args, **kwargs)
+        # persisted in the outbox and sent by the send_emails worker, the request does not wait for SMTP,
+        # so the send_mail options (connection, fail_silently, html_message) are not accepted
+        return OutboxEmail.objects.create(subject=subject, body=message, from_email=from_email, to=[self.email])
+
+
+class OutboxEmail(models.Model):
+
+    class Meta:
+        verbose_name = 'Wiadomość e-mail'
+        verbose_name_plural = 'Skrzynka nadawcza'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt'], name='outbox_email_due_idx'),
+        ]
+
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'Oczekuje'),
+        (STATUS_SENT, 'Wysłana'),
+        (STATUS_FAILED, 'Błąd'),
+    )
+
+    subject = models.CharField(verbose_name='Temat', max_length=256)
+    body = models.TextField(verbose_name='Treść')
+    from_email = models.CharField(verbose_name='Nadawca', max_length=256)
+    to = models.JSONField(verbose_name='Odbiorcy')
+    status = models.CharField(verbose_name='Status', max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(verbose_name='Liczba prób', default=0)
+    next_attempt = models.DateTimeField(verbose_name='Następna próba', default=timezone.now)
+    last_error = models.TextField(verbose_name='Ostatni błąd', blank=True)
+    date_added = models.DateTimeField(verbose_name='Data dodania', auto_now_add=True)
+    date_sent = models.DateTimeField(verbose_name='Data wysłania', null=True, blank=True)
+    claim_token = models.UUIDField(verbose_name='Token wysyłki', null=True, blank=True, editable=False, db_index=True)
+
+    def __str__(self):
+
+        return f'{self.subject} ({", ".join(self.to)})'
+
+
+def get_token_lifetime(purpose):
+
+    lifetime = getattr(settings, 'FOOD_APP_TOKEN_LIFETIME', {})
+
+    return timedelta(seconds=lifetime.get(purpose, 24 * 60 * 60))
+
+
+class UserUniqueTokenQuerySet(models.QuerySet):
+
+    def valid(self, purpose):
+
+        return self.filter(purpose=purpose, date_issued__gte=timezone.now() - get_token_lifetime(purpose))
+
+    def expired(self):
+
+        now = timezone.now()
+        condition = Q()
+
+        for purpose, _ in UserUniqueToken.PURPOSE_CHOICES:
+            condition |= Q(purpose=purpose, date_issued__lt=now - get_token_lifetime(purpose))
+
+        return self.filter(condition)
 
 
 class UserUniqueToken(models.Model):
-    
-    user = models.OneToOneField(User, on_delete=models.CASCADE)
+
+    class Meta:
+        verbose_name = 'Token użytkownika'
+        verbose_name_plural = 'Tokeny użytkowników'
+        unique_together = ['user', 'purpose']
+
+    PURPOSE_ACTIVATION = 'activation'
+    PURPOSE_PASSWORD = 'password'
+    PURPOSE_CHOICES = (
+        (PURPOSE_ACTIVATION, 'Aktywacja konta'),
+        (PURPOSE_PASSWORD, 'Ustawienie hasła'),
+    )
+
+    user = models.ForeignKey(User, related_name='tokens', on_delete=models.CASCADE)
     token = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    purpose = models.CharField(verbose_name='Cel', max_length=16, choices=PURPOSE_CHOICES)
+    date_issued = models.DateTimeField(verbose_name='Data wydania', default=timezone.now, db_index=True)
+
+    objects = UserUniqueTokenQuerySet.as_manager()
+
+    @classmethod
+    def issue(cls, user, purpose):
+
+        """
+        Return a fresh token of the user for purpose, replacing the previous one
+        """
+        with transaction.atomic():
+            cls.objects.filter(user=user, purpose=purpose).delete()
+
+            return cls.objects.create(user=user, purpose=purpose)
+
+    @classmethod
+    def consume(cls, token, purpose):
+
+        """
+        Return the user of a valid token and delete it, None when the token is invalid or already used
+
+        The token is looked up with its user in one query, then deleted by one DELETE repeating the validity
+        conditions, whose row count decides between racing requests. Callers run it in transaction.atomic
+        together with the change of the user, so a failed change keeps the token.
+        """
+        tokens = cls.objects.valid(purpose).filter(token=token)
+        user_token = tokens.select_related('user').first()
+
+        if user_token is None:
+            return None
+
+        deleted, _ = tokens.delete()
+
+        return user_token.user if deleted == 1 else None
 
 
 class Ingredient(models.Model):
@@ -99,12 +352,15 @@ class Ingredient(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class Recipe(LikesMixin, models.Model):
     
     class Meta:
         verbose_name = 'Przepis'
         verbose_name_plural = 'Przepisy'
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['-likes_count', 'name'], name='recipe_likes_count_idx'),
+        ]
     
     name = models.CharField(verbose_name='Nazwa przepisu', max_length=128)
     description = models.TextField(verbose_name='Opis przepisu', null=True, blank=True)
@@ -136,20 +392,93 @@ class Recipe(models.Model):
         'User',
         related_name='likes',
         verbose_name='Polubienia',
+        through='RecipeLike',
         )
-    image = ResizedImageField(
+    likes_count = models.PositiveIntegerField(verbose_name='Liczba polubień', default=0, editable=False)
+    comments_count = models.PositiveIntegerField(verbose_name='Liczba komentarzy', default=0, editable=False)
+    image = DeferredResizedImageField(
         size=[342, 256],
+        sizes={'thumb': [171, 128]},
         crop=['middle', 'center'],
         force_format='PNG',
         upload_to=image_upload_handler,
+        storage=image_storage,
+        db_index=True,
         default='food_app/default_recipe.png',
+        variants_field='image_variants',
         verbose_name='Zdjęcie'
         )
+    image_variants = models.JSONField(verbose_name='Warianty zdjęcia', default=dict, blank=True, editable=False)
     
     def __str__(self):
         return self.name
+
+    @classmethod
+    def recount_comments(cls, queryset=None):
+
+        comments = CommentRecipe.objects.filter(recipe=OuterRef('pk')).values('recipe') \
+            .annotate(num_comments=Count('pk')).values('num_comments')
+
+        if queryset is None:
+            queryset = cls.objects.all()
+
+        updated = queryset.update(comments_count=Coalesce(Subquery(comments), 0))
+        bump_counters_version(cls)
+
+        return updated
     
 
+class RecipeLike(models.Model):
+
+    class Meta:
+        verbose_name = 'Polubienie przepisu'
+        verbose_name_plural = 'Polubienia przepisów'
+        db_table = 'food_app_recipe_likes'
+        unique_together = ['recipe', 'user']
+        indexes = [
+            models.Index(fields=['date_added'], name='recipe_like_date_idx'),
+        ]
+
+    date_added = models.DateTimeField(verbose_name='Data polubienia', default=timezone.now)
+    recipe = models.ForeignKey(
+        'Recipe',
+        related_name='recipe_likes',
+        verbose_name='Przepis',
+        on_delete=models.CASCADE
+        )
+    user = models.ForeignKey(
+        'User',
+        related_name='user_recipe_likes',
+        verbose_name='Użytkownik',
+        on_delete=models.CASCADE
+        )
+
+
+class IngredientRecipeQuerySet(models.QuerySet):
+
+    def for_schedule(self, schedule):
+
+        """
+        Rows of the recipes planned in the schedule, once per meal the recipe is planned for
+        """
+        return self.filter(recipe__recipe_schedules__schedule=schedule)
+
+    def totals(self):
+
+        """
+        Return the amounts summed per ingredient and unit by the database, as dicts with ingredient_id,
+        ingredient__name, unit, total and count
+
+        Quantities the parser did not understand have no unit and are grouped by their text instead.
+        """
+        return self.annotate(
+            unparsed=Case(When(unit__isnull=True, then='quantity'), default=Value('')),
+        ).values('ingredient_id', 'ingredient__name', 'unit', 'unparsed').annotate(
+            total=Sum('amount'),
+            count=Count('pk'),
+        ).order_by('ingredient__name', 'ingredient_id', 'unit', 'unparsed')
+
+
 class IngredientRecipe(models.Model):
 
     class Meta:
@@ -158,7 +487,29 @@ class IngredientRecipe(models.Model):
         unique_together = ['ingredient', 'recipe']
         ordering = ['ingredient', 'recipe']
 
+    UNIT_CHOICES = (
+        (UNIT_GRAM, 'gram'),
+        (UNIT_MILLILITRE, 'mililitr'),
+        (UNIT_PIECE, 'sztuka'),
+    )
+
     quantity = models.CharField(verbose_name='Ilość', max_length=64)
+    amount = models.DecimalField(
+        verbose_name='Ilość w jednostce',
+        max_digits=12,
+        decimal_places=AMOUNT_PLACES,
+        null=True,
+        blank=True,
+        editable=False
+        )
+    unit = models.CharField(
+        verbose_name='Jednostka',
+        max_length=8,
+        choices=UNIT_CHOICES,
+        null=True,
+        blank=True,
+        editable=False
+        )
     ingredient = models.ForeignKey(
         'Ingredient',
         related_name='ingredient_recipes',
@@ -171,7 +522,25 @@ class IngredientRecipe(models.Model):
         verbose_name='Przepis',
         on_delete=models.CASCADE
         )
-    
+
+    objects = IngredientRecipeQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+
+        self.set_amount()
+
+        if kwargs.get('update_fields') is not None and 'quantity' in kwargs['update_fields']:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'amount', 'unit'}
+
+        super().save(*args, **kwargs)
+
+    def set_amount(self):
+
+        """
+        Fill amount and unit from the quantity text, both stay empty when the text is not understood
+        """
+        self.amount, self.unit = parse_quantity(self.quantity) or (None, None)
+
     def unique_error_message(self, model_class, unique_check):
 
         if unique_check == ('ingredient', 'recipe'):
@@ -186,6 +555,12 @@ class CommentRecipe(models.Model):
         verbose_name = 'Komentarz przepisu'
         verbose_name_plural = 'Komentarz przepisu'
         ordering = ['-date_added']
+        indexes = [
+            models.Index(fields=['recipe', '-date_added'], name='comment_recipe_date_idx'),
+        ]
+
+    # seek key of the comment pages of a recipe, served by comment_recipe_date_idx
+    SEEK_ORDERING = ['-date_added', '-pk']
 
     comment = models.TextField(verbose_name='Komentarz')
     date_added = models.DateTimeField(verbose_name='Data wpisu', auto_now_add=True)
@@ -203,12 +578,15 @@ class CommentRecipe(models.Model):
         )
 
 
-class Schedule(models.Model):
+class Schedule(LikesMixin, models.Model):
     
     class Meta:
         verbose_name = 'Plan'
         verbose_name_plural = 'Plany'
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['-likes_count', 'name'], name='schedule_likes_count_idx'),
+        ]
     
     name = models.CharField(verbose_name='Nazwa planu', max_length=128)
     description = models.TextField(verbose_name='Opis planu', null=True, blank=True)
@@ -231,12 +609,269 @@ class Schedule(models.Model):
         'User',
         related_name='likes_schedule',
         verbose_name='Polubienia',
+        through='ScheduleLike',
         )
+    likes_count = models.PositiveIntegerField(verbose_name='Liczba polubień', default=0, editable=False)
     
     def __str__(self):
         return self.name
+
+    def get_grid(self):
+
+        """
+        Return the week as 7 days of 5 meals, loaded with one joined query
+        """
+        slots = {
+            (item.day_number, item.meal_number): item.recipe
+            for item in self.schedule_recipes.select_related('recipe')
+        }
+
+        return [
+            {
+                'day_number': day_number,
+                'name': day_name,
+                'meals': [
+                    {
+                        'meal_number': meal_number,
+                        'name': meal_name,
+                        'recipe': slots.get((day_number, meal_number)),
+                    }
+                    for meal_number, meal_name in RecipeSchedule.MEAL_CHOICES
+                ],
+            }
+            for day_number, day_name in RecipeSchedule.DAY_CHOICES
+        ]
+
+    def save_slots(self, slots):
+
+        """
+        Save RecipeSchedule instances of the schedule with one bulk insert and one bulk update
+
+        Callers run it in transaction.atomic together with the save of the schedule itself.
+        """
+        new_slots = []
+        changed_slots = []
+
+        for slot in slots:
+            slot.schedule = self
+            
+            if slot.pk is None:
+                new_slots.append(slot)
+            else:
+                changed_slots.append(slot)
+
+        RecipeSchedule.objects.bulk_create(new_slots)
+        RecipeSchedule.objects.bulk_update(changed_slots, ['recipe', 'day_number', 'meal_number'])
+        bump_model_version(RecipeSchedule)
+        bump_object_version(Schedule, self.pk)
+        ScheduleNutrition.invalidate(schedule=self)
+
+    @transaction.atomic
+    def clone(self, create_by, name=None):
+
+        """
+        Return a copy of the schedule with all its slots, in a constant number of queries
+        """
+        slots = list(self.schedule_recipes.values_list('day_number', 'meal_number', 'recipe_id'))
+        schedule = Schedule.objects.create(
+            name=name or f'{self.name} (kopia)',
+            description=self.description,
+            create_by=create_by,
+        )
+        RecipeSchedule.objects.bulk_create([
+            RecipeSchedule(schedule=schedule, day_number=day_number, meal_number=meal_number, recipe_id=recipe_id)
+            for day_number, meal_number, recipe_id in slots
+        ])
+        bump_model_version(RecipeSchedule)
+        bump_object_version(Schedule, schedule.pk)
+        ScheduleNutrition.invalidate(schedule=schedule)
+
+        return schedule
  
 
+class ScheduleLike(models.Model):
+
+    class Meta:
+        verbose_name = 'Polubienie planu'
+        verbose_name_plural = 'Polubienia planów'
+        db_table = 'food_app_schedule_likes'
+        unique_together = ['schedule', 'user']
+        indexes = [
+            models.Index(fields=['date_added'], name='schedule_like_date_idx'),
+        ]
+
+    date_added = models.DateTimeField(verbose_name='Data polubienia', default=timezone.now)
+    schedule = models.ForeignKey(
+        'Schedule',
+        related_name='schedule_likes',
+        verbose_name='Plan',
+        on_delete=models.CASCADE
+        )
+    user = models.ForeignKey(
+        'User',
+        related_name='user_schedule_likes',
+        verbose_name='Użytkownik',
+        on_delete=models.CASCADE
+        )
+
+
+class ScheduleNutrition(models.Model):
+
+    """
+    Calories and weight of a schedule per day and week, kept until the schedule or one of its recipes changes
+
+    Recipe.calories is given per 100 g, the weight of a recipe is the sum of its ingredients in grams, with a
+    millilitre counted as a gram. Ingredients in pieces have no weight and recipes without calories add weight only.
+    """
+    class Meta:
+        verbose_name = 'Wartości odżywcze planu'
+        verbose_name_plural = 'Wartości odżywcze planów'
+
+    schedule = models.OneToOneField(
+        'Schedule',
+        related_name='nutrition',
+        verbose_name='Plan',
+        on_delete=models.CASCADE,
+        primary_key=True
+        )
+    calories = models.PositiveIntegerField(verbose_name='Kalorie w tygodniu', default=0)
+    weight = models.PositiveIntegerField(verbose_name='Waga w tygodniu [g]', default=0)
+    meals = models.PositiveSmallIntegerField(verbose_name='Posiłki w tygodniu', default=0)
+    days = models.JSONField(verbose_name='Dni', default=dict)
+    date_computed = models.DateTimeField(verbose_name='Data obliczenia', auto_now=True)
+
+    @staticmethod
+    def aggregate_days(schedule_pks):
+
+        """
+        Return {schedule pk: {day number: summary}} of the schedules from one aggregate query over their slots,
+        recipes and the ingredients of those
+        """
+        weighed = Q(recipe__recipe_ingredients__unit__in=[UNIT_GRAM, UNIT_MILLILITRE])
+        rows = RecipeSchedule.objects.filter(schedule__in=schedule_pks, recipe__isnull=False) \
+            .values('schedule', 'day_number').annotate(
+                weight=Sum('recipe__recipe_ingredients__amount', filter=weighed),
+                calories=Sum(F('recipe__recipe_ingredients__amount') * F('recipe__calories') / 100, filter=weighed),
+                meals=Count('pk', distinct=True),
+            ).order_by('schedule', 'day_number')
+        schedule_days = {pk: {} for pk in schedule_pks}
+
+        for row in rows:
+            schedule_days[row['schedule']][str(row['day_number'])] = {
+                'calories': round(row['calories'] or 0),
+                'weight': round(row['weight'] or 0),
+                'meals': row['meals'],
+            }
+
+        return schedule_days
+
+    @staticmethod
+    def get_totals(days):
+
+        return {
+            'calories': sum(day['calories'] for day in days.values()),
+            'weight': sum(day['weight'] for day in days.values()),
+            'meals': sum(day['meals'] for day in days.values()),
+            'days': days,
+        }
+
+    @classmethod
+    def summarize(cls, schedule_pks):
+
+        """
+        Return {schedule pk: unsaved summary} from one aggregate query, for reads that must not write
+        """
+        return {
+            pk: cls(schedule_id=pk, **cls.get_totals(days)) for pk, days in cls.aggregate_days(schedule_pks).items()
+        }
+
+    @classmethod
+    def store_missing(cls, schedule_pks):
+
+        """
+        Compute and store the summaries of the schedules still without one, with one aggregate query and one INSERT
+
+        A summary stored meanwhile by a concurrent request is kept, both are computed from the same rows.
+        """
+        pks = list(Schedule.objects.filter(pk__in=schedule_pks, nutrition__isnull=True).values_list('pk', flat=True))
+
+        if not pks:
+            return {}
+
+        summaries = cls.summarize(pks)
+
+        try:
+            with transaction.atomic():
+                cls.objects.bulk_create(summaries.values(), ignore_conflicts=True)
+        except IntegrityError:
+            # a schedule deleted meanwhile, the others are summarized on read until their next change
+            return {}
+
+        return summaries
+
+    @classmethod
+    def invalidate(cls, schedule=None, recipe=None):
+
+        """
+        Drop the summary of the schedule, or of every schedule planning the recipe
+
+        They are stored again once the change is committed, so reads never write the summaries themselves.
+        """
+        pks = set()
+
+        if schedule is not None:
+            pks.add(getattr(schedule, 'pk', schedule))
+
+        if recipe is not None:
+            pks.update(RecipeSchedule.objects.filter(recipe=recipe).values_list('schedule', flat=True).distinct())
+
+        if not pks:
+            return
+
+        cls.objects.filter(schedule__in=pks).delete()
+        transaction.on_commit(lambda: cls.store_missing(pks))
+
+    def get_day(self, day_number):
+
+        return self.days.get(str(day_number))
+
+
+class LeaderboardEntry(models.Model):
+
+    class Meta:
+        verbose_name = 'Pozycja rankingu'
+        verbose_name_plural = 'Ranking'
+        unique_together = ['board', 'position']
+        ordering = ['board', 'position']
+
+    BOARD_CHOICES = (
+        ('recipes', 'Przepisy'),
+        ('recipes-window', 'Przepisy - ostatnie dni'),
+        ('schedules', 'Plany'),
+        ('schedules-window', 'Plany - ostatnie dni'),
+    )
+
+    board = models.CharField(verbose_name='Ranking', max_length=32, choices=BOARD_CHOICES)
+    position = models.PositiveSmallIntegerField(verbose_name='Pozycja')
+    score = models.PositiveIntegerField(verbose_name='Polubienia')
+    recipe = models.ForeignKey(
+        'Recipe',
+        related_name='leaderboard_entries',
+        verbose_name='Przepis',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True
+        )
+    schedule = models.ForeignKey(
+        'Schedule',
+        related_name='leaderboard_entries',
+        verbose_name='Plan',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True
+        )
+
+
 class RecipeSchedule(models.Model):
     
     class Meta:
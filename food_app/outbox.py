@@ -0,0 +1,125 @@
+import logging
+import uuid
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_batch_size():
+
+    return getattr(settings, 'FOOD_APP_EMAIL_BATCH_SIZE', 50)
+
+
+def get_max_attempts():
+
+    return getattr(settings, 'FOOD_APP_EMAIL_MAX_ATTEMPTS', 5)
+
+
+def get_retry_delay(attempts):
+
+    """
+    Return the exponential backoff before the next attempt, capped at FOOD_APP_EMAIL_RETRY_MAX_DELAY
+    """
+    delay = getattr(settings, 'FOOD_APP_EMAIL_RETRY_DELAY', 60) * 2 ** (attempts - 1)
+
+    return timedelta(seconds=min(delay, getattr(settings, 'FOOD_APP_EMAIL_RETRY_MAX_DELAY', 60 * 60)))
+
+
+def get_lease():
+
+    return timedelta(seconds=getattr(settings, 'FOOD_APP_EMAIL_LEASE', 5 * 60))
+
+
+def claim_batch(batch_size=None):
+
+    """
+    Return the due emails, leased to this worker by pushing their next attempt past the lease time
+
+    The lease is a conditional UPDATE repeating the due conditions and tagging the rows with a fresh claim token,
+    so of workers that selected the same rows only the first one updates them, and each sends only its own rows.
+    Where the backend supports it, rows locked by another worker are skipped already by the selection.
+    """
+    now = timezone.now()
+    token = uuid.uuid4()
+    due = OutboxEmail.objects.filter(status=OutboxEmail.STATUS_PENDING, next_attempt__lte=now)
+    candidates = due.order_by('next_attempt', 'pk')
+
+    if connection.features.has_select_for_update_skip_locked:
+        candidates = candidates.select_for_update(skip_locked=True)
+
+    with transaction.atomic():
+        pks = list(candidates.values_list('pk', flat=True)[:batch_size or get_batch_size()])
+        due.filter(pk__in=pks).update(next_attempt=now + get_lease(), claim_token=token)
+
+    return list(OutboxEmail.objects.filter(claim_token=token).order_by('next_attempt', 'pk'))
+
+
+def send_batch(batch_size=None):
+
+    """
+    Send one batch of due emails over a single backend connection, return the (sent, failed) counts
+    """
+    emails = claim_batch(batch_size)
+
+    if not emails:
+        return 0, 0
+
+    now = timezone.now()
+    sent = []
+    failed = []
+    email_connection = get_connection()
+
+    try:
+        email_connection.open()
+    except Exception as error:
+        logger.exception('Opening the email connection failed')
+        failed = [(email, error) for email in emails]
+    else:
+        try:
+            for email in emails:
+                message = EmailMessage(
+                    subject=email.subject,
+                    body=email.body,
+                    from_email=email.from_email,
+                    to=email.to,
+                    connection=email_connection,
+                )
+
+                try:
+                    message.send()
+                except Exception as error:
+                    failed.append((email, error))
+                else:
+                    sent.append(email)
+        finally:
+            email_connection.close()
+
+    for email in sent:
+        email.status = OutboxEmail.STATUS_SENT
+        email.attempts += 1
+        email.date_sent = now
+        email.last_error = ''
+
+    for email, error in failed:
+        email.attempts += 1
+        email.last_error = repr(error)
+        email.next_attempt = now + get_retry_delay(email.attempts)
+
+        if email.attempts >= get_max_attempts():
+            email.status = OutboxEmail.STATUS_FAILED
+
+    OutboxEmail.objects.bulk_update(
+        sent + [email for email, error in failed],
+        ['status', 'attempts', 'date_sent', 'last_error', 'next_attempt'],
+    )
+
+    return len(sent), len(failed)
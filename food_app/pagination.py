@@ -0,0 +1,196 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import Http404
+
+
+MIN_INTEGER = -2 ** 63
+MAX_INTEGER = 2 ** 63 - 1
+
+
+class InvalidCursor(ValueError):
+
+    pass
+
+
+def encode_cursor(values):
+
+    data = json.dumps(values, default=str, separators=(',', ':'))
+
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+
+    try:
+        data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(data)
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+
+    if not isinstance(values, list):
+        raise InvalidCursor('Invalid cursor')
+
+    return values
+
+
+def clean_cursor_values(model, ordering, values):
+
+    """
+    Convert the decoded values with the seek fields, so a crafted cursor fails here instead of inside the query
+    """
+    if len(ordering) != len(values):
+        raise InvalidCursor('Invalid cursor')
+
+    cleaned = []
+
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        model_field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+
+        try:
+            value = model_field.to_python(value)
+            # the range validators keep out integers the column cannot hold, SQLite has none and binds 64 bits
+            model_field.run_validators(value)
+        except (ValidationError, ValueError, TypeError, KeyError):
+            raise InvalidCursor('Invalid cursor')
+
+        if isinstance(value, int) and not MIN_INTEGER <= value <= MAX_INTEGER:
+            raise InvalidCursor('Invalid cursor')
+
+        cleaned.append(value)
+
+    if None in cleaned:
+        raise InvalidCursor('Invalid cursor')
+
+    return cleaned
+
+
+def keyset_filter(ordering, values):
+
+    """
+    Return the Q object selecting rows placed after values in the given ordering
+    """
+    if len(ordering) != len(values):
+        raise InvalidCursor('Invalid cursor')
+
+    condition = Q()
+    equal = Q()
+
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+
+    return condition
+
+
+def keyset_values(obj, ordering):
+
+    return [getattr(obj, field.lstrip('-')) for field in ordering]
+
+
+class CursorPage:
+
+    """
+    Page of a keyset paginated list, without any knowledge of the total count
+    """
+    def __init__(self, object_list, next_cursor=None, cursor=None):
+
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.cursor = cursor
+
+    def __iter__(self):
+
+        return iter(self.object_list)
+
+    def __len__(self):
+
+        return len(self.object_list)
+
+    def has_next(self):
+
+        return self.next_cursor is not None
+
+    def has_previous(self):
+
+        return bool(self.cursor)
+
+
+def paginate_by_cursor(queryset, ordering, page_size, cursor=None):
+
+    """
+    Return the CursorPage following cursor, seeking by the ordering instead of OFFSET
+
+    Raises InvalidCursor when the cursor was not made by this ordering.
+    """
+    queryset = queryset.order_by(*ordering)
+
+    if cursor:
+        values = clean_cursor_values(queryset.model, ordering, decode_cursor(cursor))
+        queryset = queryset.filter(keyset_filter(ordering, values))
+
+    object_list = list(queryset[:page_size + 1])
+    next_cursor = None
+
+    if len(object_list) > page_size:
+        object_list = object_list[:page_size]
+        next_cursor = encode_cursor(keyset_values(object_list[-1], ordering))
+
+    return CursorPage(object_list, next_cursor=next_cursor, cursor=cursor)
+
+
+class CursorPaginationMixin:
+
+    """
+    Opt-in keyset pagination for ListView, switched on by the ?cursor= parameter
+    """
+    cursor_ordering = None
+    cursor_query_param = 'cursor'
+
+    @property
+    def cursor_mode(self):
+
+        return self.cursor_ordering is not None and self.cursor_query_param in self.request.GET
+
+    def get_search_count(self, queryset):
+
+        if self.cursor_mode:
+            return ''
+
+        return queryset.count()
+
+    def paginate_queryset(self, queryset, page_size):
+
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, page_size)
+
+        try:
+            page = paginate_by_cursor(
+                queryset=queryset,
+                ordering=self.cursor_ordering,
+                page_size=page_size,
+                cursor=self.request.GET.get(self.cursor_query_param),
+            )
+        except InvalidCursor:
+            raise Http404('Invalid cursor')
+
+        return (None, page, page.object_list, page.has_next() or page.has_previous())
+
+    def get_context_data(self, *args, **kwargs):
+
+        context = super().get_context_data(*args, **kwargs)
+        context['cursor_mode'] = self.cursor_mode
+
+        if self.cursor_mode:
+            query = self.request.GET.copy()
+            query.pop('page', None)
+            query.pop(self.cursor_query_param, None)
+            query[self.cursor_query_param] = ''
+            context['path_cursor'] = f'{self.request.path}?{query.urlencode()}'
+
+        return context
@@ -0,0 +1,269 @@
+import json
+import logging
+import re
+import threading
+import time
+
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends import django as django_backend
+
+
+logger = logging.getLogger(__name__)
+
+IN_LIST_RE = re.compile(r'IN \((?:%s, )*%s\)')
+
+current_profile = ContextVar('current_profile', default=None)
+
+UNRESOLVED = '<unresolved>'
+
+
+class QueryBudgetExceeded(Exception):
+
+    pass
+
+
+def get_query_budget(url_name):
+
+    """
+    Return the query budget of the view, FOOD_APP_QUERY_BUDGET is a number or a {url name: number} dict
+    """
+    budget = getattr(settings, 'FOOD_APP_QUERY_BUDGET', None)
+
+    if isinstance(budget, dict):
+        return budget.get(url_name, budget.get('*'))
+
+    return budget
+
+
+def get_url_name(request):
+
+    """
+    Return the key samples of the request are kept under, bounded by the URL patterns rather than the paths
+
+    Unnamed routes fall back to their pattern and requests matching no route (e.g. 404s) share one key.
+    """
+    match = request.resolver_match
+
+    if match is None:
+        return UNRESOLVED
+
+    return match.view_name if match.url_name else match.route
+
+
+def fingerprint(sql):
+
+    return IN_LIST_RE.sub('IN (...)', sql)
+
+
+class RequestProfile:
+
+    """
+    Database and template cost of one request
+    """
+    def __init__(self):
+
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+
+        start = time.perf_counter()
+
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.queries += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    @property
+    def duplicates(self):
+
+        return {sql: count for sql, count in self.fingerprints.most_common() if count > 1}
+
+
+class ProfileStats:
+
+    """
+    Rolling in-process samples of the last requests of every URL name
+    """
+    def __init__(self, size=100):
+
+        self.size = size
+        self.samples = defaultdict(lambda: deque(maxlen=self.size))
+        self.duplicates = defaultdict(Counter)
+        self.lock = threading.Lock()
+
+    def add(self, url_name, sample, duplicates):
+
+        with self.lock:
+            self.samples[url_name].append(sample)
+
+            for sql, count in duplicates.items():
+                self.duplicates[url_name][sql] += count - 1
+
+    def clear(self):
+
+        with self.lock:
+            self.samples.clear()
+            self.duplicates.clear()
+
+    @staticmethod
+    def percentile(values, percent):
+
+        values = sorted(values)
+
+        return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+    def summary(self):
+
+        with self.lock:
+            samples = {url_name: list(rows) for url_name, rows in self.samples.items()}
+            duplicates = {url_name: counter.most_common(5) for url_name, counter in self.duplicates.items()}
+
+        summary = {}
+
+        for url_name, rows in samples.items():
+            summary[url_name] = {
+                'requests': len(rows),
+                'queries_avg': round(sum(row['queries'] for row in rows) / len(rows), 2),
+                'queries_max': max(row['queries'] for row in rows),
+                'sql_ms_avg': round(sum(row['sql_ms'] for row in rows) / len(rows), 2),
+                'template_ms_avg': round(sum(row['template_ms'] for row in rows) / len(rows), 2),
+                'total_ms_p50': self.percentile([row['total_ms'] for row in rows], 50),
+                'total_ms_p95': self.percentile([row['total_ms'] for row in rows], 95),
+                'duplicate_queries': [{'sql': sql, 'extra': count} for sql, count in duplicates.get(url_name, [])],
+            }
+
+        return summary
+
+
+profile_stats = ProfileStats()
+log_lock = threading.Lock()
+
+
+def install_template_timer():
+
+    """
+    Time the top level renders of the Django template backend, includes are part of their parent render
+    """
+    render = django_backend.Template.render
+
+    if getattr(render, 'profiled', False):
+        return
+
+    def profiled_render(self, *args, **kwargs):
+
+        profile = current_profile.get()
+
+        if profile is None or profile.template_depth:
+            return render(self, *args, **kwargs)
+
+        profile.template_depth += 1
+        start = time.perf_counter()
+
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            profile.template_time += time.perf_counter() - start
+            profile.template_depth -= 1
+
+    profiled_render.profiled = True
+    django_backend.Template.render = profiled_render
+
+
+class ProfilingMiddleware:
+
+    """
+    Record query count, SQL time, template time and duplicate queries of every request, switched on by FOOD_APP_PROFILING
+
+    The numbers go to the Server-Timing header, the profiling-stats endpoint and, with FOOD_APP_PROFILING_LOG,
+    a JSON lines file. A view over its FOOD_APP_QUERY_BUDGET raises QueryBudgetExceeded when
+    FOOD_APP_QUERY_BUDGET_STRICT is set (e.g. in tests), otherwise it is logged.
+    """
+    def __init__(self, get_response):
+
+        if not getattr(settings, 'FOOD_APP_PROFILING', False):
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        install_template_timer()
+
+    def __call__(self, request):
+
+        profile = RequestProfile()
+        token = current_profile.set(profile)
+        start = time.perf_counter()
+
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile))
+
+                response = self.get_response(request)
+        finally:
+            current_profile.reset(token)
+
+        total_time = time.perf_counter() - start
+        url_name = get_url_name(request)
+        sample = {
+            'queries': profile.queries,
+            'sql_ms': round(profile.sql_time * 1000, 2),
+            'template_ms': round(profile.template_time * 1000, 2),
+            'total_ms': round(total_time * 1000, 2),
+        }
+        duplicates = profile.duplicates
+
+        response.headers['Server-Timing'] = ', '.join([
+            f'db;dur={sample["sql_ms"]};desc="{profile.queries} queries"',
+            f'tpl;dur={sample["template_ms"]}',
+            f'total;dur={sample["total_ms"]}',
+        ])
+        profile_stats.add(url_name, sample, duplicates)
+        self.write_log(request, url_name, response, sample, duplicates)
+        self.check_budget(url_name, profile.queries)
+
+        return response
+
+    def write_log(self, request, url_name, response, sample, duplicates):
+
+        path = getattr(settings, 'FOOD_APP_PROFILING_LOG', None)
+
+        if not path:
+            return
+
+        line = json.dumps({
+            'time': time.time(),
+            'url_name': url_name,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            **sample,
+            'duplicates': duplicates,
+        })
+
+        with log_lock, open(path, 'a') as log:
+            log.write(line + '\n')
+
+    def check_budget(self, url_name, queries):
+
+        budget = get_query_budget(url_name)
+
+        if budget is None or queries <= budget:
+            return
+
+        message = f'{url_name} ran {queries} queries, over its budget of {budget}'
+
+        if getattr(settings, 'FOOD_APP_QUERY_BUDGET_STRICT', False):
+            raise QueryBudgetExceeded(message)
+
+        logger.warning(message)
@@ -0,0 +1,96 @@
+import re
+
+from decimal import Decimal, InvalidOperation
+
+
+UNIT_GRAM = 'g'
+UNIT_MILLILITRE = 'ml'
+UNIT_PIECE = 'szt.'
+
+# stored amounts have a thousandth of a gram, millilitre or piece precision and fit in 12 digits
+AMOUNT_PLACES = 3
+AMOUNT_LIMIT = Decimal(10) ** (12 - AMOUNT_PLACES)
+
+# unit spellings found in IngredientRecipe.quantity, as (base unit, factor to the base unit)
+UNITS = {
+    'mg': (UNIT_GRAM, Decimal('0.001')),
+    'g': (UNIT_GRAM, Decimal(1)),
+    'gr': (UNIT_GRAM, Decimal(1)),
+    'gram': (UNIT_GRAM, Decimal(1)),
+    'gramy': (UNIT_GRAM, Decimal(1)),
+    'gramów': (UNIT_GRAM, Decimal(1)),
+    'dag': (UNIT_GRAM, Decimal(10)),
+    'dkg': (UNIT_GRAM, Decimal(10)),
+    'kg': (UNIT_GRAM, Decimal(1000)),
+    'ml': (UNIT_MILLILITRE, Decimal(1)),
+    'l': (UNIT_MILLILITRE, Decimal(1000)),
+    'litr': (UNIT_MILLILITRE, Decimal(1000)),
+    'litry': (UNIT_MILLILITRE, Decimal(1000)),
+    'litrów': (UNIT_MILLILITRE, Decimal(1000)),
+    'łyżeczka': (UNIT_MILLILITRE, Decimal(5)),
+    'łyżeczki': (UNIT_MILLILITRE, Decimal(5)),
+    'łyżeczek': (UNIT_MILLILITRE, Decimal(5)),
+    'łyżka': (UNIT_MILLILITRE, Decimal(15)),
+    'łyżki': (UNIT_MILLILITRE, Decimal(15)),
+    'łyżek': (UNIT_MILLILITRE, Decimal(15)),
+    'szklanka': (UNIT_MILLILITRE, Decimal(250)),
+    'szklanki': (UNIT_MILLILITRE, Decimal(250)),
+    'szklanek': (UNIT_MILLILITRE, Decimal(250)),
+    'szt': (UNIT_PIECE, Decimal(1)),
+    'sztuka': (UNIT_PIECE, Decimal(1)),
+    'sztuki': (UNIT_PIECE, Decimal(1)),
+    'sztuk': (UNIT_PIECE, Decimal(1)),
+    '': (UNIT_PIECE, Decimal(1)),
+}
+
+# larger units used to display summed amounts
+DISPLAY_UNITS = {
+    UNIT_GRAM: [(Decimal(1000), 'kg')],
+    UNIT_MILLILITRE: [(Decimal(1000), 'l')],
+}
+
+QUANTITY_RE = re.compile(r'^\s*(?P<number>\d+(?:[.,]\d+)?)(?:\s*/\s*(?P<denominator>\d+))?\s*(?P<unit>[^\d\s]*)\s*$')
+
+
+def parse_quantity(text):
+
+    """
+    Return (amount, base unit) of a free form quantity like '1,5 kg' or '1/2 szklanki', None when not understood
+    """
+    match = QUANTITY_RE.match((text or '').lower())
+
+    if not match:
+        return None
+
+    unit = UNITS.get(match['unit'].rstrip('.'))
+
+    if unit is None:
+        return None
+
+    try:
+        amount = Decimal(match['number'].replace(',', '.'))
+
+        if match['denominator']:
+            amount /= Decimal(match['denominator'])
+    except (InvalidOperation, ZeroDivisionError):
+        return None
+
+    base_unit, factor = unit
+    amount *= factor
+
+    if amount >= AMOUNT_LIMIT:
+        return None
+
+    return amount.quantize(Decimal(1).scaleb(-AMOUNT_PLACES)), base_unit
+
+
+def format_amount(amount, unit):
+
+    for factor, display_unit in DISPLAY_UNITS.get(unit, []):
+        if amount >= factor:
+            amount, unit = amount / factor, display_unit
+            break
+
+    amount = amount.quantize(Decimal('0.01')).normalize()
+
+    return f'{amount:f}'.replace('.', ',') + f' {unit}'
@@ -0,0 +1,160 @@
+import random
+
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+PIN_COOKIE = 'food_app_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+current_routing = ContextVar('current_routing', default=None)
+
+
+def get_replicas():
+
+    return getattr(settings, 'FOOD_APP_REPLICAS', [])
+
+
+def get_pin_seconds():
+
+    """
+    Return how long a user reads from the primary after a write, longer than the replication lag
+    """
+    return getattr(settings, 'FOOD_APP_REPLICA_PIN_SECONDS', 10)
+
+
+def reads_replica():
+
+    """
+    Return True while the current request may read from a replica
+    """
+    routing = current_routing.get()
+
+    return routing is not None and routing.read_replica and not routing.wrote and bool(get_replicas())
+
+
+def read_primary(view_func):
+
+    """
+    Keep every read of the view on the primary, for responses validated by versions the primary committed
+    (an ETag over replica rows could label stale data as fresh)
+    """
+    def wrapped_view(*args, **kwargs):
+
+        return view_func(*args, **kwargs)
+
+    wrapped_view.read_primary = True
+
+    return wraps(view_func)(wrapped_view)
+
+
+class RequestRouting:
+
+    """
+    Database choice of one request, replica reads are allowed until the request writes
+    """
+    def __init__(self, read_replica=False):
+
+        self.read_replica = read_replica
+        self.wrote = False
+
+
+class ReplicaRouter:
+
+    """
+    Send food_app reads of read-only requests to a random FOOD_APP_REPLICAS database, everything else to the primary
+
+    Outside requests (management commands, workers, tests without the middleware) nothing leaves the primary.
+    """
+    def db_for_read(self, model, **hints):
+
+        routing = current_routing.get()
+        replicas = get_replicas()
+
+        if (
+            routing is None
+            or not routing.read_replica
+            or routing.wrote
+            or not replicas
+            or model._meta.app_label != 'food_app'
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+
+        instance = hints.get('instance')
+
+        # related objects are read from the database their parent came from
+        if instance is not None and instance._state.db:
+            return instance._state.db
+
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+
+        routing = current_routing.get()
+
+        # session and other contrib writes are read back from the primary anyway
+        if routing is not None and model._meta.app_label == 'food_app':
+            routing.wrote = True
+
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+
+        # replicas receive the schema by replication
+        if db in get_replicas():
+            return False
+
+        return None
+
+
+class ReplicaPinningMiddleware:
+
+    """
+    Allow replica reads for GET requests to food_app views, unless the user wrote within FOOD_APP_REPLICA_PIN_SECONDS
+
+    A request that writes, or uses an unsafe method, sets a short lived cookie that keeps the user on the primary,
+    so their own likes, comments and wizard results are visible right away.
+    """
+    def __init__(self, get_response):
+
+        self.get_response = get_response
+
+    def __call__(self, request):
+
+        routing = RequestRouting()
+        token = current_routing.set(routing)
+
+        try:
+            response = self.get_response(request)
+        finally:
+            current_routing.reset(token)
+
+        if routing.wrote or request.method not in SAFE_METHODS:
+            response.set_cookie(PIN_COOKIE, '1', max_age=get_pin_seconds(), httponly=True, samesite='Lax')
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+
+        routing = current_routing.get()
+
+        if routing is not None:
+            routing.read_replica = (
+                request.method in SAFE_METHODS
+                and PIN_COOKIE not in request.COOKIES
+                and view_func.__module__.startswith('food_app.')
+                and not getattr(view_func, 'read_primary', False)
+            )
@@ -0,0 +1,202 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+
+SEARCH_FIELDS = {
+    'recipe': ['name', 'description', 'preparing'],
+    'schedule': ['name', 'description'],
+    'ingredient': ['name'],
+}
+
+SEARCH_CONFIG = 'simple'
+
+
+def search_terms(query):
+
+    return re.findall(r'\w+', query or '')
+
+
+class BaseSearchBackend:
+
+    """
+    Search engine behind SearchForm, filters and ranks querysets of searchable models
+    """
+    def search(self, queryset, query, rank=True):
+
+        if not search_terms(query):
+            return queryset.none()
+
+        queryset = queryset.filter(self.get_filter(queryset.model, query))
+
+        if rank:
+            ranking = self.get_rank(queryset.model, query)
+
+            if ranking is not None:
+                ordering = queryset.query.order_by or queryset.model._meta.ordering
+                queryset = queryset.annotate(search_rank=ranking).order_by('-search_rank', *ordering)
+
+        return queryset
+
+    def search_related(self, queryset, field, query):
+
+        related_model = queryset.model._meta.get_field(field).related_model
+
+        if not search_terms(query):
+            return queryset.none()
+
+        return queryset.filter(**{f'{field}__in': related_model.objects.filter(self.get_filter(related_model, query))})
+
+    def get_filter(self, model, query):
+
+        raise NotImplementedError
+
+    def get_rank(self, model, query):
+
+        return None
+
+
+class BasicSearchBackend(BaseSearchBackend):
+
+    """
+    Portable fallback, case insensitive substring match without ranking
+    """
+    def get_filter(self, model, query):
+
+        condition = Q()
+
+        for field in SEARCH_FIELDS[model._meta.model_name]:
+            condition |= Q(**{f'{field}__icontains': query})
+
+        return condition
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+
+    """
+    tsvector prefix match plus pg_trgm accelerated substring match on name, both served by GIN indexes
+
+    Unlike the icontains fallback, description and preparing only match whole words or word prefixes.
+    """
+    def get_vector(self, model):
+
+        from django.contrib.postgres.search import SearchVector
+
+        return SearchVector(*SEARCH_FIELDS[model._meta.model_name], config=SEARCH_CONFIG)
+
+    def get_query(self, query):
+
+        from django.contrib.postgres.search import SearchQuery
+
+        terms = ' & '.join(f'{term}:*' for term in search_terms(query))
+
+        return SearchQuery(terms, config=SEARCH_CONFIG, search_type='raw')
+
+    def get_filter(self, model, query):
+
+        from django.contrib.postgres.search import SearchVectorExact
+
+        return Q(SearchVectorExact(self.get_vector(model), self.get_query(query))) | Q(name__icontains=query)
+
+    def get_rank(self, model, query):
+
+        from django.contrib.postgres.search import SearchRank, TrigramSimilarity
+
+        return SearchRank(self.get_vector(model), self.get_query(query)) + TrigramSimilarity('name', query)
+
+
+class SqliteSearchBackend(BaseSearchBackend):
+
+    """
+    FTS5 shadow tables kept in sync with the model tables by triggers
+
+    Every term matches the start of a word, accents ignored, so "pom" finds "Pomidorowa" but "dorowa" finds
+    nothing, where the icontains fallback matches any substring.
+    """
+    @staticmethod
+    def fts_table(model):
+
+        return f'{model._meta.db_table}_fts'
+
+    @staticmethod
+    def get_match(query):
+
+        return ' '.join('"{}"*'.format(term.replace('"', '""')) for term in search_terms(query))
+
+    def get_filter(self, model, query):
+
+        fts_table = self.fts_table(model)
+
+        return Q(pk__in=RawSQL(f'SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH %s', [self.get_match(query)]))
+
+    def get_rank(self, model, query):
+
+        fts_table = self.fts_table(model)
+        weights = ', '.join(['10.0'] + ['1.0'] * (len(SEARCH_FIELDS[model._meta.model_name]) - 1))
+
+        return RawSQL(
+            f'SELECT -bm25({fts_table}, {weights}) FROM {fts_table} '
+            f'WHERE {fts_table} MATCH %s AND {fts_table}.rowid = {model._meta.db_table}.{model._meta.pk.column}',
+            [self.get_match(query)]
+        )
+
+    @classmethod
+    def install(cls, model, cursor):
+
+        """
+        Create the shadow table and its triggers, rebuilding the index when the table is new
+        """
+        table = model._meta.db_table
+        pk = model._meta.pk.column
+        fts_table = cls.fts_table(model)
+        fields = [model._meta.get_field(field).column for field in SEARCH_FIELDS[model._meta.model_name]]
+        columns = ', '.join(fields)
+        new_values = ', '.join(f'new.{field}' for field in fields)
+        old_values = ', '.join(f'old.{field}' for field in fields)
+
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [fts_table])
+        created = cursor.fetchone() is None
+
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5({columns}, "
+            f"content='{table}', content_rowid='{pk}', tokenize='unicode61 remove_diacritics 2')"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts_table}(rowid, {columns}) VALUES (new.{pk}, {new_values}); END"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts_table}({fts_table}, rowid, {columns}) VALUES ('delete', old.{pk}, {old_values}); END"
+        )
+        # only updates of the indexed columns rewrite the index, not the F() updates of the counters,
+        # dropped first so databases with the older trigger get this one
+        cursor.execute(f"DROP TRIGGER IF EXISTS {fts_table}_au")
+        cursor.execute(
+            f"CREATE TRIGGER {fts_table}_au AFTER UPDATE OF {columns} ON {table} BEGIN "
+            f"INSERT INTO {fts_table}({fts_table}, rowid, {columns}) VALUES ('delete', old.{pk}, {old_values}); "
+            f"INSERT INTO {fts_table}(rowid, {columns}) VALUES (new.{pk}, {new_values}); END"
+        )
+
+        if created:
+            cursor.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+
+
+SEARCH_BACKENDS = {
+    'postgresql': PostgresSearchBackend,
+    'sqlite': SqliteSearchBackend,
+}
+
+
+def get_search_backend():
+
+    backend_path = getattr(settings, 'FOOD_APP_SEARCH_BACKEND', None)
+
+    if backend_path:
+        return import_string(backend_path)()
+
+    return SEARCH_BACKENDS.get(connection.vendor, BasicSearchBackend)()
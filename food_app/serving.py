@@ -0,0 +1,169 @@
+import mimetypes
+import os
+import re
+import stat
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import Http404, HttpResponse, FileResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+from .storage import is_immutable_name
+
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+STATIC_HASH_RE = re.compile(r'\.[0-9a-f]{12}\.\w+$')
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+CHUNK_SIZE = 64 * 1024
+
+
+def get_sendfile_mode():
+
+    """
+    Return None to stream files from Python, 'x-sendfile' or 'x-accel-redirect' to hand them to the web server
+    """
+    return getattr(settings, 'FOOD_APP_SENDFILE', None)
+
+
+def get_cache_control(path):
+
+    if is_immutable_name(path) or STATIC_HASH_RE.search(path):
+        return IMMUTABLE_CACHE_CONTROL
+
+    return getattr(settings, 'FOOD_APP_MEDIA_CACHE_CONTROL', 'public, max-age=0, must-revalidate')
+
+
+def get_etag(stat_result):
+
+    return f'"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+
+
+def parse_range(header, size):
+
+    """
+    Return the (start, end) of a single byte range, None when the header is absent or unsupported
+
+    Raises ValueError for a range outside the file.
+    """
+    match = RANGE_RE.match(header or '')
+
+    if not match or match.groups() == ('', ''):
+        return None
+
+    start, end = match.groups()
+
+    if not start:
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+
+    if start >= size or start > end:
+        raise ValueError('Range not satisfiable')
+
+    return start, end
+
+
+def if_range_matches(request, etag, last_modified):
+
+    if_range = request.headers.get('If-Range')
+
+    if if_range is None:
+        return True
+
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def read_range(path, start, length):
+
+    with open(path, 'rb') as file:
+        file.seek(start)
+
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+
+            if not chunk:
+                break
+
+            length -= len(chunk)
+            yield chunk
+
+
+@require_safe
+def serve_file(request, path, document_root, internal_url=None):
+
+    """
+    Serve a file with validators, conditional GET and byte ranges, optionally through the web server
+
+    With FOOD_APP_SENDFILE the response carries X-Sendfile or X-Accel-Redirect (to internal_url) and no body,
+    so no Python worker streams bytes; the web server then handles ranges itself.
+    """
+    try:
+        full_path = safe_join(document_root, path)
+        stat_result = os.stat(full_path)
+    except (SuspiciousFileOperation, ValueError, OSError):
+        raise Http404('File does not exist')
+
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise Http404('File does not exist')
+
+    etag = get_etag(stat_result)
+    last_modified = int(stat_result.st_mtime)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(last_modified),
+        'Cache-Control': get_cache_control(path),
+        'Accept-Ranges': 'bytes',
+    }
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+    if response is not None:
+        for header, value in headers.items():
+            response.headers[header] = value
+
+        return response
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+    sendfile = get_sendfile_mode()
+
+    if sendfile:
+        response = HttpResponse(content_type=content_type)
+
+        if sendfile == 'x-accel-redirect':
+            response.headers['X-Accel-Redirect'] = f'{internal_url}{path}'
+        else:
+            response.headers['X-Sendfile'] = full_path
+    else:
+        try:
+            byte_range = parse_range(request.headers.get('Range'), stat_result.st_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response.headers['Content-Range'] = f'bytes */{stat_result.st_size}'
+
+            return response
+
+        if byte_range and if_range_matches(request, etag, last_modified):
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                read_range(full_path, start, end - start + 1), status=206, content_type=content_type
+            )
+            response.headers['Content-Range'] = f'bytes {start}-{end}/{stat_result.st_size}'
+            response.headers['Content-Length'] = str(end - start + 1)
+        else:
+            response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+
+    for header, value in headers.items():
+        response.headers[header] = value
+
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+
+    return response
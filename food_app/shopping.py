@@ -0,0 +1,57 @@
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from .cache import CACHE_PREFIX, get_cache_timeout, get_object_versions, get_versions_key
+from .models import Ingredient, IngredientRecipe, Schedule
+from .quantities import format_amount
+
+
+def build_shopping_list(schedule_pk):
+
+    """
+    Sum the ingredients of every recipe in the schedule in one query, a recipe planned for several meals counts
+    several times
+
+    It is read from the primary, the result is cached under the current versions.
+    """
+    shopping_list = []
+
+    for row in IngredientRecipe.objects.using(DEFAULT_DB_ALIAS).for_schedule(schedule_pk).totals():
+        if not shopping_list or shopping_list[-1]['ingredient_id'] != row['ingredient_id']:
+            shopping_list.append({
+                'ingredient': row['ingredient__name'],
+                'ingredient_id': row['ingredient_id'],
+                'amounts': {},
+                'quantities': [],
+                'unparsed': [],
+            })
+
+        item = shopping_list[-1]
+
+        if row['unit'] is None:
+            item['unparsed'].extend([row['unparsed']] * row['count'])
+        else:
+            item['amounts'][row['unit']] = row['total']
+            item['quantities'].append(format_amount(row['total'], row['unit']))
+
+    return shopping_list
+
+
+def get_shopping_list(schedule_pk):
+
+    """
+    Return the summed ingredients of all recipes in the schedule, cached until its slots or any ingredients change
+
+    A changed slot recomputes the whole list with the single GROUP BY query of build_shopping_list, there is no
+    per-recipe partial result to merge.
+    """
+    version = get_object_versions(Schedule, [schedule_pk])[schedule_pk]
+    models = [IngredientRecipe, Ingredient]
+    key = f'{CACHE_PREFIX}:shopping:schedule:{schedule_pk}:{version}:{get_versions_key(models)}'
+    shopping_list = cache.get(key)
+
+    if shopping_list is None:
+        shopping_list = build_shopping_list(schedule_pk)
+        cache.set(key, shopping_list, timeout=get_cache_timeout())
+
+    return shopping_list
@@ -0,0 +1,159 @@
+from django.db import connections
+from django.db.models import F
+from django.db.models.signals import pre_delete, post_save, post_delete, post_migrate, m2m_changed
+from django.dispatch import receiver
+
+from .models import User, Recipe, Schedule, Ingredient, IngredientRecipe, CommentRecipe, RecipeSchedule, \
+    ScheduleNutrition, like_changed
+from .search import SqliteSearchBackend
+from .cache import bump_model_version, bump_object_version, bump_counters_version
+from .leaderboard import update_boards, refresh_model_boards
+
+
+@receiver(pre_delete, sender=User)
+def user_pre_delete_likes(sender, instance, **kwargs):
+
+    # through rows go away by cascade, which bypasses add_like / remove_like
+    recipes = Recipe.objects.filter(likes=instance).update(likes_count=F('likes_count') - 1)
+    schedules = Schedule.objects.filter(likes=instance).update(likes_count=F('likes_count') - 1)
+    bump_counters_version(Recipe)
+    bump_counters_version(Schedule)
+    instance._liked_models = [model for model, count in [(Recipe, recipes), (Schedule, schedules)] if count]
+
+
+@receiver(post_delete, sender=User)
+def user_deleted_boards(sender, instance, **kwargs):
+
+    # the likes are gone only now, the boards of the models the user liked are ranked again
+    for model in getattr(instance, '_liked_models', []):
+        refresh_model_boards(model)
+
+
+@receiver(post_migrate)
+def install_search_tables(sender, using, **kwargs):
+
+    # SQLite drops triggers whenever a migration rebuilds the table, so they are ensured after every migrate
+    if sender.name != 'food_app' or connections[using].vendor != 'sqlite':
+        return
+
+    with connections[using].cursor() as cursor:
+        for model in [Recipe, Schedule, Ingredient]:
+            SqliteSearchBackend.install(model, cursor)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=IngredientRecipe)
+@receiver(post_delete, sender=IngredientRecipe)
+@receiver(post_save, sender=CommentRecipe)
+@receiver(post_delete, sender=CommentRecipe)
+@receiver(post_save, sender=Schedule)
+@receiver(post_delete, sender=Schedule)
+@receiver(post_save, sender=RecipeSchedule)
+@receiver(post_delete, sender=RecipeSchedule)
+def model_changed(sender, **kwargs):
+
+    bump_model_version(sender)
+
+
+@receiver(m2m_changed, sender=Recipe.likes.through)
+@receiver(m2m_changed, sender=Schedule.likes.through)
+def likes_changed(sender, instance, action, reverse, pk_set, **kwargs):
+
+    # likes.add() / remove() / clear() bypass add_like / remove_like, so the counters are recomputed here
+    liked_model = Recipe if sender is Recipe.likes.through else Schedule
+
+    if action == 'pre_clear' and reverse:
+        instance._cleared_likes = list(liked_model.objects.filter(likes=instance).values_list('pk', flat=True))
+
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        pks = [instance.pk]
+
+    elif action == 'post_clear':
+        pks = instance._cleared_likes
+
+    else:
+        pks = pk_set
+
+    liked_model.recount_likes(liked_model.objects.filter(pk__in=pks))
+
+    for obj in liked_model.objects.filter(pk__in=pks):
+        like_changed.send(sender=liked_model, instance=obj)
+
+
+@receiver(like_changed)
+def update_leaderboards(sender, instance, **kwargs):
+
+    update_boards(instance)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Schedule)
+def liked_model_created(sender, instance, created, **kwargs):
+
+    if created:
+        update_boards(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Schedule)
+def liked_model_deleted(sender, instance, **kwargs):
+
+    refresh_model_boards(sender)
+
+
+@receiver(post_save, sender=RecipeSchedule)
+@receiver(post_delete, sender=RecipeSchedule)
+def schedule_slot_changed(sender, instance, **kwargs):
+
+    bump_object_version(Schedule, instance.schedule_id)
+    ScheduleNutrition.invalidate(schedule=instance.schedule_id)
+
+
+@receiver(post_save, sender=IngredientRecipe)
+@receiver(post_delete, sender=IngredientRecipe)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+
+    bump_object_version(Recipe, instance.recipe_id)
+    ScheduleNutrition.invalidate(recipe=instance.recipe_id)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_changed_nutrition(sender, instance, created, **kwargs):
+
+    # calories of a new recipe are not planned anywhere yet
+    if not created:
+        ScheduleNutrition.invalidate(recipe=instance)
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_pre_delete_schedules(sender, instance, **kwargs):
+
+    # slots are emptied by SET_NULL, an UPDATE without signals
+    for schedule_pk in RecipeSchedule.objects.filter(recipe=instance).values_list('schedule_id', flat=True).distinct():
+        bump_object_version(Schedule, schedule_pk)
+
+    ScheduleNutrition.invalidate(recipe=instance)
+
+
+@receiver(post_save, sender=CommentRecipe)
+def comment_created(sender, instance, created, **kwargs):
+
+    if created:
+        Recipe.objects.filter(pk=instance.recipe_id).update(comments_count=F('comments_count') + 1)
+        bump_counters_version(Recipe, [instance.recipe_id])
+
+
+@receiver(post_delete, sender=CommentRecipe)
+def comment_deleted(sender, instance, **kwargs):
+
+    Recipe.objects.filter(pk=instance.recipe_id, comments_count__gt=0) \
+        .update(comments_count=F('comments_count') - 1)
+    bump_counters_version(Recipe, [instance.recipe_id])
@@ -0,0 +1,21 @@
+// "Pokaż więcej" appends the next comments in place, the link itself opens them on a new page without JavaScript
+document.addEventListener('click', function (event) {
+    var link = event.target.closest('[data-comments-url]');
+
+    if (!link) {
+        return;
+    }
+
+    event.preventDefault();
+
+    fetch(link.dataset.commentsUrl)
+        .then(function (response) {
+            return response.text();
+        })
+        .then(function (html) {
+            var row = link.closest('tr');
+
+            row.insertAdjacentHTML('afterend', html);
+            row.remove();
+        });
+});
@@ -0,0 +1,41 @@
+// The like button posts to the JSON endpoint and updates the count in place, without JavaScript the form reloads the page
+document.addEventListener('submit', function (event) {
+    var form = event.target.closest('[data-like-url]');
+
+    if (!form) {
+        return;
+    }
+
+    event.preventDefault();
+
+    var button = form.querySelector('button');
+    var liked = button.value === 'like_up';
+    var data = new FormData();
+
+    data.append('csrfmiddlewaretoken', form.elements.csrfmiddlewaretoken.value);
+    data.append('pk', form.dataset.likePk);
+    data.append('liked', liked ? '1' : '0');
+
+    fetch(form.dataset.likeUrl, {method: 'POST', body: data})
+        .then(function (response) {
+            // an expired session or a deleted object answers with an error, the reloaded page shows the real state
+            if (!response.ok) {
+                throw new Error('Like failed with status ' + response.status);
+            }
+
+            return response.json();
+        })
+        .then(function (result) {
+            if (!result.results || !result.results.length) {
+                throw new Error('Like response without results');
+            }
+
+            document.querySelector('[data-likes-count]').textContent = result.results[0].likes_count;
+            button.value = result.liked ? 'like_down' : 'like_up';
+            button.title = result.liked ? 'Usuń głos' : 'Oddaj głos';
+            button.querySelector('i').className = result.liked ? 'fa fa-thumbs-down' : 'fa fa-thumbs-up';
+        })
+        .catch(function () {
+            window.location.reload();
+        });
+});
@@ -0,0 +1,114 @@
+import hashlib
+import re
+
+from pathlib import PurePosixPath
+
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage
+
+
+HASH_NAME_RE = re.compile(r'(^|/)[0-9a-f]{64}(_\w+)?\.\w+$')
+
+
+def content_hash(content):
+
+    digest = hashlib.sha256()
+
+    if hasattr(content, 'seek'):
+        content.seek(0)
+
+    for chunk in content.chunks():
+        digest.update(chunk if isinstance(chunk, bytes) else chunk.encode())
+
+    if hasattr(content, 'seek'):
+        content.seek(0)
+
+    return digest.hexdigest()
+
+
+def is_immutable_name(name):
+
+    """
+    Return True for names derived from the file content, which never change what they point to
+    """
+    return bool(HASH_NAME_RE.search(name or ''))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    """
+    Names every file by the SHA-256 of its content, so identical uploads are written once and shared
+
+    A shared file is reference counted by the rows of the registered fields: it is only removed from disk
+    when no row points to it anymore, which keeps django_cleanup from deleting files still in use.
+    """
+    def __init__(self, *args, **kwargs):
+
+        super().__init__(*args, **kwargs)
+        self.fields = []
+
+    def register(self, model, field_name):
+
+        if (model, field_name) not in self.fields:
+            self.fields.append((model, field_name))
+
+    def get_content_name(self, name, content):
+
+        path = PurePosixPath(name)
+
+        return str(path.with_name(f'{content_hash(content)}{path.suffix.lower()}'))
+
+    def save(self, name, content, max_length=None):
+
+        if name is None:
+            name = content.name
+
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        name = self.get_content_name(name, content)
+
+        if self.exists(name):
+            return name
+
+        return super().save(name, content, max_length=max_length)
+
+    def save_derived(self, name, content):
+
+        """
+        Save a file derived from a content named one, e.g. a resized variant, under the given name
+
+        The source content determines the derived content, so an existing file is kept as it is.
+        """
+        if self.exists(name):
+            return name
+
+        return super().save(name, content)
+
+    def delete_derived(self, name):
+
+        """
+        Delete a file saved by save_derived, no row refers to it by name so it is not reference counted
+        """
+        super().delete(name)
+
+    def is_referenced(self, name):
+
+        """
+        Return True while a row of any registered field points to name, checked in one query
+        """
+        querysets = [
+            model._default_manager.filter(**{field_name: name}).values('pk') for model, field_name in self.fields
+        ]
+
+        return bool(querysets) and querysets[0].union(*querysets[1:]).exists()
+
+    def delete(self, name):
+
+        if is_immutable_name(name) and self.is_referenced(name):
+            return
+
+        super().delete(name)
+
+
+image_storage = ContentAddressedStorage()
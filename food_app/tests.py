@@ -1,3 +1,1620 @@
-from django.test import TestCase
+import json
+import sqlite3
+import tempfile
+import time
+
+from datetime import timedelta
+from io import BytesIO, StringIO
+from smtplib import SMTPException
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.mail.backends.base import BaseEmailBackend
+from django.contrib.sessions.models import Session
+from django.db import DatabaseError, IntegrityError, connection, connections, router
+from django.db.models import F
+from django.http import Http404, HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from PIL import Image
+
+from .models import User, UserUniqueToken, Ingredient, Recipe, IngredientRecipe, CommentRecipe, OutboxEmail, \
+    Schedule, RecipeSchedule, ScheduleNutrition, LeaderboardEntry
+from .forms import RecipeScheduleFormset
+from . import outbox
+from .outbox import claim_batch, send_batch
+from .search import BasicSearchBackend, PostgresSearchBackend, SqliteSearchBackend, get_search_backend
+from .pagination import InvalidCursor, encode_cursor, paginate_by_cursor
+from .profiling import UNRESOLVED, QueryBudgetExceeded, get_url_name, profile_stats
+from .db.pool import ConnectionPool, PoolTimeout
+from .db.backends.sqlite3.base import DatabaseWrapper as PooledSqliteWrapper
+from .routers import PIN_COOKIE, ReplicaPinningMiddleware
+from .views import RecipeListView
+from .quantities import parse_quantity
+from .shopping import get_shopping_list
+from .cache import cached_queryset, get_counters_version, get_model_version, version_key
+from .leaderboard import get_board, refresh_board
+from .images import ImageQueue, get_variant_name, image_queue, process_image
+from .serving import IMMUTABLE_CACHE_CONTROL, serve_file
 
 # Create your tests here.
+
+
+class RecipeDetailViewTest(TestCase):
+
+    def setUp(self):
+
+        self.user = User.objects.create_user(
+            username='user', email='user@example.com', password='Haslo123!', is_active=True
+        )
+        self.recipe = Recipe.objects.create(
+            name='Recipe',
+            preparing='Preparing',
+            preparation_time=timedelta(minutes=10),
+            create_by=self.user,
+        )
+        self.url = reverse('recipe-detail', args=[self.recipe.pk])
+
+    def add_rows(self, count):
+
+        for _ in range(count):
+            number = Ingredient.objects.count()
+            author = User.objects.create_user(
+                username=f'author{number}', email=f'author{number}@example.com', password='Haslo123!'
+            )
+            ingredient = Ingredient.objects.create(name=f'Ingredient {number}')
+            IngredientRecipe.objects.create(recipe=self.recipe, ingredient=ingredient, quantity='100 g')
+            CommentRecipe.objects.create(recipe=self.recipe, user=author, comment='Comment')
+
+    def count_queries(self):
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+
+        return len(context)
+
+    def test_query_count_is_constant_for_visitor(self):
+
+        self.add_rows(1)
+        queries = self.count_queries()
+        self.add_rows(6)
+
+        self.assertEqual(self.count_queries(), queries)
+
+    def test_query_count_is_constant_for_user(self):
+
+        self.client.force_login(self.user)
+        self.add_rows(1)
+        queries = self.count_queries()
+        self.add_rows(6)
+        self.recipe.add_like(self.user)
+
+        self.assertEqual(self.count_queries(), queries)
+
+
+class LikesCountTest(TestCase):
+
+    def setUp(self):
+
+        self.users = [
+            User.objects.create_user(username=f'user{number}', email=f'user{number}@example.com', password='Haslo123!')
+            for number in range(2)
+        ]
+        self.recipe = Recipe.objects.create(name='Recipe', preparing='Preparing', preparation_time=timedelta(minutes=10))
+        self.schedule = Schedule.objects.create(name='Schedule')
+
+    def likes_count(self, obj):
+
+        return obj.__class__.objects.values_list('likes_count', flat=True).get(pk=obj.pk)
+
+    def test_like_and_unlike_are_idempotent(self):
+
+        self.assertTrue(self.recipe.add_like(self.users[0]))
+        self.assertFalse(self.recipe.add_like(self.users[0]))
+        self.recipe.add_like(self.users[1])
+        self.assertEqual(self.likes_count(self.recipe), 2)
+
+        self.assertTrue(self.recipe.remove_like(self.users[0]))
+        self.assertFalse(self.recipe.remove_like(self.users[0]))
+        self.assertEqual(self.likes_count(self.recipe), 1)
+
+    def test_counters_move_by_the_written_like_rows(self):
+
+        other = Recipe.objects.create(name='Other', preparing='Preparing', preparation_time=timedelta(minutes=10))
+        self.recipe.add_like(self.users[0])
+
+        with mock.patch('food_app.signals.update_boards'), CaptureQueriesContext(connection) as context:
+            likes_counts = Recipe.set_likes(self.users[0], [self.recipe.pk, other.pk], liked=True)
+
+        self.assertEqual(likes_counts, {self.recipe.pk: 1, other.pk: 1})
+        # neither a pre-select of the like rows nor a recount of them, only the returned counts are read
+        self.assertEqual(len([query for query in context.captured_queries if query['sql'].startswith('SELECT')]), 1)
+        self.assertEqual(Recipe.set_likes(self.users[0], [self.recipe.pk, other.pk], liked=False), {
+            self.recipe.pk: 0, other.pk: 0
+        })
+
+    def test_count_follows_user_deletion(self):
+
+        for user in self.users:
+            self.recipe.add_like(user)
+            self.schedule.add_like(user)
+
+        self.users[0].delete()
+
+        self.assertEqual(self.likes_count(self.recipe), 1)
+        self.assertEqual(self.likes_count(self.schedule), 1)
+
+    def test_recount_command_repairs_counters(self):
+
+        self.schedule.add_like(self.users[0])
+        Recipe.likes.through.objects.create(recipe=self.recipe, user=self.users[1])
+        Schedule.objects.update(likes_count=5)
+
+        call_command('recount_likes', stdout=StringIO())
+
+        self.assertEqual(self.likes_count(self.recipe), 1)
+        self.assertEqual(self.likes_count(self.schedule), 1)
+
+
+class CursorPaginationTest(TestCase):
+
+    def setUp(self):
+
+        user = User.objects.create_user(username='user', email='user@example.com', password='Haslo123!')
+        self.recipes = [
+            Recipe.objects.create(name=f'Recipe {number}', preparing='Preparing', preparation_time=timedelta(minutes=10))
+            for number in range(5)
+        ]
+
+        for recipe in self.recipes[:2]:
+            recipe.add_like(user)
+
+        self.url = reverse('recipe-list')
+
+    def test_pages_follow_each_other(self):
+
+        ordering = ['-likes_count', 'name', 'pk']
+        first = paginate_by_cursor(Recipe.objects.all(), ordering, page_size=3)
+        second = paginate_by_cursor(Recipe.objects.all(), ordering, page_size=3, cursor=first.next_cursor)
+
+        self.assertEqual([recipe.name for recipe in first], ['Recipe 0', 'Recipe 1', 'Recipe 2'])
+        self.assertEqual([recipe.name for recipe in second], ['Recipe 3', 'Recipe 4'])
+        self.assertFalse(second.has_next())
+
+    def test_crafted_cursors_are_rejected(self):
+
+        cursors = [
+            'not base64!',
+            encode_cursor({'likes_count': 1}),
+            encode_cursor([1, 'Recipe']),
+            encode_cursor([{'a': 1}, 'Recipe', 1]),
+            encode_cursor([None, 'Recipe', 1]),
+        ]
+
+        for cursor in cursors:
+            with self.assertRaises(InvalidCursor):
+                paginate_by_cursor(Recipe.objects.all(), ['-likes_count', 'name', 'pk'], page_size=3, cursor=cursor)
+
+            self.assertEqual(self.client.get(self.url, {'cursor': cursor}).status_code, 404)
+
+        with self.assertRaises(InvalidCursor):
+            paginate_by_cursor(
+                CommentRecipe.objects.all(), CommentRecipe.SEEK_ORDERING, page_size=3, cursor=encode_cursor(['x', 1])
+            )
+
+
+class SearchBackendTest(TestCase):
+
+    def setUp(self):
+
+        self.recipe = Recipe.objects.create(
+            name='Zupa pomidorowa', preparing='Gotować', preparation_time=timedelta(minutes=10)
+        )
+        Recipe.objects.create(name='Naleśniki', preparing='Smażyć', preparation_time=timedelta(minutes=10))
+
+    def search(self, backend, query):
+
+        return list(backend.search(Recipe.objects.all(), query).values_list('name', flat=True))
+
+    def test_sqlite_matches_word_prefixes(self):
+
+        backend = SqliteSearchBackend()
+
+        self.assertEqual(self.search(backend, 'pomid'), ['Zupa pomidorowa'])
+        self.assertEqual(self.search(backend, 'gotowac'), ['Zupa pomidorowa'])
+        self.assertEqual(self.search(backend, 'dorowa'), [])
+        self.assertEqual(self.search(BasicSearchBackend(), 'dorowa'), ['Zupa pomidorowa'])
+
+    def test_index_follows_edits_but_not_counters(self):
+
+        backend = SqliteSearchBackend()
+        self.recipe.name = 'Krem z dyni'
+        self.recipe.save()
+
+        self.assertEqual(self.search(backend, 'dyni'), ['Krem z dyni'])
+        self.assertEqual(self.search(backend, 'pomid'), [])
+
+        changes = connection.connection.total_changes
+        Recipe.objects.filter(pk=self.recipe.pk).update(likes_count=F('likes_count') + 1)
+
+        self.assertEqual(connection.connection.total_changes - changes, 1)
+
+    def test_backend_follows_database_vendor(self):
+
+        backends = {'sqlite': SqliteSearchBackend, 'postgresql': PostgresSearchBackend, 'mysql': BasicSearchBackend}
+
+        for vendor, backend in backends.items():
+            with mock.patch('food_app.search.connection', vendor=vendor):
+                self.assertIsInstance(get_search_backend(), backend)
+
+        with override_settings(FOOD_APP_SEARCH_BACKEND='food_app.search.BasicSearchBackend'):
+            self.assertIsInstance(get_search_backend(), BasicSearchBackend)
+
+
+class RecipeCommentsTest(TestCase):
+
+    def setUp(self):
+
+        self.user = User.objects.create_user(username='user', email='user@example.com', password='Haslo123!')
+        self.recipe = Recipe.objects.create(name='Recipe', preparing='Preparing', preparation_time=timedelta(minutes=10))
+
+        for number in range(7):
+            CommentRecipe.objects.create(recipe=self.recipe, user=self.user, comment=f'Comment {number}')
+
+    def test_comments_count_follows_comments(self):
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.comments_count, 7)
+
+        CommentRecipe.objects.filter(recipe=self.recipe).first().delete()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.comments_count, 6)
+
+    def test_detail_page_does_not_count_comments(self):
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('recipe-detail', args=[self.recipe.pk]))
+
+        self.assertFalse(any('COUNT(' in query['sql'] for query in context.captured_queries))
+        self.assertContains(response, 'Komentarze (7)')
+        self.assertContains(response, 'Pokaż więcej')
+
+    def test_load_more_seeks_to_the_next_comments(self):
+
+        url = reverse('recipe-comments', args=[self.recipe.pk])
+        first = self.client.get(url, {'format': 'json'}).json()
+        second = self.client.get(url, {'format': 'json', 'cursor': first['next']}).json()
+        comments = [comment['comment'] for comment in first['results'] + second['results']]
+
+        self.assertEqual(comments, [f'Comment {number}' for number in reversed(range(7))])
+        self.assertIsNone(second['next'])
+        self.assertContains(self.client.get(url, {'cursor': first['next']}), 'Comment 0')
+
+    def test_crafted_cursor_is_not_found(self):
+
+        cursors = [
+            encode_cursor(['not a date', 1]),
+            encode_cursor(['2022-02-30T10:00:00', 1]),
+            encode_cursor(['2022-03-01T10:00:00', 'one']),
+            encode_cursor(['2022-03-01T10:00:00', 10 ** 30]),
+            encode_cursor([None, 1]),
+            'not a cursor',
+        ]
+
+        for cursor in cursors:
+            comments = self.client.get(reverse('recipe-comments', args=[self.recipe.pk]), {'cursor': cursor})
+            detail = self.client.get(reverse('recipe-detail', args=[self.recipe.pk]), {'comments': cursor})
+
+            self.assertEqual((comments.status_code, detail.status_code), (404, 404))
+
+
+class LikeViewTest(TestCase):
+
+    def setUp(self):
+
+        self.user = User.objects.create_user(
+            username='user', email='user@example.com', password='Haslo123!', is_active=True
+        )
+        self.recipes = [
+            Recipe.objects.create(name=f'Recipe {number}', preparing='Preparing', preparation_time=timedelta(minutes=10))
+            for number in range(3)
+        ]
+        self.url = reverse('recipe-like')
+
+    def test_like_is_idempotent(self):
+
+        self.client.force_login(self.user)
+
+        for _ in range(2):
+            response = self.client.post(self.url, {'pk': self.recipes[0].pk, 'liked': '1'})
+            self.assertEqual(response.json()['results'], [{'id': self.recipes[0].pk, 'likes_count': 1}])
+
+        self.assertEqual(Recipe.likes.through.objects.count(), 1)
+
+        response = self.client.post(self.url, {'pk': self.recipes[0].pk, 'liked': '0'})
+        self.assertEqual(response.json()['results'], [{'id': self.recipes[0].pk, 'likes_count': 0}])
+
+    def test_list_unlikes_checked_recipes_at_once(self):
+
+        for recipe in self.recipes:
+            recipe.add_like(self.user)
+
+        self.client.force_login(self.user)
+        self.client.post(reverse('user-like'), {'like': [self.recipes[0].pk, self.recipes[1].pk, 'x']})
+
+        self.assertEqual(list(self.user.likes.all()), [self.recipes[2]])
+        self.assertEqual(
+            list(Recipe.objects.order_by('pk').values_list('likes_count', flat=True)), [0, 0, 1]
+        )
+
+    def test_detail_buttons_write_like_the_list(self):
+
+        self.client.force_login(self.user)
+        url = reverse('recipe-detail', args=[self.recipes[0].pk])
+
+        for _ in range(2):
+            self.client.post(url, {'button_recipe': 'like_up'})
+
+        self.assertEqual(Recipe.objects.get(pk=self.recipes[0].pk).likes_count, 1)
+
+        self.client.post(url, {'button_recipe': 'like_down'})
+
+        self.assertEqual(Recipe.objects.get(pk=self.recipes[0].pk).likes_count, 0)
+        self.assertFalse(Recipe.likes.through.objects.exists())
+
+    def test_visitor_and_invalid_requests_are_rejected(self):
+
+        self.assertEqual(self.client.post(self.url, {'pk': self.recipes[0].pk, 'liked': '1'}).status_code, 403)
+
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.post(self.url, {'pk': self.recipes[0].pk, 'liked': 'yes'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+
+
+class UserStatsTest(TestCase):
+
+    def setUp(self):
+
+        self.user = User.objects.create_user(
+            username='user', email='user@example.com', password='Haslo123!', is_active=True
+        )
+        recipe = Recipe.objects.create(
+            name='Recipe', preparing='Preparing', preparation_time=timedelta(minutes=10), create_by=self.user
+        )
+        schedule = Schedule.objects.create(name='Schedule', create_by=self.user)
+        Ingredient.objects.create(name='Ingredient', create_by=self.user)
+
+        for number in range(3):
+            CommentRecipe.objects.create(recipe=recipe, user=self.user, comment=f'Comment {number}')
+
+        recipe.add_like(self.user)
+        schedule.add_like(self.user)
+
+    def get_stats_queries(self, url):
+
+        # the listed pages read neither comments nor schedule likes, only the counts do
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+
+        return response, [
+            query['sql'] for query in context.captured_queries
+            if 'food_app_commentrecipe' in query['sql'] or 'food_app_schedule_likes' in query['sql']
+        ]
+
+    def test_panel_counts_in_one_query(self):
+
+        self.client.force_login(self.user)
+
+        for url in [reverse('user-panel'), reverse('user-like')]:
+            response, queries = self.get_stats_queries(url)
+
+            self.assertEqual(len(queries), 1)
+            self.assertContains(response, 'Przepisy: 1')
+            self.assertContains(response, 'Komentarze: 3')
+            self.assertContains(response, 'Plany <i class="fa fa-thumbs-up"></i>: 1')
+
+    def test_menu_counts_in_one_query(self):
+
+        response, queries = self.get_stats_queries(reverse('user-recipes', args=[self.user.pk]))
+
+        self.assertEqual(len(queries), 1)
+        self.assertContains(response, 'Komentarze: <b>3</b>')
+
+
+class FailingEmailBackend(BaseEmailBackend):
+
+    def send_messages(self, email_messages):
+
+        raise SMTPException('Connection unexpectedly closed')
+
+
+class OutboxTest(TestCase):
+
+    def register(self, number):
+
+        return self.client.post(reverse('user-register'), {
+            'username': f'user{number}',
+            'email': f'user{number}@example.com',
+            'first_name': 'Jan',
+            'last_name': 'Kowalski',
+            'password': 'Haslo123!',
+            'password_repeat': 'Haslo123!',
+        })
+
+    def test_register_enqueues_email(self):
+
+        response = self.register(1)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboxEmail.objects.get().to, ['user1@example.com'])
+
+    def test_email_user_enqueues_sender(self):
+
+        user = User.objects.create_user(username='user', email='user@example.com', password='Haslo123!')
+        email = user.email_user('Temat', 'Treść', from_email='noreply@example.com')
+
+        self.assertEqual((email.from_email, email.to), ('noreply@example.com', ['user@example.com']))
+
+        with self.assertRaises(TypeError):
+            user.email_user('Temat', 'Treść', 'noreply@example.com', fail_silently=True)
+
+    def test_batch_is_sent(self):
+
+        for number in range(3):
+            self.register(number)
+
+        self.assertEqual(send_batch(), (3, 0))
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertFalse(OutboxEmail.objects.exclude(status=OutboxEmail.STATUS_SENT).exists())
+        self.assertEqual(send_batch(), (0, 0))
+
+    def test_rows_selected_by_two_workers_are_claimed_once(self):
+
+        for number in range(3):
+            self.register(number)
+
+        lease = outbox.get_lease
+        other = []
+
+        def racing_lease():
+
+            # the other worker leases the rows between the selection and the update of this one
+            if other == []:
+                other.append(None)
+                other[0] = claim_batch()
+
+            return lease()
+
+        with mock.patch('food_app.outbox.get_lease', side_effect=racing_lease):
+            claimed = claim_batch()
+
+        self.assertEqual((len(other[0]), claimed), (3, []))
+
+    @override_settings(EMAIL_BACKEND='food_app.tests.FailingEmailBackend', FOOD_APP_EMAIL_MAX_ATTEMPTS=2)
+    def test_failed_email_is_retried_with_backoff(self):
+
+        self.register(1)
+
+        self.assertEqual(send_batch(), (0, 1))
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.status, OutboxEmail.STATUS_PENDING)
+        self.assertGreater(email.next_attempt, timezone.now())
+        self.assertEqual(send_batch(), (0, 0))
+
+        OutboxEmail.objects.update(next_attempt=timezone.now())
+        self.assertEqual(send_batch(), (0, 1))
+        self.assertEqual(OutboxEmail.objects.get().status, OutboxEmail.STATUS_FAILED)
+
+
+class UserUniqueTokenTest(TestCase):
+
+    def setUp(self):
+
+        self.user = User.objects.create_user(username='user', email='user@example.com', password='Haslo123!')
+        self.token = UserUniqueToken.issue(self.user, UserUniqueToken.PURPOSE_ACTIVATION)
+        self.url = f"{reverse('user-active')}?token={self.token.token}"
+
+    def test_token_is_consumed_once(self):
+
+        self.client.get(self.url)
+        self.user.refresh_from_db()
+
+        self.assertTrue(self.user.is_active)
+        self.assertFalse(UserUniqueToken.objects.exists())
+        self.assertIsNone(UserUniqueToken.consume(str(self.token.token), UserUniqueToken.PURPOSE_ACTIVATION))
+
+    def test_consume_deletes_with_one_query(self):
+
+        with self.assertNumQueries(2):
+            user = UserUniqueToken.consume(str(self.token.token), UserUniqueToken.PURPOSE_ACTIVATION)
+
+        self.assertEqual(user, self.user)
+
+    def test_failed_activation_keeps_token(self):
+
+        with mock.patch.object(User, 'save', side_effect=DatabaseError), self.assertRaises(DatabaseError):
+            self.client.get(self.url)
+
+        self.assertTrue(UserUniqueToken.objects.filter(token=self.token.token).exists())
+
+    def test_token_is_checked_for_purpose(self):
+
+        self.assertIsNone(UserUniqueToken.consume(str(self.token.token), UserUniqueToken.PURPOSE_PASSWORD))
+        self.assertTrue(UserUniqueToken.objects.exists())
+
+    def test_expired_token_is_rejected_and_purged(self):
+
+        UserUniqueToken.objects.update(date_issued=timezone.now() - timedelta(days=30))
+        self.client.get(self.url)
+        self.user.refresh_from_db()
+
+        self.assertFalse(self.user.is_active)
+
+        call_command('purge_tokens', batch_size=1, stdout=StringIO())
+
+        self.assertFalse(UserUniqueToken.objects.exists())
+
+
+@override_settings(FOOD_APP_PROFILING=True)
+class ProfilingMiddlewareTest(TestCase):
+
+    def setUp(self):
+
+        profile_stats.clear()
+        self.url = reverse('recipe-list')
+
+    def test_server_timing_and_stats(self):
+
+        response = self.client.get(self.url)
+
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertEqual(profile_stats.summary()['recipe-list']['requests'], 1)
+
+    def test_unresolved_paths_share_one_key(self):
+
+        for number in range(3):
+            self.client.get(f'/missing/{number}/')
+
+        self.assertEqual(set(profile_stats.summary()), {UNRESOLVED})
+        self.assertEqual(profile_stats.summary()[UNRESOLVED]['requests'], 3)
+
+    def test_unnamed_route_is_keyed_by_pattern(self):
+
+        request = RequestFactory().get('/food_app/recipe/1/')
+        request.resolver_match = mock.Mock(url_name=None, view_name='food_app.views.view', route='recipe/<int:pk>/')
+
+        self.assertEqual(get_url_name(request), 'recipe/<int:pk>/')
+
+    @override_settings(FOOD_APP_QUERY_BUDGET={'recipe-list': 0}, FOOD_APP_QUERY_BUDGET_STRICT=True)
+    def test_query_budget_fails_strict(self):
+
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(self.url)
+
+
+class ConnectionPoolTest(SimpleTestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.name = f'{self.directory.name}/pool.sqlite3'
+
+    def tearDown(self):
+
+        self.directory.cleanup()
+
+    def connect(self):
+
+        return sqlite3.connect(self.name, check_same_thread=False)
+
+    def create_pool(self, **kwargs):
+
+        options = {'size': 2, 'timeout': 1, 'idle_timeout': 60, 'health_check_interval': 60, **kwargs}
+
+        return ConnectionPool('test', **options)
+
+    def test_connection_is_reused(self):
+
+        pool = self.create_pool()
+        first = pool.checkout(self.connect)
+        pool.checkin(first)
+
+        self.assertIs(pool.checkout(self.connect), first)
+        self.assertEqual((pool.stats()['created'], pool.stats()['checkouts']), (1, 2))
+
+    def test_full_pool_times_out(self):
+
+        pool = self.create_pool(size=1, timeout=0.05)
+        pool.checkout(self.connect)
+
+        with self.assertRaises(PoolTimeout):
+            pool.checkout(self.connect)
+
+        self.assertEqual(pool.stats()['timeouts'], 1)
+        self.assertGreaterEqual(pool.stats()['wait_ms_max'], 0)
+
+    def test_broken_and_idle_connections_are_replaced(self):
+
+        pool = self.create_pool(idle_timeout=0.01)
+        broken = pool.checkout(self.connect)
+        broken.close()
+        pool.checkin(broken, checked=False)
+
+        self.assertIsNot(pool.checkout(self.connect), broken)
+        self.assertEqual(pool.stats()['health_check_failures'], 1)
+
+        idle = pool.checkout(self.connect)
+        pool.checkin(idle)
+        time.sleep(0.02)
+
+        self.assertIsNot(pool.checkout(self.connect), idle)
+        self.assertEqual(pool.stats()['idle_closed'], 1)
+
+    def test_backend_returns_connection_on_close(self):
+
+        settings_dict = {
+            **connection.settings_dict,
+            'ENGINE': 'food_app.db.backends.sqlite3',
+            'NAME': self.name,
+            'CONN_MAX_AGE': 0,
+            'POOL': {'SIZE': 1},
+        }
+        wrapper = PooledSqliteWrapper(settings_dict, alias='pooled')
+
+        for _ in range(3):
+            with wrapper.cursor() as cursor:
+                cursor.execute('SELECT 1')
+
+            wrapper.close()
+
+        self.assertEqual(wrapper.pool.stats()['created'], 1)
+        self.assertEqual(wrapper.pool.stats()['idle'], 1)
+        wrapper.pool.close_all()
+
+
+@override_settings(FOOD_APP_REPLICAS=['replica'])
+class ReplicaRouterTest(SimpleTestCase):
+
+    def request(self, method='get', write=False, cookies=None):
+
+        """
+        Run a request through the middleware, return the read database of Recipe and Session and the response
+        """
+        request = getattr(RequestFactory(), method)('/')
+        request.COOKIES.update(cookies or {})
+        databases = {}
+
+        def view(request):
+
+            middleware.process_view(request, RecipeListView.as_view(), (), {})
+
+            if write:
+                router.db_for_write(Recipe)
+
+            databases['recipe'] = Recipe.objects.all().db
+            databases['session'] = Session.objects.all().db
+
+            return HttpResponse()
+
+        middleware = ReplicaPinningMiddleware(view)
+        response = middleware(request)
+
+        return databases, response
+
+    def test_get_reads_food_app_models_from_replica(self):
+
+        databases, response = self.request()
+
+        self.assertEqual(databases, {'recipe': 'replica', 'session': 'default'})
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_write_pins_user_to_primary(self):
+
+        databases, response = self.request(write=True)
+
+        self.assertEqual(databases['recipe'], 'default')
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertIn(PIN_COOKIE, self.request(method='post')[1].cookies)
+        self.assertEqual(self.request(cookies={PIN_COOKIE: '1'})[0]['recipe'], 'default')
+
+    def test_reads_outside_requests_use_primary(self):
+
+        self.assertEqual(Recipe.objects.all().db, 'default')
+
+
+@skipUnless('replica' in settings.DATABASES, "needs the 'replica' alias mirroring 'default', see settings.py")
+@override_settings(FOOD_APP_REPLICAS=['replica'])
+class ReplicaDatabaseTest(TransactionTestCase):
+
+    """
+    Reads through the replica connection, which needs committed rows: inside the transaction of a TestCase the
+    router keeps every read on the primary
+    """
+    # the test runner sets up the databases of skipped classes too
+    databases = {'default', 'replica'}.intersection(settings.DATABASES)
+
+    def setUp(self):
+
+        self.user = User.objects.create_user(
+            username='user', email='user@example.com', password='Haslo123!', is_active=True
+        )
+        self.recipe = Recipe.objects.create(
+            name='Recipe', preparing='Preparing', preparation_time=timedelta(minutes=10), create_by=self.user
+        )
+        IngredientRecipe.objects.create(
+            recipe=self.recipe, ingredient=Ingredient.objects.create(name='Flour'), quantity='100 g'
+        )
+        self.url = reverse('recipe-detail', args=[self.recipe.pk])
+
+    def get(self, url):
+
+        with CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.get(url)
+
+        return response, [query['sql'] for query in replica.captured_queries]
+
+    def test_get_reads_from_replica(self):
+
+        response, replica_queries = self.get(self.url)
+
+        self.assertContains(response, 'Recipe')
+        self.assertTrue(any('food_app_recipe' in sql for sql in replica_queries))
+
+    def test_cache_is_filled_from_primary(self):
+
+        response, replica_queries = self.get(self.url)
+
+        self.assertEqual([item.ingredient.name for item in response.context['ingredient_list']], ['Flour'])
+        self.assertFalse(any('food_app_ingredientrecipe' in sql for sql in replica_queries))
+
+    def test_fragments_from_replica_expire_with_the_pin(self):
+
+        response, _ = self.get(reverse('recipe-list'))
+
+        self.assertEqual(response.context['cache_timeout'], 10)
+
+    def test_writer_reads_primary(self):
+
+        self.client.force_login(self.user)
+        self.client.post(reverse('recipe-like'), {'pk': self.recipe.pk, 'liked': 1})
+        response, replica_queries = self.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(replica_queries, [])
+
+    def test_api_reads_primary(self):
+
+        response, replica_queries = self.get(reverse('api-recipe-list'))
+
+        self.assertEqual(response.json()['results'][0]['name'], 'Recipe')
+        self.assertEqual(replica_queries, [])
+
+    def test_missing_nutrition_does_not_pin_the_visitor(self):
+
+        schedule = Schedule.objects.create(name='Plan')
+        schedule.save_slots([RecipeSchedule(day_number=1, meal_number=1, recipe=self.recipe)])
+        ScheduleNutrition.objects.all().delete()
+        response, _ = self.get(reverse('schedule-detail', args=[schedule.pk]))
+
+        self.assertEqual(response.context['nutrition'].weight, 100)
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+
+class ShoppingListTest(TestCase):
+
+    def setUp(self):
+
+        # versions are kept per primary key, which the rolled back tests reuse
+        cache.clear()
+        self.flour = Ingredient.objects.create(name='Mąka')
+        self.milk = Ingredient.objects.create(name='Mleko')
+        self.pancakes = self.create_recipe('Naleśniki', [(self.flour, '250 g'), (self.milk, '1/2 l')])
+        self.bread = self.create_recipe('Chleb', [(self.flour, '1 kg'), (self.milk, 'do smaku')])
+        self.schedule = Schedule.objects.create(name='Plan')
+        self.schedule.save_slots([
+            RecipeSchedule(day_number=1, meal_number=1, recipe=self.pancakes),
+            RecipeSchedule(day_number=2, meal_number=1, recipe=self.pancakes),
+            RecipeSchedule(day_number=3, meal_number=3, recipe=self.bread),
+        ])
+
+    def create_recipe(self, name, ingredients):
+
+        recipe = Recipe.objects.create(name=name, preparing=name, preparation_time=timedelta(minutes=10))
+
+        for ingredient, quantity in ingredients:
+            IngredientRecipe.objects.create(recipe=recipe, ingredient=ingredient, quantity=quantity)
+
+        return recipe
+
+    def test_parse_quantity(self):
+
+        self.assertEqual(parse_quantity('1,5 kg'), (1500, 'g'))
+        self.assertEqual(parse_quantity('2 łyżki'), (30, 'ml'))
+        self.assertIsNone(parse_quantity('szczypta'))
+
+    def test_quantities_are_summed(self):
+
+        shopping_list = {item['ingredient']: item for item in get_shopping_list(self.schedule.pk)}
+
+        self.assertEqual(shopping_list['Mąka']['quantities'], ['1,5 kg'])
+        self.assertEqual(shopping_list['Mleko']['quantities'], ['1 l'])
+        self.assertEqual(shopping_list['Mleko']['unparsed'], ['do smaku'])
+
+    def test_cached_until_slot_changes(self):
+
+        get_shopping_list(self.schedule.pk)
+
+        with self.assertNumQueries(0):
+            get_shopping_list(self.schedule.pk)
+
+        slot = self.schedule.schedule_recipes.get(day_number=3)
+        slot.recipe = self.pancakes
+
+        with self.captureOnCommitCallbacks(execute=True):
+            slot.save()
+
+        # the sums come from a single aggregate query
+        with self.assertNumQueries(1):
+            shopping_list = {item['ingredient']: item for item in get_shopping_list(self.schedule.pk)}
+
+        self.assertEqual(shopping_list['Mąka']['quantities'], ['750 g'])
+
+    def test_amount_is_stored_on_save(self):
+
+        row = IngredientRecipe.objects.get(recipe=self.pancakes, ingredient=self.milk)
+        row.quantity = '2 szklanki'
+        row.save(update_fields=['quantity'])
+        row.refresh_from_db()
+
+        self.assertEqual((row.amount, row.unit), (500, 'ml'))
+        self.assertIsNone(IngredientRecipe.objects.get(recipe=self.bread, ingredient=self.milk).unit)
+
+    def test_json_endpoint(self):
+
+        response = self.client.get(reverse('schedule-shopping-list', args=[self.schedule.pk]), {'format': 'json'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['ingredients']), 2)
+
+
+class FormsetChoicesTest(TestCase):
+
+    def setUp(self):
+
+        cache.clear()
+        self.recipes = [
+            Recipe.objects.create(name=f'Recipe {number}', preparing='Preparing', preparation_time=timedelta(minutes=10))
+            for number in range(35)
+        ]
+
+    def get_data(self, recipe_pks):
+
+        data = {
+            'schedule_recipes-TOTAL_FORMS': '35',
+            'schedule_recipes-INITIAL_FORMS': '0',
+            'schedule_recipes-MIN_NUM_FORMS': '35',
+            'schedule_recipes-MAX_NUM_FORMS': '35',
+        }
+
+        for index, pk in enumerate(recipe_pks):
+            data[f'schedule_recipes-{index}-recipe'] = pk
+            data[f'schedule_recipes-{index}-day_number'] = index // 5 + 1
+            data[f'schedule_recipes-{index}-meal_number'] = index % 5 + 1
+
+        return data
+
+    def test_posted_recipes_are_loaded_in_one_query(self):
+
+        formset = RecipeScheduleFormset(self.get_data([recipe.pk for recipe in self.recipes]), instance=Schedule())
+
+        # the shared choices and the posted recipes
+        with self.assertNumQueries(2):
+            self.assertTrue(formset.is_valid())
+
+        self.assertEqual([form.cleaned_data['recipe'] for form in formset], self.recipes)
+
+    def test_unknown_recipe_is_rejected(self):
+
+        pks = [self.recipes[0].pk] * 34 + [0]
+        formset = RecipeScheduleFormset(self.get_data(pks), instance=Schedule())
+
+        self.assertFalse(formset.is_valid())
+        self.assertIn('recipe', formset.forms[34].errors)
+
+    def test_choices_are_loaded_once_for_all_forms(self):
+
+        formset = RecipeScheduleFormset(instance=Schedule())
+
+        with self.assertNumQueries(1):
+            formset.as_p()
+
+        with self.assertNumQueries(0):
+            RecipeScheduleFormset(instance=Schedule()).as_p()
+
+
+class ScheduleSlotsTest(TestCase):
+
+    def setUp(self):
+
+        self.user = User.objects.create_user(
+            username='user', email='user@example.com', password='Haslo123!', is_active=True
+        )
+        self.recipes = [
+            Recipe.objects.create(name=f'Recipe {number}', preparing='Preparing', preparation_time=timedelta(minutes=10))
+            for number in range(3)
+        ]
+        self.schedule = Schedule.objects.create(name='Plan', description='Opis')
+
+    def get_slots(self, schedule):
+
+        return list(schedule.schedule_recipes.order_by('day_number', 'meal_number').values_list(
+            'day_number', 'meal_number', 'recipe__name'
+        ))
+
+    def test_slots_are_written_in_bulk(self):
+
+        slots = [RecipeSchedule(day_number=day, meal_number=1, recipe=self.recipes[0]) for day in range(1, 8)]
+
+        with CaptureQueriesContext(connection) as context:
+            self.schedule.save_slots(slots)
+
+        inserts = [query for query in context.captured_queries if query['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 1)
+
+        slots = list(self.schedule.schedule_recipes.all())
+
+        for slot in slots:
+            slot.recipe = self.recipes[1]
+
+        with CaptureQueriesContext(connection) as context:
+            self.schedule.save_slots(slots)
+
+        updates = [
+            query for query in context.captured_queries if query['sql'].startswith('UPDATE "food_app_recipeschedule"')
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self.get_slots(self.schedule), [(day, 1, 'Recipe 1') for day in range(1, 8)])
+
+    def test_clone_copies_slots_in_fixed_queries(self):
+
+        self.schedule.save_slots([RecipeSchedule(day_number=1, meal_number=1, recipe=self.recipes[0])])
+        self.schedule.clone(create_by=self.user)
+
+        with CaptureQueriesContext(connection) as context:
+            self.schedule.clone(create_by=self.user)
+
+        self.schedule.save_slots([
+            RecipeSchedule(day_number=day, meal_number=meal, recipe=self.recipes[2])
+            for day in range(2, 8) for meal in range(1, 6)
+        ])
+
+        with self.assertNumQueries(len(context)):
+            clone = self.schedule.clone(create_by=self.user)
+
+        self.assertEqual(clone.name, 'Plan (kopia)')
+        self.assertEqual(clone.description, 'Opis')
+        self.assertEqual(clone.create_by, self.user)
+        self.assertEqual(self.get_slots(clone), self.get_slots(self.schedule))
+
+    def test_clone_view_opens_the_copy_for_edit(self):
+
+        url = reverse('schedule-clone', args=[self.schedule.pk])
+        self.assertEqual(self.client.post(url).status_code, 302)
+        self.assertEqual(Schedule.objects.count(), 1)
+
+        self.client.force_login(self.user)
+        response = self.client.post(url)
+        clone = Schedule.objects.get(create_by=self.user)
+
+        self.assertRedirects(
+            response, reverse('schedule-update', args=[clone.pk]) + f'?next={reverse("user-schedule")}',
+            fetch_redirect_response=False,
+        )
+
+
+class ScheduleDetailViewTest(TestCase):
+
+    def setUp(self):
+
+        self.schedule = Schedule.objects.create(name='Plan')
+        self.url = reverse('schedule-detail', args=[self.schedule.pk])
+
+    def fill_days(self, days):
+
+        # the nutrition summary is stored once the change is committed
+        with self.captureOnCommitCallbacks(execute=True):
+            self.schedule.save_slots([
+                RecipeSchedule(
+                    day_number=day,
+                    meal_number=meal,
+                    recipe=Recipe.objects.create(
+                        name=f'Recipe {day} {meal}', preparing='Preparing', preparation_time=timedelta(minutes=10)
+                    ),
+                )
+                for day in days
+                for meal in range(1, 6)
+            ])
+
+    def test_week_grid_has_fixed_query_count(self):
+
+        for days in [[1], range(2, 8)]:
+            self.fill_days(days)
+
+            # schedule with its summary, and the slots joined with their recipes
+            with self.assertNumQueries(2):
+                response = self.client.get(self.url)
+
+            self.assertContains(response, 'Recipe 1 5')
+
+
+class CacheVersionTest(TestCase):
+
+    def setUp(self):
+
+        cache.clear()
+        Ingredient.objects.create(name='Flour')
+
+    def get_names(self):
+
+        return [
+            ingredient.name
+            for ingredient in cached_queryset(name='ingredients', models=[Ingredient], queryset=Ingredient.objects.all())
+        ]
+
+    def test_cached_until_model_changes(self):
+
+        self.assertEqual(self.get_names(), ['Flour'])
+
+        with self.assertNumQueries(0):
+            self.get_names()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(name='Milk')
+
+        self.assertEqual(self.get_names(), ['Flour', 'Milk'])
+
+    def test_version_is_bumped_after_commit(self):
+
+        version = get_model_version(Ingredient)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(name='Milk')
+            # a concurrent request still sees the old rows, so it must still see the old version
+            self.assertEqual(get_model_version(Ingredient), version)
+
+        self.assertGreater(get_model_version(Ingredient), version)
+
+    def test_likes_and_comments_bump_counters_only(self):
+
+        user = User.objects.create_user(username='user', email='user@example.com', password='Haslo123!')
+        recipe = Recipe.objects.create(name='Recipe', preparing='Preparing', preparation_time=timedelta(minutes=10))
+        list_url = reverse('recipe-list')
+        self.client.get(list_url)
+        version, counters = get_model_version(Recipe), get_counters_version(Recipe)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.add_like(user)
+            CommentRecipe.objects.create(recipe=recipe, user=user, comment='Comment')
+
+        self.assertEqual(get_model_version(Recipe), version)
+        self.assertGreater(get_counters_version(Recipe), counters)
+        # the list fragment shows the likes, so it is rendered again
+        self.assertContains(self.client.get(list_url), '<i class="fa fa-thumbs-up"></i> 1', html=False)
+
+
+@override_settings(FOOD_APP_LEADERBOARD_SIZE=2)
+class LeaderboardTest(TestCase):
+
+    def setUp(self):
+
+        cache.clear()
+        self.users = [
+            User.objects.create_user(username=f'user{number}', email=f'user{number}@example.com', password='Haslo123!')
+            for number in range(3)
+        ]
+        self.recipes = [
+            Recipe.objects.create(name=f'Recipe {number}', preparing='Preparing', preparation_time=timedelta(minutes=10))
+            for number in range(3)
+        ]
+
+    def get_names(self, board):
+
+        return [(entry.recipe.name, entry.score) for entry in get_board(board)]
+
+    def test_likes_update_the_boards(self):
+
+        self.recipes[2].add_like(self.users[0])
+        self.recipes[2].add_like(self.users[1])
+        self.recipes[1].add_like(self.users[0])
+
+        self.assertEqual(self.get_names('recipes'), [('Recipe 2', 2), ('Recipe 1', 1)])
+
+    def test_rolling_board_counts_recent_likes(self):
+
+        self.recipes[0].add_like(self.users[0])
+        self.recipes[0].add_like(self.users[1])
+        self.recipes[1].add_like(self.users[0])
+        Recipe.likes.through.objects.filter(recipe=self.recipes[0]).update(
+            date_added=timezone.now() - timedelta(days=30)
+        )
+        refresh_board('recipes-window')
+
+        self.assertEqual(self.get_names('recipes-window'), [('Recipe 1', 1)])
+        self.assertEqual(self.get_names('recipes'), [('Recipe 0', 2), ('Recipe 1', 1)])
+
+    def test_user_deletion_refreshes_the_boards(self):
+
+        self.recipes[0].add_like(self.users[0])
+        self.recipes[0].add_like(self.users[1])
+        self.recipes[1].add_like(self.users[2])
+        self.users[0].delete()
+        self.users[1].delete()
+
+        self.assertEqual(
+            list(LeaderboardEntry.objects.filter(board='recipes').values_list('recipe__name', 'score')),
+            [('Recipe 1', 1), ('Recipe 0', 0)]
+        )
+
+    def test_concurrent_refresh_keeps_the_board(self):
+
+        refresh_board('recipes')
+
+        with mock.patch.object(LeaderboardEntry.objects, 'bulk_create', side_effect=IntegrityError):
+            self.assertIsNone(refresh_board('recipes'))
+
+        self.assertEqual(LeaderboardEntry.objects.filter(board='recipes').count(), 2)
+
+
+class ScheduleNutritionTest(TestCase):
+
+    def setUp(self):
+
+        flour = Ingredient.objects.create(name='Mąka')
+        milk = Ingredient.objects.create(name='Mleko')
+        egg = Ingredient.objects.create(name='Jajko')
+        self.pancakes = Recipe.objects.create(
+            name='Naleśniki', preparing='Smażyć', preparation_time=timedelta(minutes=10), calories=200
+        )
+        IngredientRecipe.objects.create(recipe=self.pancakes, ingredient=flour, quantity='250 g')
+        IngredientRecipe.objects.create(recipe=self.pancakes, ingredient=milk, quantity='500 ml')
+        IngredientRecipe.objects.create(recipe=self.pancakes, ingredient=egg, quantity='2')
+        self.schedule = Schedule.objects.create(name='Plan')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.schedule.save_slots([
+                RecipeSchedule(day_number=1, meal_number=1, recipe=self.pancakes),
+                RecipeSchedule(day_number=1, meal_number=5, recipe=self.pancakes),
+                RecipeSchedule(day_number=2, meal_number=1, recipe=self.pancakes),
+            ])
+
+        self.url = reverse('schedule-detail', args=[self.schedule.pk])
+
+    def test_totals_per_day_and_week(self):
+
+        nutrition = ScheduleNutrition.summarize([self.schedule.pk])[self.schedule.pk]
+
+        self.assertEqual(nutrition.get_day(1), {'calories': 3000, 'weight': 1500, 'meals': 2})
+        self.assertEqual(nutrition.get_day(2), {'calories': 1500, 'weight': 750, 'meals': 1})
+        self.assertEqual((nutrition.calories, nutrition.weight, nutrition.meals), (4500, 2250, 3))
+
+    def test_summary_is_stored_after_each_change(self):
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url)
+
+        self.assertFalse(any('SUM(' in query['sql'] for query in context.captured_queries))
+        self.assertEqual(response.context['nutrition'].calories, 4500)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pancakes.calories = 100
+            self.pancakes.save()
+
+        self.assertEqual(ScheduleNutrition.objects.get(schedule=self.schedule).calories, 2250)
+        self.assertEqual(self.client.get(self.url).context['nutrition'].calories, 2250)
+
+    def test_missing_summary_is_computed_without_writing(self):
+
+        ScheduleNutrition.objects.all().delete()
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.context['nutrition'].calories, 4500)
+        self.assertFalse(any(query['sql'].startswith(('INSERT', 'UPDATE')) for query in context.captured_queries))
+        self.assertFalse(ScheduleNutrition.objects.exists())
+
+        call_command('store_nutrition', batch_size=1, stdout=StringIO())
+
+        self.assertEqual(ScheduleNutrition.objects.get(schedule=self.schedule).calories, 4500)
+
+
+class ApiTest(TestCase):
+
+    def setUp(self):
+
+        self.user = User.objects.create_user(username='user', email='user@example.com', password='Haslo123!')
+        flour = Ingredient.objects.create(name='Mąka')
+
+        for number in range(3):
+            recipe = Recipe.objects.create(
+                name=f'Przepis {number}', preparing='Piec', preparation_time=timedelta(minutes=10), create_by=self.user
+            )
+            IngredientRecipe.objects.create(recipe=recipe, ingredient=flour, quantity='100 g')
+
+        self.url = reverse('api-recipe-list')
+
+    def test_sparse_fields_expand_and_cursor(self):
+
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {'fields': 'id,name', 'expand': 'create_by,ingredients', 'limit': 2})
+
+        data = response.json()
+
+        self.assertEqual(set(data['results'][0]), {'id', 'name', 'create_by', 'ingredients'})
+        self.assertEqual(data['results'][0]['create_by']['username'], 'user')
+        self.assertEqual(data['results'][0]['ingredients'][0]['unit'], 'g')
+        self.assertEqual(len(self.client.get(data['next']).json()['results']), 1)
+
+    def test_not_modified_until_change(self):
+
+        response = self.client.get(self.url)
+
+        with self.assertNumQueries(0):
+            not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(not_modified.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.first().save()
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_unknown_field_is_rejected(self):
+
+        self.assertEqual(self.client.get(self.url, {'fields': 'password'}).status_code, 400)
+
+    def test_crafted_cursor_is_rejected(self):
+
+        cursors = [
+            'not a cursor',
+            encode_cursor({'likes_count': 0}),
+            encode_cursor(['many', 'Przepis', 1]),
+            encode_cursor([10 ** 30, 'Przepis', 1]),
+            encode_cursor([0, 'Przepis']),
+        ]
+
+        for cursor in cursors:
+            response = self.client.get(self.url, {'cursor': cursor})
+
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'error': 'Invalid cursor'})
+
+        response = self.client.get(reverse('api-comment-list'), {'cursor': encode_cursor(['yesterday', 1])})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_nutrition_is_computed_for_the_page_at_once(self):
+
+        recipe = Recipe.objects.first()
+
+        for number in range(3):
+            schedule = Schedule.objects.create(name=f'Plan {number}')
+            schedule.save_slots([RecipeSchedule(day_number=1, meal_number=1, recipe=recipe)])
+
+        url = reverse('api-schedule-list')
+
+        # schedules, nutrition prefetch and one aggregate of the missing summaries, which a GET does not store
+        with self.assertNumQueries(3):
+            data = self.client.get(url, {'expand': 'nutrition'}).json()
+
+        self.assertEqual([row['nutrition']['weight'] for row in data['results']], [100, 100, 100])
+        self.assertFalse(ScheduleNutrition.objects.exists())
+
+        ScheduleNutrition.store_missing(Schedule.objects.values_list('pk', flat=True))
+
+        with self.assertNumQueries(2):
+            self.client.get(url, {'expand': 'nutrition'})
+
+
+class BenchmarkTest(TestCase):
+
+    def test_benchmark_runs_on_generated_data(self):
+
+        call_command(
+            'generate_data', users=5, ingredients=10, recipes=40, comments=20, likes=50, schedules=2, stdout=StringIO()
+        )
+        output = StringIO()
+        cache.clear()
+        call_command('benchmark', iterations=1, warmup=0, stdout=output)
+        results = json.loads(output.getvalue())
+
+        self.assertEqual(Recipe.objects.filter(name='Benchmark').count(), 0)
+        self.assertEqual(Schedule.objects.filter(name='Benchmark').count(), 0)
+        self.assertIsNone(cache.get(version_key(Recipe)))
+        self.assertLessEqual(results['recipe-detail']['queries'], results['recipe-detail-user']['queries'])
+        self.assertIn('schedule-wizard', results)
+
+
+def make_image(color='red', size=(400, 300)):
+
+    content = BytesIO()
+    Image.new('RGB', size, color).save(content, 'PNG')
+
+    return SimpleUploadedFile('photo.png', content.getvalue(), content_type='image/png')
+
+
+class MediaTestCase(TestCase):
+
+    """
+    Stores uploads in a temporary MEDIA_ROOT
+    """
+    def setUp(self):
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        # variants are rendered inline, the opt-in of tests and development
+        media = override_settings(MEDIA_ROOT=directory.name, FOOD_APP_IMAGE_WORKERS=0)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.user = User.objects.create_user(
+            username='user', email='user@example.com', password='Haslo123!', is_active=True
+        )
+
+    def create_recipe(self, image):
+
+        return Recipe.objects.create(
+            name='Recipe',
+            preparing='Preparing',
+            preparation_time=timedelta(minutes=10),
+            create_by=self.user,
+            image=image,
+        )
+
+
+class ImageProcessingTest(MediaTestCase):
+
+    def test_variants_are_rendered_after_commit(self):
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            recipe = self.create_recipe(make_image())
+
+        default_url = Recipe.image.field.storage.url(Recipe.image.field.get_default())
+
+        self.assertTrue(recipe.image.pending)
+        self.assertEqual(recipe.image.url, default_url)
+        self.assertEqual(set(recipe.image.variant_urls.values()), {default_url})
+
+        with mock.patch.object(ImageQueue, 'start') as start:
+            for callback in callbacks:
+                callback()
+
+        start.assert_not_called()
+        recipe.refresh_from_db()
+        storage = recipe.image.storage
+
+        self.assertFalse(recipe.image.pending)
+        self.assertEqual(
+            set(recipe.image.variant_urls), {'main_png', 'main_webp', 'thumb_png', 'thumb_webp'}
+        )
+
+        for variant, url in recipe.image.variant_urls.items():
+            name = get_variant_name(recipe.image.name, variant)
+
+            self.assertEqual(url, storage.url(name))
+            self.assertTrue(storage.exists(name))
+
+        self.assertEqual(recipe.image.url, recipe.image.variant_urls['main_png'])
+
+        with storage.open(recipe.image.variants['thumb_png']) as image_file:
+            self.assertEqual(Image.open(image_file).size, (171, 128))
+
+    def test_upload_is_queued_for_the_workers_by_default(self):
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            recipe = self.create_recipe(make_image())
+
+        with override_settings(FOOD_APP_IMAGE_WORKERS=2), mock.patch.object(ImageQueue, 'start') as start:
+            for callback in callbacks:
+                callback()
+
+        start.assert_called_once_with()
+        self.assertEqual(image_queue.jobs.get_nowait(), ('food_app.Recipe', 'image', recipe.image.name))
+        image_queue.jobs.task_done()
+        recipe.refresh_from_db()
+        self.assertTrue(recipe.image.pending)
+
+    def test_failed_rendering_serves_the_original(self):
+
+        with self.captureOnCommitCallbacks():
+            recipe = self.create_recipe(make_image())
+
+        render = mock.Mock(side_effect=OSError('broken image'))
+
+        with self.assertLogs('food_app.images', 'ERROR'):
+            self.assertTrue(process_image('food_app.Recipe', 'image', recipe.image.name, render=render))
+
+        recipe.refresh_from_db()
+        original = recipe.image.storage.url(recipe.image.name)
+
+        self.assertFalse(recipe.image.pending)
+        self.assertEqual(recipe.image.url, original)
+        self.assertEqual(set(recipe.image.variant_urls.values()), {original})
+
+    def test_changed_image_discards_stale_variants(self):
+
+        with self.captureOnCommitCallbacks():
+            recipe = self.create_recipe(make_image())
+
+        name = recipe.image.name
+
+        with self.captureOnCommitCallbacks():
+            recipe.image = make_image('blue')
+            recipe.save()
+
+        self.assertFalse(process_image('food_app.Recipe', 'image', name))
+        self.assertFalse(recipe.image.storage.exists(get_variant_name(name, 'main_png')))
+        recipe.refresh_from_db()
+        self.assertTrue(recipe.image.pending)
+
+    def test_process_images_renders_pending_uploads(self):
+
+        with self.captureOnCommitCallbacks():
+            recipe = self.create_recipe(make_image())
+
+        call_command('process_images', stdout=StringIO())
+        recipe.refresh_from_db()
+
+        self.assertFalse(recipe.image.pending)
+
+
+class ContentAddressedStorageTest(MediaTestCase):
+
+    def test_identical_uploads_share_one_file(self):
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.create_recipe(make_image())
+            second = self.create_recipe(make_image())
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(self.user.avatar.storage.exists(first.image.name))
+
+    def test_shared_file_survives_deleting_one_owner(self):
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.create_recipe(make_image())
+            second = self.create_recipe(make_image())
+
+        first.refresh_from_db()
+        storage = first.image.storage
+        names = [first.image.name, *first.image.variants.values()]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+
+        for name in names:
+            self.assertTrue(storage.exists(name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+
+        for name in names:
+            self.assertFalse(storage.exists(name))
+
+    def test_reference_check_is_one_query(self):
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = self.create_recipe(make_image())
+
+        with self.assertNumQueries(1):
+            self.assertTrue(recipe.image.storage.is_referenced(recipe.image.name))
+
+        with self.assertNumQueries(1):
+            self.assertFalse(recipe.image.storage.is_referenced('food_app/Recipe/missing.png'))
+
+
+class ServeFileTest(SimpleTestCase):
+
+    content = b'0123456789'
+
+    def setUp(self):
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        self.name = f'{"a" * 64}.png'
+
+        with open(f'{self.root}/{self.name}', 'wb') as file:
+            file.write(self.content)
+
+        self.factory = RequestFactory()
+
+    def get(self, path=None, **headers):
+
+        request = self.factory.get(reverse('media', kwargs={'path': path or self.name}), **headers)
+
+        return serve_file(request, path or self.name, document_root=self.root, internal_url='/internal/media/')
+
+    def test_full_response_carries_validators(self):
+
+        response = self.get()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertTrue(response['ETag'])
+
+    def test_matching_etag_is_not_modified(self):
+
+        etag = self.get()['ETag']
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_byte_ranges(self):
+
+        response = self.get(HTTP_RANGE='bytes=2-5')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(response['Content-Length'], '4')
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+
+        suffix = self.get(HTTP_RANGE='bytes=-3')
+
+        self.assertEqual(suffix['Content-Range'], 'bytes 7-9/10')
+        self.assertEqual(b''.join(suffix.streaming_content), b'789')
+
+    def test_range_outside_file_is_not_satisfiable(self):
+
+        response = self.get(HTTP_RANGE='bytes=10-')
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_stale_if_range_serves_whole_file(self):
+
+        response = self.get(HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"other"')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+    @override_settings(FOOD_APP_SENDFILE='x-accel-redirect')
+    def test_x_accel_redirect(self):
+
+        response = self.get()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f'/internal/media/{self.name}')
+        self.assertEqual(response.content, b'')
+        self.assertTrue(response['ETag'])
+
+    @override_settings(FOOD_APP_SENDFILE='x-sendfile')
+    def test_x_sendfile(self):
+
+        response = self.get()
+
+        self.assertEqual(response['X-Sendfile'], f'{self.root}/{self.name}')
+        self.assertNotIn('X-Accel-Redirect', response)
+
+    def test_path_outside_root_is_not_found(self):
+
+        with self.assertRaises(Http404):
+            self.get('../secret.txt')
+
@@ -6,7 +6,10 @@ from .views import IndexView, UserRegisterView, UserActiveView, UserLoginView, U
             UserRecipesView, UserSchedulesView, UserCommentsView, IngredientCreateView, IngredientUpdateView, \
                 IngredientDeleteView, RecipeCreateView, RecipeUpdateView, RecipeDeleteView, RecipeDetailView, \
                     RecipeListView, ScheduleCreateView, ScheduleUpdateView, ScheduleDeleteView, ScheduleDetailView, \
-                        ScheduleListView
+                        ScheduleListView, ScheduleCloneView, ScheduleShoppingListView, ProfilingStatsView, \
+                            ApiListView, ApiDetailView, PoolStatsView, RecipeCommentsView, LikeView
+from .models import Recipe, Schedule
+from .api import RecipeResource, ScheduleResource, IngredientResource, CommentResource
 
 urlpatterns = [
     path('', view=IndexView.as_view(), name='index'),
@@ -36,10 +39,29 @@ urlpatterns = [
     path('recipe/update/<int:pk>/', view=RecipeUpdateView.as_view(), name='recipe-update'),
     path('recipe/delete/<int:pk>/', view=RecipeDeleteView.as_view(), name='recipe-delete'),
     path('recipe/detail/<int:pk>/', view=RecipeDetailView.as_view(), name='recipe-detail'),
+    path('recipe/comments/<int:pk>/', view=RecipeCommentsView.as_view(), name='recipe-comments'),
+    path('recipe/like/', view=LikeView.as_view(model=Recipe), name='recipe-like'),
     path('recipe/list/', view=RecipeListView.as_view(), name='recipe-list'),
     path('schedule/create/', view=ScheduleCreateView.as_view(), name='schedule-create'),
     path('schedule/update/<int:pk>/', view=ScheduleUpdateView.as_view(), name='schedule-update'),
+    path('schedule/clone/<int:pk>/', view=ScheduleCloneView.as_view(), name='schedule-clone'),
     path('schedule/delete/<int:pk>/', view=ScheduleDeleteView.as_view(), name='schedule-delete'),
     path('schedule/detail/<int:pk>/', view=ScheduleDetailView.as_view(), name='schedule-detail'),
+    path('schedule/shopping-list/<int:pk>/', view=ScheduleShoppingListView.as_view(), name='schedule-shopping-list'),
+    path('schedule/like/', view=LikeView.as_view(model=Schedule), name='schedule-like'),
     path('schedule/list/', view=ScheduleListView.as_view(), name='schedule-list'),
+    path('api/recipes/', view=ApiListView.as_view(resource=RecipeResource()), name='api-recipe-list'),
+    path('api/recipes/<int:pk>/', view=ApiDetailView.as_view(resource=RecipeResource()), name='api-recipe-detail'),
+    path('api/schedules/', view=ApiListView.as_view(resource=ScheduleResource()), name='api-schedule-list'),
+    path('api/schedules/<int:pk>/', view=ApiDetailView.as_view(resource=ScheduleResource()), name='api-schedule-detail'),
+    path('api/ingredients/', view=ApiListView.as_view(resource=IngredientResource()), name='api-ingredient-list'),
+    path(
+        'api/ingredients/<int:pk>/',
+        view=ApiDetailView.as_view(resource=IngredientResource()),
+        name='api-ingredient-detail'
+    ),
+    path('api/comments/', view=ApiListView.as_view(resource=CommentResource()), name='api-comment-list'),
+    path('api/comments/<int:pk>/', view=ApiDetailView.as_view(resource=CommentResource()), name='api-comment-detail'),
+    path('stats/profiling/', view=ProfilingStatsView.as_view(), name='profiling-stats'),
+    path('stats/pools/', view=PoolStatsView.as_view(), name='pool-stats'),
 ]
\ No newline at end of file
@@ -10,19 +10,36 @@ from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from formtools.wizard.views import SessionWizardView
 from django.conf import settings
 from django.core.files.storage import FileSystemStorage
-from django.core.paginator import Paginator
-from django.db.models import Count
-
-from .models import User, UserUniqueToken, Ingredient, Recipe, CommentRecipe, Schedule, RecipeSchedule
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.http import JsonResponse, Http404
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import require_safe
+from django.utils.decorators import method_decorator
+
+from .models import User, UserUniqueToken, Ingredient, Recipe, IngredientRecipe, CommentRecipe, Schedule, \
+    RecipeSchedule, ScheduleNutrition
 from .forms import UserRegisterForm, UserLoginForm, UserUpdateForm, UserPasswordUpdateForm, \
     UserPasswordResetForm, UserPasswordSetForm, SearchForm, IngredientForm, RecipeFormStep1, \
         RecipeFormStep2, RecipeFormStep3, IngredientRecipeFormset, CommentRecipeForm, ScheduleForm, \
             RecipeScheduleFormset
 from .validators import validate_token
+from .pagination import CursorPaginationMixin, InvalidCursor, paginate_by_cursor
+from .cache import cached_queryset
+from .leaderboard import get_board
+from .profiling import profile_stats
+from .db.pool import get_pool_stats
+from .shopping import get_shopping_list
+from .api import ApiError
+from .routers import read_primary
 
 # Create your views here.
 
 
+COMMENTS_PAGE_SIZE = 5
+
+LIKES_BATCH_SIZE = 100
+
 FORMS_RECIPE = [
     ('step1', RecipeFormStep1),
     ('step2', RecipeFormStep2),
@@ -66,9 +83,9 @@ class IndexView(View):
     """
     def get(self, request, *args, **kwargs):
 
-        recipe_list = Recipe.objects.annotate(num_likes=Count('likes')).order_by('-num_likes')[:3]
+        recipe_list = [entry.recipe for entry in get_board('recipes')[:3]]
         context = {}
-        if recipe_list.count() == 3:
+        if len(recipe_list) == 3:
             context['recipe_list'] = recipe_list
         
         return render (
@@ -90,7 +107,7 @@ class UserRegisterView(FormView):
     def form_valid(self, form, *args, **kwargs):
 
         user = form.save()
-        new_token = UserUniqueToken.objects.create(user=user)
+        new_token = UserUniqueToken.issue(user, UserUniqueToken.PURPOSE_ACTIVATION)
         user.email_user(
             subject='Rejestracja konta',
             message=f'''Witaj {user}, twój link do aktywacji konta:
@@ -109,15 +126,17 @@ class UserActiveView(View):
     def get(self, request, *args, **kwargs):
 
         token = request.GET.get('token')
+        user = None
 
-        if token and validate_token(token) and UserUniqueToken.objects.filter(token=token).first():    
-            user_token = UserUniqueToken.objects.get(token=token)
-            user = user_token.user
-            user.is_active = True
-            user.save()
-            user_token.delete()
-        
-        else:
+        with transaction.atomic():
+            if token and validate_token(token):
+                user = UserUniqueToken.consume(token, UserUniqueToken.PURPOSE_ACTIVATION)
+
+            if user:
+                user.is_active = True
+                user.save(update_fields=['is_active'])
+
+        if not user:
             messages.error(self.request, message='Twój link jest błędny lub źle podany !!!')
 
         return redirect(reverse_lazy('user-login'))
@@ -159,6 +178,19 @@ class UserLogoutView(View):
         return redirect(reverse_lazy('recipe-list'))
 
 
+class UserPanelMixin:
+
+    """
+    Replace the user of the panel pages with one carrying the panel counts, loaded in a single query
+    """
+    def get_context_data(self, *args, **kwargs):
+
+        context = super().get_context_data(*args, **kwargs)
+        context['user'] = User.objects.with_stats().get(pk=self.request.user.pk)
+
+        return context
+
+
 class UserPanelView(LoginRequiredMixin, DetailView):
 
     """
@@ -170,7 +202,7 @@ class UserPanelView(LoginRequiredMixin, DetailView):
     
     def get_object(self, *args, **kwargs):
        
-        return self.request.user
+        return User.objects.with_stats().get(pk=self.request.user.pk)
 
 
 class UserUpdateView(LoginRequiredMixin, UpdateView):
@@ -221,7 +253,8 @@ class UserPasswordResetView(FormView):
     def form_valid(self, form, *args, **kwargs):
 
         user = User.objects.get(email=form.cleaned_data['email'])
-        new_token, created = UserUniqueToken.objects.get_or_create(user=user)
+        purpose = UserUniqueToken.PURPOSE_PASSWORD if user.is_active else UserUniqueToken.PURPOSE_ACTIVATION
+        new_token = UserUniqueToken.issue(user, purpose)
         
         if user.is_active:
             user.email_user(
@@ -252,7 +285,8 @@ class UserPasswordSetView(View):
         token = request.GET.get('token')
         form = None
 
-        if token and validate_token(token) and UserUniqueToken.objects.filter(token=token).first():
+        if token and validate_token(token) and \
+                UserUniqueToken.objects.valid(UserUniqueToken.PURPOSE_PASSWORD).filter(token=token).exists():
             form = UserPasswordSetForm
             messages.success(self.request, message='Ustaw nowe hasło')
         
@@ -271,16 +305,30 @@ class UserPasswordSetView(View):
         
         form = UserPasswordSetForm(request.POST)
 
-        if form.is_valid():
-            token = request.GET.get('token')
-            user_unique_token = UserUniqueToken.objects.filter(token=token).first()
-            password_new = form.cleaned_data['password_new']
-            user = user_unique_token.user
-            user.set_password(password_new)
-            user.save()
-            user_unique_token.delete()
+        if not form.is_valid():
+            return render(
+                request=request,
+                template_name='food_app/user_password_set.html',
+                context={
+                    'form': form,
+                }
+            )
+
+        token = request.GET.get('token')
+
+        with transaction.atomic():
+            user = UserUniqueToken.consume(token, UserUniqueToken.PURPOSE_PASSWORD) \
+                if token and validate_token(token) else None
+
+            if user is None:
+                messages.error(self.request, message='Twój link jest błędny lub źle podany !!!')
 
-            return redirect('user-login')
+                return redirect('user-login')
+
+            user.set_password(form.cleaned_data['password_new'])
+            user.save(update_fields=['password'])
+
+        return redirect('user-login')
 
 
 class UserDeleteView(LoginRequiredMixin, DeleteView):
@@ -297,7 +345,7 @@ class UserDeleteView(LoginRequiredMixin, DeleteView):
         return self.request.user
 
 
-class UserRecipeView(LoginRequiredMixin, ListView):
+class UserRecipeView(LoginRequiredMixin, UserPanelMixin, CursorPaginationMixin, ListView):
 
     """
     Return the list all recipes create by user
@@ -306,18 +354,19 @@ class UserRecipeView(LoginRequiredMixin, ListView):
     template_name = 'food_app/user_recipe.html'
     context_object_name = 'recipe_list'
     paginate_by = 5
+    cursor_ordering = ['-likes_count', 'name', 'pk']
 
     def get_queryset(self, *args, **kwargs):
 
-        recipe_list = self.request.user.recipes.annotate(num_likes=Count('likes')).order_by('-num_likes')
+        recipe_list = self.request.user.recipes.order_by('-likes_count', 'name')
         self.form = SearchForm(self.request.GET)
         self.search_count = ''
 
         if self.form.is_valid():
 
             if self.form.changed_data:
-                recipe_list = recipe_list.filter(name__icontains=self.form.cleaned_data['name'])
-                self.search_count = recipe_list.count()
+                recipe_list = self.form.search(recipe_list)
+                self.search_count = self.get_search_count(recipe_list)
              
         return recipe_list
         
@@ -337,7 +386,7 @@ class UserRecipeView(LoginRequiredMixin, ListView):
         return context
 
 
-class UserScheduleView(LoginRequiredMixin, ListView):
+class UserScheduleView(LoginRequiredMixin, UserPanelMixin, CursorPaginationMixin, ListView):
 
     """
     Return the list all schedules create by user
@@ -346,18 +395,19 @@ class UserScheduleView(LoginRequiredMixin, ListView):
     template_name = 'food_app/user_schedule.html'
     context_object_name = 'schedule_list'
     paginate_by = 5
+    cursor_ordering = ['-likes_count', 'name', 'pk']
 
     def get_queryset(self, *args, **kwargs):
 
-        schedule_list = self.request.user.schedules.annotate(num_likes=Count('likes')).order_by('-num_likes')
+        schedule_list = self.request.user.schedules.order_by('-likes_count', 'name')
         self.form = SearchForm(self.request.GET)
         self.search_count = ''
 
         if self.form.is_valid():
 
             if self.form.changed_data:
-                schedule_list = schedule_list.filter(name__icontains=self.form.cleaned_data['name'])
-                self.search_count = schedule_list.count()
+                schedule_list = self.form.search(schedule_list)
+                self.search_count = self.get_search_count(schedule_list)
              
         return schedule_list
         
@@ -377,7 +427,7 @@ class UserScheduleView(LoginRequiredMixin, ListView):
         return context
 
 
-class UserIngredientView(LoginRequiredMixin, ListView):
+class UserIngredientView(LoginRequiredMixin, UserPanelMixin, CursorPaginationMixin, ListView):
 
     """
     Return the list all ingredients create by user
@@ -386,6 +436,7 @@ class UserIngredientView(LoginRequiredMixin, ListView):
     template_name = 'food_app/user_ingredient.html'
     context_object_name = 'ingredient_list'
     paginate_by = 10
+    cursor_ordering = ['name', 'pk']
 
     def get_queryset(self, *args, **kwargs):
 
@@ -396,8 +447,8 @@ class UserIngredientView(LoginRequiredMixin, ListView):
         if self.form.is_valid():
 
             if self.form.changed_data:
-                ingredient_list = ingredient_list.filter(name__icontains=self.form.cleaned_data['name'])
-                self.search_count = ingredient_list.count()
+                ingredient_list = self.form.search(ingredient_list)
+                self.search_count = self.get_search_count(ingredient_list)
              
         return ingredient_list
         
@@ -417,7 +468,7 @@ class UserIngredientView(LoginRequiredMixin, ListView):
         return context
 
 
-class UserCommentView(LoginRequiredMixin, ListView):
+class UserCommentView(LoginRequiredMixin, UserPanelMixin, CursorPaginationMixin, ListView):
 
     """
     Return the list all recipes comment by user
@@ -426,6 +477,7 @@ class UserCommentView(LoginRequiredMixin, ListView):
     template_name = 'food_app/user_comment.html'
     context_object_name = 'comment_list'
     paginate_by = 5
+    cursor_ordering = ['-date_added', '-pk']
 
     def get_queryset(self, *args, **kwargs):
 
@@ -436,8 +488,8 @@ class UserCommentView(LoginRequiredMixin, ListView):
         if self.form.is_valid():
 
             if self.form.changed_data:
-                comment_list = comment_list.filter(recipe__in=Recipe.objects.filter(name__icontains=self.form.cleaned_data['name']))
-                self.search_count = comment_list.count()
+                comment_list = self.form.search(comment_list, field='recipe')
+                self.search_count = self.get_search_count(comment_list)
              
         return comment_list
 
@@ -465,7 +517,23 @@ class UserCommentView(LoginRequiredMixin, ListView):
         return context
 
 
-class UserLikeView(LoginRequiredMixin, ListView):
+def get_like_pks(data, name='like'):
+
+    """
+    Return the primary keys posted in the name parameters, the checked rows of a like list or a single like button
+    """
+    pks = []
+
+    for value in data.getlist(name):
+        try:
+            pks.append(int(value))
+        except ValueError:
+            continue
+
+    return pks[:LIKES_BATCH_SIZE]
+
+
+class UserLikeView(LoginRequiredMixin, UserPanelMixin, CursorPaginationMixin, ListView):
 
     """
     Return the list all recipes like by user
@@ -474,26 +542,28 @@ class UserLikeView(LoginRequiredMixin, ListView):
     template_name = 'food_app/user_like.html'
     context_object_name = 'recipe_list'
     paginate_by = 5
+    cursor_ordering = ['-likes_count', 'name', 'pk']
 
     def get_queryset(self, *args, **kwargs):
 
-        recipe_list = self.request.user.likes.annotate(num_likes=Count('likes')).order_by('-num_likes')
+        recipe_list = self.request.user.likes.order_by('-likes_count', 'name')
         self.form = SearchForm(self.request.GET)
         self.search_count = ''
 
         if self.form.is_valid():
 
             if self.form.changed_data:
-                recipe_list = recipe_list.filter(name__icontains=self.form.cleaned_data['name'])
-                self.search_count = recipe_list.count()
+                recipe_list = self.form.search(recipe_list)
+                self.search_count = self.get_search_count(recipe_list)
              
         return recipe_list
 
     def post(self, *args, **kwargs):
         
-        if self.request.POST.get('like'):
-            recipe = Recipe.objects.get(pk=self.request.POST.get('like'))
-            recipe.likes.remove(self.request.user)
+        pks = get_like_pks(self.request.POST)
+
+        if pks:
+            Recipe.set_likes(self.request.user, pks, liked=False)
 
         return redirect(reverse_lazy('user-like'))
 
@@ -513,7 +583,7 @@ class UserLikeView(LoginRequiredMixin, ListView):
         return context
 
 
-class UserLikeScheduleView(LoginRequiredMixin, ListView):
+class UserLikeScheduleView(LoginRequiredMixin, UserPanelMixin, CursorPaginationMixin, ListView):
 
     """
     Return the list all schedules like by user
@@ -522,26 +592,28 @@ class UserLikeScheduleView(LoginRequiredMixin, ListView):
     template_name = 'food_app/user_like_schedule.html'
     context_object_name = 'schedule_list'
     paginate_by = 5
+    cursor_ordering = ['-likes_count', 'name', 'pk']
 
     def get_queryset(self, *args, **kwargs):
 
-        schedule_list = self.request.user.likes_schedule.annotate(num_likes=Count('likes')).order_by('-num_likes')
+        schedule_list = self.request.user.likes_schedule.order_by('-likes_count', 'name')
         self.form = SearchForm(self.request.GET)
         self.search_count = ''
 
         if self.form.is_valid():
 
             if self.form.changed_data:
-                schedule_list = schedule_list.filter(name__icontains=self.form.cleaned_data['name'])
-                self.search_count = schedule_list.count()
+                schedule_list = self.form.search(schedule_list)
+                self.search_count = self.get_search_count(schedule_list)
              
         return schedule_list
 
     def post(self, *args, **kwargs):
         
-        if self.request.POST.get('like'):
-            schedule = Schedule.objects.get(pk=self.request.POST.get('like'))
-            schedule.likes.remove(self.request.user)
+        pks = get_like_pks(self.request.POST)
+
+        if pks:
+            Schedule.set_likes(self.request.user, pks, liked=False)
 
         return redirect(reverse_lazy('user-like-schedule'))
 
@@ -561,7 +633,7 @@ class UserLikeScheduleView(LoginRequiredMixin, ListView):
         return context
 
 
-class UserRecipesView(ListView):
+class UserRecipesView(CursorPaginationMixin, ListView):
 
     """
     Return the list all recipes create by user for non register user
@@ -570,19 +642,20 @@ class UserRecipesView(ListView):
     template_name = 'food_app/user_recipes.html'
     context_object_name = 'recipe_list'
     paginate_by = 5
+    cursor_ordering = ['-likes_count', 'name', 'pk']
 
     def get_queryset(self, *args, **kwargs):
 
-        self.user = get_object_or_404(User, pk=self.kwargs['pk'])
-        recipe_list = self.user.recipes.annotate(num_likes=Count('likes')).order_by('-num_likes')
+        self.user = get_object_or_404(User.objects.with_stats(), pk=self.kwargs['pk'])
+        recipe_list = self.user.recipes.order_by('-likes_count', 'name')
         self.form = SearchForm(self.request.GET)
         self.search_count = ''
 
         if self.form.is_valid():
 
             if self.form.changed_data:
-                recipe_list = recipe_list.filter(name__icontains=self.form.cleaned_data['name'])
-                self.search_count = recipe_list.count()
+                recipe_list = self.form.search(recipe_list)
+                self.search_count = self.get_search_count(recipe_list)
              
         return recipe_list
         
@@ -603,7 +676,7 @@ class UserRecipesView(ListView):
         return context
 
 
-class UserSchedulesView(LoginRequiredMixin, ListView):
+class UserSchedulesView(LoginRequiredMixin, CursorPaginationMixin, ListView):
 
     """
     Return the list all schedules create by user for non register user
@@ -612,19 +685,20 @@ class UserSchedulesView(LoginRequiredMixin, ListView):
     template_name = 'food_app/user_schedules.html'
     context_object_name = 'schedule_list'
     paginate_by = 5
+    cursor_ordering = ['-likes_count', 'name', 'pk']
 
     def get_queryset(self, *args, **kwargs):
 
-        self.user = get_object_or_404(User, pk=self.kwargs['pk'])
-        schedule_list = self.user.schedules.annotate(num_likes=Count('likes')).order_by('-num_likes')
+        self.user = get_object_or_404(User.objects.with_stats(), pk=self.kwargs['pk'])
+        schedule_list = self.user.schedules.order_by('-likes_count', 'name')
         self.form = SearchForm(self.request.GET)
         self.search_count = ''
 
         if self.form.is_valid():
 
             if self.form.changed_data:
-                schedule_list = schedule_list.filter(name__icontains=self.form.cleaned_data['name'])
-                self.search_count = schedule_list.count()
+                schedule_list = self.form.search(schedule_list)
+                self.search_count = self.get_search_count(schedule_list)
              
         return schedule_list
         
@@ -645,7 +719,7 @@ class UserSchedulesView(LoginRequiredMixin, ListView):
         return context
 
 
-class UserCommentsView(ListView):
+class UserCommentsView(CursorPaginationMixin, ListView):
 
     """
     Return the list all comments create by user for non register user
@@ -654,10 +728,11 @@ class UserCommentsView(ListView):
     template_name = 'food_app/user_comments.html'
     context_object_name = 'comment_list'
     paginate_by = 5
+    cursor_ordering = ['-date_added', '-pk']
 
     def get_queryset(self, *args, **kwargs):
 
-        self.user = get_object_or_404(User, pk=self.kwargs['pk'])
+        self.user = get_object_or_404(User.objects.with_stats(), pk=self.kwargs['pk'])
         comment_list = self.user.user_comments.all()
         self.form = SearchForm(self.request.GET)
         self.search_count = ''
@@ -665,8 +740,8 @@ class UserCommentsView(ListView):
         if self.form.is_valid():
 
             if self.form.changed_data:
-                comment_list = comment_list.filter(recipe__in=Recipe.objects.filter(name__icontains=self.form.cleaned_data['name']))
-                self.search_count = comment_list.count()
+                comment_list = self.form.search(comment_list, field='recipe')
+                self.search_count = self.get_search_count(comment_list)
              
         return comment_list
         
@@ -895,6 +970,22 @@ class RecipeDeleteView(TestMixin, DeleteView):
     success_url = reverse_lazy('user-recipe')
 
 
+def get_comment_page(recipe, cursor=None):
+
+    """
+    Return the CursorPage of recipe comments after cursor, seeking by date instead of counting them
+    """
+    try:
+        return paginate_by_cursor(
+            queryset=recipe.recipe_comments.select_related('user'),
+            ordering=CommentRecipe.SEEK_ORDERING,
+            page_size=COMMENTS_PAGE_SIZE,
+            cursor=cursor,
+        )
+    except InvalidCursor:
+        raise Http404('Invalid cursor')
+
+
 class RecipeDetailView(DetailView):
 
     """
@@ -903,17 +994,34 @@ class RecipeDetailView(DetailView):
     model = Recipe
     template_name = 'food_app/recipe_detail.html'
     context_object_name = 'recipe'
+    recipe = None
+
+    def get_queryset(self, *args, **kwargs):
+
+        recipe_list = Recipe.objects.select_related('create_by')
+
+        if self.request.user.is_authenticated:
+            recipe_list = recipe_list.annotate(user_like=Exists(
+                Recipe.likes.through.objects.filter(recipe=OuterRef('pk'), user=self.request.user)
+            ))
+
+        return recipe_list
+
+    def get_object(self, *args, **kwargs):
+
+        if self.recipe is None:
+            self.recipe = super().get_object(*args, **kwargs)
+
+        return self.recipe
 
     def post(self, *args, **kwargs):
         
         if self.request.POST.get('button_recipe'):
             button_recipe = self.request.POST.get('button_recipe')
             
-            if button_recipe == 'like_up':
-                self.get_object().likes.add(self.request.user)
-
-            elif button_recipe == 'like_down':
-                self.get_object().likes.remove(self.request.user)
+            # the like row and the counter are written by pk, like the list buttons, without loading the recipe
+            if button_recipe in ('like_up', 'like_down'):
+                Recipe.set_likes(self.request.user, [self.kwargs['pk']], liked=button_recipe == 'like_up')
 
             elif button_recipe == 'comment':
                 form = CommentRecipeForm(self.request.POST)
@@ -921,30 +1029,83 @@ class RecipeDetailView(DetailView):
                 if form.is_valid():
                     form.save()
 
-        return redirect(reverse_lazy('recipe-detail', args=[self.get_object().pk,]))
+        return redirect(reverse_lazy('recipe-detail', args=[self.kwargs['pk'],]))
         
     def get_context_data(self, *args, **kwargs):
         
         context = super().get_context_data(*args, **kwargs)
         
-        comments = self.get_object().recipe_comments.all()
-        paginator = Paginator(comments, 5)
-        page = self.request.GET.get('page')
-        comment_list = paginator.get_page(page)
-        
-        context['comment_list'] = comment_list
+        context['comment_list'] = get_comment_page(self.object, self.request.GET.get('comments'))
+        context['ingredient_list'] = cached_queryset(
+            name=f'recipe-{self.object.pk}-ingredients',
+            models=[IngredientRecipe, Ingredient],
+            queryset=self.object.recipe_ingredients.select_related('ingredient')
+        )
         
         if self.request.user.is_authenticated:
             form = CommentRecipeForm()
             form.initial['user'] = self.request.user
-            form.initial['recipe'] = self.get_object()
+            form.initial['recipe'] = self.object
             context['form'] = form
-            context['user_like'] = self.get_object().likes.filter(pk=self.request.user.pk).exists()
+            context['user_like'] = self.object.user_like
         
         return context
 
 
-class RecipeListView(ListView):
+class RecipeCommentsView(View):
+
+    """
+    Return the next comments of the recipe as an HTML fragment, or as JSON with ?format=json
+    """
+    def get(self, request, *args, **kwargs):
+
+        recipe = get_object_or_404(Recipe.objects.only('pk'), pk=self.kwargs['pk'])
+        comment_list = get_comment_page(recipe, request.GET.get('cursor'))
+
+        if request.GET.get('format') == 'json':
+            return JsonResponse({
+                'results': [
+                    {
+                        'id': comment.pk,
+                        'comment': comment.comment,
+                        'date_added': comment.date_added,
+                        'user': {'id': comment.user.pk, 'username': comment.user.username},
+                    }
+                    for comment in comment_list
+                ],
+                'next': comment_list.next_cursor,
+            })
+
+        return render(request, 'food_app/recipe_comments.html', {'recipe': recipe, 'comment_list': comment_list})
+
+
+class LikeView(LoginRequiredMixin, View):
+
+    """
+    Like (liked=1) or unlike (liked=0) the objects of the pk parameters, answer with their new likes counts as JSON
+
+    Repeating a request changes nothing, so a double click or a retried request cannot count a like twice.
+    """
+    model = None
+    raise_exception = True
+
+    def post(self, request, *args, **kwargs):
+
+        pks = get_like_pks(request.POST, 'pk')
+        liked = request.POST.get('liked')
+
+        if not pks or liked not in ('0', '1'):
+            return JsonResponse({'error': 'Invalid pk or liked'}, status=400)
+
+        likes_counts = self.model.set_likes(request.user, pks, liked=liked == '1')
+
+        return JsonResponse({
+            'liked': liked == '1',
+            'results': [{'id': pk, 'likes_count': likes_count} for pk, likes_count in likes_counts.items()],
+        })
+
+
+class RecipeListView(CursorPaginationMixin, ListView):
 
     """
     Return the list all recipe view
@@ -953,18 +1114,19 @@ class RecipeListView(ListView):
     template_name = 'food_app/recipe_list.html'
     context_object_name = 'recipe_list'
     paginate_by = 15
+    cursor_ordering = ['-likes_count', 'name', 'pk']
 
     def get_queryset(self, *args, **kwargs):
 
-        recipe_list = Recipe.objects.annotate(num_likes=Count('likes')).order_by('-num_likes')
+        recipe_list = Recipe.objects.order_by('-likes_count', 'name')
         self.form = SearchForm(self.request.GET)
         self.search_count = ''
 
         if self.form.is_valid():
 
             if self.form.changed_data:
-                recipe_list = recipe_list.filter(name__icontains=self.form.cleaned_data['name'])
-                self.search_count = recipe_list.count()
+                recipe_list = self.form.search(recipe_list)
+                self.search_count = self.get_search_count(recipe_list)
              
         return recipe_list
         
@@ -1026,21 +1188,18 @@ class ScheduleCreateView(LoginRequiredMixin, SessionWizardView):
 
     def done(self, form_list, *args, **kwargs):
         
-        self.instance.save()
         formset = form_list[1]
-        formset.instance = self.instance
-        
-        for form in formset:
 
-            if form.has_changed():
-                form.save()
-            
-            else:
-                RecipeSchedule.objects.create(
+        with transaction.atomic():
+            self.instance.save()
+            self.instance.save_slots([
+                RecipeSchedule(
                     day_number=form.cleaned_data['day_number'],
                     meal_number=form.cleaned_data['meal_number'],
-                    schedule=self.instance
+                    recipe=form.cleaned_data.get('recipe'),
                 )
+                for form in formset
+            ])
 
         return redirect(reverse_lazy('user-schedule'))
 
@@ -1079,13 +1238,28 @@ class ScheduleUpdateView(TestMixin, SessionWizardView):
 
     def done(self, form_list, *args, **kwargs):
         
-        self.instance.save()
         formset = form_list[1]
-        formset.save()
+
+        with transaction.atomic():
+            self.instance.save()
+            self.instance.save_slots(formset.save(commit=False))
 
         return redirect(self.request.GET.get('next'))
 
 
+class ScheduleCloneView(LoginRequiredMixin, View):
+
+    """
+    Copy the schedule with all its recipes to the user and open it for edit
+    """
+    def post(self, request, *args, **kwargs):
+
+        schedule = get_object_or_404(Schedule, pk=self.kwargs['pk'])
+        new_schedule = schedule.clone(create_by=request.user)
+
+        return redirect(reverse_lazy('schedule-update', args=[new_schedule.pk,]) + f'?next={reverse_lazy("user-schedule")}')
+
+
 class ScheduleDeleteView(TestMixin, DeleteView):
 
     """
@@ -1109,31 +1283,91 @@ class ScheduleDetailView(DetailView):
     model = Schedule
     template_name = 'food_app/schedule_detail.html'
     context_object_name = 'schedule'
+    schedule = None
+
+    def get_queryset(self, *args, **kwargs):
+
+        schedule_list = Schedule.objects.select_related('create_by', 'nutrition')
+
+        if self.request.user.is_authenticated:
+            schedule_list = schedule_list.annotate(user_like=Exists(
+                Schedule.likes.through.objects.filter(schedule=OuterRef('pk'), user=self.request.user)
+            ))
+
+        return schedule_list
+
+    def get_object(self, *args, **kwargs):
+
+        if self.schedule is None:
+            self.schedule = super().get_object(*args, **kwargs)
+
+        return self.schedule
 
     def post(self, *args, **kwargs):
         
         if self.request.POST.get('button_schedule'):
             button_schedule = self.request.POST.get('button_schedule')
             
-            if button_schedule == 'like_up':
-                self.get_object().likes.add(self.request.user)
-
-            elif button_schedule == 'like_down':
-                self.get_object().likes.remove(self.request.user)
+            # the like row and the counter are written by pk, like the list buttons, without loading the schedule
+            if button_schedule in ('like_up', 'like_down'):
+                Schedule.set_likes(self.request.user, [self.kwargs['pk']], liked=button_schedule == 'like_up')
 
-        return redirect(reverse_lazy('schedule-detail', args=[self.get_object().pk,]))
+        return redirect(reverse_lazy('schedule-detail', args=[self.kwargs['pk'],]))
         
     def get_context_data(self, *args, **kwargs):
         
         context = super().get_context_data(*args, **kwargs)
+        context['schedule_grid'] = self.object.get_grid()
+
+        # the stored summary comes with the schedule, one not stored yet is computed without storing it,
+        # so a GET never writes (and never pins the visitor to the primary)
+        try:
+            nutrition = self.object.nutrition
+        except ScheduleNutrition.DoesNotExist:
+            nutrition = ScheduleNutrition.summarize([self.object.pk])[self.object.pk]
+
+        for day in context['schedule_grid']:
+            day['nutrition'] = nutrition.get_day(day['day_number'])
+
+        context['nutrition'] = nutrition
         
         if self.request.user.is_authenticated:
-            context['user_like'] = self.get_object().likes.filter(pk=self.request.user.pk).exists()
+            context['user_like'] = self.object.user_like
         
         return context
 
 
-class ScheduleListView(ListView):
+class ScheduleShoppingListView(DetailView):
+
+    """
+    Return the summed ingredients of the schedule, as JSON with ?format=json
+    """
+    model = Schedule
+    template_name = 'food_app/schedule_shopping_list.html'
+    context_object_name = 'schedule'
+
+    def get(self, request, *args, **kwargs):
+
+        if request.GET.get('format') == 'json':
+            schedule = get_object_or_404(Schedule.objects.only('pk', 'name'), pk=self.kwargs['pk'])
+
+            return JsonResponse({
+                'schedule': schedule.pk,
+                'name': schedule.name,
+                'ingredients': get_shopping_list(schedule.pk),
+            })
+
+        return super().get(request, *args, **kwargs)
+
+    def get_context_data(self, *args, **kwargs):
+
+        context = super().get_context_data(*args, **kwargs)
+        context['shopping_list'] = get_shopping_list(self.object.pk)
+
+        return context
+
+
+class ScheduleListView(CursorPaginationMixin, ListView):
 
     """
     Return the list all schedule view
@@ -1142,18 +1376,19 @@ class ScheduleListView(ListView):
     template_name = 'food_app/schedule_list.html'
     context_object_name = 'schedule_list'
     paginate_by = 20
+    cursor_ordering = ['-likes_count', 'name', 'pk']
 
     def get_queryset(self, *args, **kwargs):
 
-        schedule_list = Schedule.objects.annotate(num_likes=Count('likes')).order_by('-num_likes')
+        schedule_list = Schedule.objects.order_by('-likes_count', 'name')
         self.form = SearchForm(self.request.GET)
         self.search_count = ''
 
         if self.form.is_valid():
 
             if self.form.changed_data:
-                schedule_list = schedule_list.filter(name__icontains=self.form.cleaned_data['name'])
-                self.search_count = schedule_list.count()
+                schedule_list = self.form.search(schedule_list)
+                self.search_count = self.get_search_count(schedule_list)
              
         return schedule_list
         
@@ -1170,4 +1405,111 @@ class ScheduleListView(ListView):
         else:
             context['path_pagination'] = self.request.get_full_path().split('?')[0] + '?page='
         
-        return context
\ No newline at end of file
+        return context
+
+
+class ProfilingStatsView(TestMixin, View):
+
+    """
+    Return the rolling per view query and timing stats of this process as JSON
+    """
+    def test_func(self):
+
+        return self.request.user.is_staff
+
+    def get(self, request, *args, **kwargs):
+
+        return JsonResponse(profile_stats.summary(), json_dumps_params={'indent': 2})
+
+
+class PoolStatsView(TestMixin, View):
+
+    """
+    Return the database connection pool usage and checkout wait times of this process as JSON
+    """
+    def test_func(self):
+
+        return self.request.user.is_staff
+
+    def get(self, request, *args, **kwargs):
+
+        return JsonResponse(get_pool_stats(), json_dumps_params={'indent': 2})
+
+
+@method_decorator([require_safe, read_primary], name='dispatch')
+class ApiView(View):
+
+    """
+    Base of the read-only JSON API, answers 304 from the ETag before any row is loaded
+
+    The ETag comes from the versions the primary committed, so the body is read from the primary as well.
+    """
+    resource = None
+
+    def get(self, request, *args, **kwargs):
+
+        params = request.GET
+
+        try:
+            fields = self.resource.parse_fields(params)
+            expand = self.resource.parse_expand(params)
+            etag = self.resource.get_etag(request, expand)
+            response = get_conditional_response(request, etag=etag)
+
+            if response is None:
+                response = JsonResponse(self.get_data(params, fields, expand))
+                response.headers['ETag'] = etag
+        except ApiError as error:
+            return JsonResponse({'error': str(error)}, status=error.status)
+
+        response.headers['Cache-Control'] = 'no-cache'
+
+        return response
+
+
+class ApiListView(ApiView):
+
+    """
+    Return a page of the resource, ?cursor= takes the next page from the next link
+    """
+    def get_data(self, params, fields, expand):
+
+        try:
+            page = paginate_by_cursor(
+                queryset=self.resource.build_queryset(params, fields, expand),
+                ordering=self.resource.ordering,
+                page_size=self.resource.parse_page_size(params),
+                cursor=params.get('cursor'),
+            )
+        except InvalidCursor:
+            raise ApiError('Invalid cursor')
+
+        self.resource.prepare(page.object_list, expand)
+        next_url = None
+
+        if page.has_next():
+            query = params.copy()
+            query['cursor'] = page.next_cursor
+            next_url = f'{self.request.path}?{query.urlencode()}'
+
+        return {
+            'results': [self.resource.serialize(obj, fields, expand) for obj in page],
+            'next': next_url,
+        }
+
+
+class ApiDetailView(ApiView):
+
+    """
+    Return one object of the resource
+    """
+    def get_data(self, params, fields, expand):
+
+        obj = self.resource.build_queryset(params, fields, expand).filter(pk=self.kwargs['pk']).first()
+
+        if obj is None:
+            raise ApiError('Not found', status=404)
+
+        self.resource.prepare([obj], expand)
+
+        return self.resource.serialize(obj, fields, expand)